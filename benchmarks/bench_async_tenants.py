@@ -0,0 +1,143 @@
+"""
+Scaling test of the stream engines against a local MRA v2 stand-in: memory and
+CPU per tenant while N tenants catch up on a backlog and then idle on heartbeats.
+
+Each tenant count runs in a fresh process. The stand-in server runs in its own
+process, syslog output goes to a local TCP sink.
+
+The threads engine stops a stream on `reconnect` events, so it is measured with
+reconnects disabled on the stand-in.
+
+Usage:
+    python -m benchmarks.bench_async_tenants [--tenants 10 100 500] [--engine asyncio]
+"""
+
+import argparse, multiprocessing, os, resource, threading, time
+
+from lookout_mra_client.event_forwarders.qradar_event_forwarder import QRadarEventForwarder
+
+from .mra_v2_standin import start_process
+from .sinks import TCPSink
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(engine: str, tenants: int, url: str, expected: int, idle: float, results) -> None:
+    sink = TCPSink()
+    received = [0]
+    done = threading.Event()
+
+    def count(events: list) -> None:
+        received[0] += len(events)
+        if received[0] >= expected:
+            done.set()
+
+    forwarder = QRadarEventForwarder(sink.address, "qradarLogSourceIdentifier", "bench", count)
+    stream_args = {"api_domain": url, "api_key": "key", "last_event_id": 0}
+
+    rss_before = rss_kb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    if engine == "asyncio":
+        from lookout_mra_client.mra_v2_async_stream_thread import MRAv2AsyncStreamThread
+
+        thread = MRAv2AsyncStreamThread()
+        streams = [thread.addStream(f"tenant-{i}", forwarder, **stream_args) for i in range(tenants)]
+        thread.start()
+        threads = [thread]
+    else:
+        from lookout_mra_client.mra_v2_stream_thread import MRAv2StreamThread
+
+        threads = [MRAv2StreamThread(f"tenant-{i}", forwarder, **stream_args) for i in range(tenants)]
+        streams = []
+        for thread in threads:
+            thread.start()
+
+    if not done.wait(timeout=300):
+        print(f"  timed out, received {received[0]} of {expected} events")
+    catch_up = time.perf_counter() - start
+    cpu_catch_up = time.process_time() - cpu_start
+    rss_busy = rss_kb()
+
+    # Steady state, every tenant connected and receiving heartbeats only
+    cpu_idle_start = time.process_time()
+    time.sleep(idle)
+    cpu_idle = time.process_time() - cpu_idle_start
+
+    for thread in threads:
+        thread.shutdown_flag.set()
+    for thread in threads:
+        thread.join(timeout=30)
+    forwarder.close()
+    sink.close()
+
+    results.put(
+        {
+            "events": received[0],
+            "catch_up": catch_up,
+            "cpu_catch_up": cpu_catch_up,
+            "cpu_idle": cpu_idle,
+            "rss_delta": rss_busy - rss_before,
+            "connects": sum(stream.stream.connects for stream in streams),
+        }
+    )
+
+
+def main():
+    # The stand-in serves plain http
+    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--engine", choices=("asyncio", "threads"), default="asyncio")
+    parser.add_argument("--batches", type=int, default=20, help="event batches per tenant")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--reconnect-every", type=int, default=10)
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    parser.add_argument("--idle", type=float, default=5, help="seconds of heartbeats measured")
+    args = parser.parse_args()
+
+    reconnect_every = args.reconnect_every if args.engine == "asyncio" else args.batches + 1
+    server, url = start_process(
+        batches=args.batches,
+        batch_size=args.batch_size,
+        reconnect_every=reconnect_every,
+        token_ttl=args.token_ttl,
+    )
+    print(
+        f"{args.engine} engine, {args.batches} x {args.batch_size} events per tenant, "
+        f"reconnect every {reconnect_every} batches"
+    )
+
+    for tenants in args.tenants:
+        expected = tenants * args.batches * args.batch_size
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run, args=(args.engine, tenants, url, expected, args.idle, results)
+        )
+        process.start()
+        result = results.get()
+        process.join()
+
+        print(
+            f"{tenants:>5} tenants: {result['events'] / result['catch_up']:>9,.0f} events/s, "
+            f"RSS {result['rss_delta'] / tenants:>7,.1f} KiB/tenant, "
+            f"catch-up CPU {result['cpu_catch_up'] * 1000 / tenants:>6,.1f} ms/tenant, "
+            f"idle CPU {result['cpu_idle'] * 100 / args.idle / tenants:.3f}%/tenant"
+            + (f", {result['connects']} connects" if result["connects"] else "")
+        )
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
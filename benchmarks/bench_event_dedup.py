@@ -0,0 +1,70 @@
+"""
+Benchmark the cost per event of the duplicate filter, in memory and with the event id
+journal, for fresh batches and for batches delivered again. LEEF translation of the
+same events is timed for comparison.
+
+Usage:
+    python -m benchmarks.bench_event_dedup [--events 200000] [--batch-size 100] [--window 10000]
+"""
+
+import argparse, os, tempfile, time
+
+from lookout_mra_client.event_dedup import EventDeduplicator
+from lookout_mra_client.event_translators.leef_translator import LeefTranslator
+
+from .event_generator import EventGenerator
+
+
+def bench(name: str, deduplicator: EventDeduplicator, batches: list, replay: bool) -> None:
+    events = sum(len(batch) for batch in batches)
+    start = time.perf_counter()
+    for batch in batches:
+        new_events = deduplicator.filter(batch)
+        deduplicator.record(new_events)
+    elapsed = time.perf_counter() - start
+    if replay:
+        # Every batch was delivered again right after it was forwarded
+        for batch in batches[-5:]:
+            assert deduplicator.filter(batch) == []
+    print(f"  {name:<28}: {elapsed / events * 1e9:>6,.0f} ns/event, {deduplicator.hits:,} hits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--window", type=int, default=10000)
+    args = parser.parse_args()
+
+    events = EventGenerator().events(args.events)
+    batches = [events[i : i + args.batch_size] for i in range(0, len(events), args.batch_size)]
+    # Each batch followed by a copy of itself, as after a reconnect during forwarding
+    replayed = [batch for pair in zip(batches, batches) for batch in pair]
+
+    print(f"{args.events:,} events, batches of {args.batch_size}, window {args.window:,}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, batches_in, replay in (("fresh", batches, False), ("delivered twice", replayed, True)):
+            bench(f"{name}, in memory", EventDeduplicator(window=args.window), batches_in, replay)
+            journal = os.path.join(directory, f"{name}.ids")
+            deduplicator = EventDeduplicator(journal, window=args.window)
+            bench(f"{name}, journaled", deduplicator, batches_in, replay)
+            deduplicator.close()
+
+        # A restarted stream recognizes the events forwarded before the restart
+        deduplicator = EventDeduplicator(os.path.join(directory, "fresh.ids"), window=args.window)
+        assert deduplicator.filter(batches[-1]) == []
+        deduplicator.close()
+
+    for event in events:
+        event["entName"] = "bench"
+        event["qradarLogSourceIdentifier"] = "bench"
+    translator = LeefTranslator(mra_v2=True)
+    start = time.perf_counter()
+    for batch in batches:
+        translator.encodeEvents(batch)
+    elapsed = time.perf_counter() - start
+    print(f"  {'LEEF translation':<28}: {elapsed / len(events) * 1e9:>6,.0f} ns/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark checkpoints/sec with many tenant threads checkpointing concurrently:
+one SQLite transaction per checkpoint versus the group-committed SqliteEventStore
+and the JSON CheckpointStore.
+
+Usage:
+    python -m benchmarks.bench_event_store [--tenants 100] [--seconds 5]
+"""
+
+import argparse, os, tempfile, threading, time
+from datetime import datetime
+
+from peewee import EXCLUDED, SqliteDatabase
+
+from lookout_mra_client.event_store.checkpoint_store import CheckpointStore
+from lookout_mra_client.event_store.sqlite_event_store import SqliteEventStore, SQLITE_PRAGMAS
+from lookout_mra_client.models.stream_checkpoint import StreamCheckpoint
+
+BATCH_SIZE = 50  # events per checkpointed batch
+
+
+def run_tenants(tenants: int, seconds: float, checkpoint) -> int:
+    """
+    Run one thread per tenant calling checkpoint(tenant, id) for `seconds`.
+
+    Returns:
+        int: Total checkpoints.
+    """
+    counts = [0] * tenants
+    go = threading.Event()
+    stop = threading.Event()
+
+    def tenant(index: int) -> None:
+        # Start all tenants together, busy threads would starve the ones still starting
+        go.wait()
+        id = 0
+        while not stop.is_set():
+            id += 1
+            checkpoint(index, id)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=tenant, args=(i,)) for i in range(tenants)]
+    for thread in threads:
+        thread.start()
+    go.set()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def bench_per_checkpoint(path: str, tenants: int, seconds: float) -> None:
+    database = SqliteDatabase(path, pragmas=SQLITE_PRAGMAS)
+    database.bind([StreamCheckpoint], bind_refs=False, bind_backrefs=False)
+    database.create_tables([StreamCheckpoint], safe=True)
+
+    def checkpoint(index: int, id: int) -> None:
+        with database.atomic():
+            StreamCheckpoint.insert(
+                ent_name=f"tenant-{index}",
+                stream_type="THREAT,DEVICE",
+                stream_position=str(id),
+                fetch_count=BATCH_SIZE,
+                fetched_at=datetime.now(),
+            ).on_conflict(
+                conflict_target=[StreamCheckpoint.ent_name, StreamCheckpoint.stream_type],
+                update={
+                    StreamCheckpoint.stream_position: EXCLUDED.stream_position,
+                    StreamCheckpoint.fetch_count: StreamCheckpoint.fetch_count + BATCH_SIZE,
+                    StreamCheckpoint.fetched_at: EXCLUDED.fetched_at,
+                },
+            ).execute()
+
+    total = run_tenants(tenants, seconds, checkpoint)
+    print(
+        f"  {'transaction per checkpoint':<26}: {total / seconds:>11,.0f} checkpoints/s, "
+        f"{total / seconds:,.1f} commits/s"
+    )
+    database.close()
+
+
+def bench_store(name: str, store: CheckpointStore, tenants: int, seconds: float) -> None:
+    event_stores = [store.eventStore(f"tenant-{i}", "THREAT,DEVICE") for i in range(tenants)]
+
+    def checkpoint(index: int, id: int) -> None:
+        event_stores[index].received_event(id, BATCH_SIZE)
+
+    total = run_tenants(tenants, seconds, checkpoint)
+    store.close()
+    print(
+        f"  {name:<26}: {total / seconds:>11,.0f} checkpoints/s, "
+        f"{store.commits / seconds:,.1f} commits/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.tenants} tenant threads, {args.seconds}s each")
+    with tempfile.TemporaryDirectory() as directory:
+        bench_per_checkpoint(os.path.join(directory, "naive.db"), args.tenants, args.seconds)
+        bench_store(
+            "SqliteEventStore",
+            SqliteEventStore(os.path.join(directory, "group.db")),
+            args.tenants,
+            args.seconds,
+        )
+        bench_store(
+            "CheckpointStore (JSON)",
+            CheckpointStore(os.path.join(directory, "checkpoints.json")),
+            args.tenants,
+            args.seconds,
+        )
+
+
+if __name__ == "__main__":
+    main()
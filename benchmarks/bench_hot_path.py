@@ -0,0 +1,265 @@
+"""
+Benchmark suite of the SSE -> JSON -> LEEF -> syslog hot path, one stage at a time,
+on synthetic THREAT, DEVICE and AUDIT events from the event generator:
+
+- sse_parse: SSEClient parsing an in-memory stream of event batches
+- json_loads: decoding the `data` of each batch
+- decode_events: decoding each batch keeping the JSON text of its events, for passthrough
+- flatten_event: flattening each event, as the Splunk and CEF formats do
+- leef_format_event: LeefTranslator.formatEvent of each event
+- leef_encode_events: LeefTranslator.encodeEvents of each batch
+- splunk_write: SplunkEventForwarder.write of each event to a counting stdout
+- splunk_write_all: SplunkEventForwarder.write_all of each batch to a counting stdout
+- splunk_passthrough: the same with passthrough, of batches from decode_events
+- syslog_write: SyslogClient.write of each event to a local TCP sink
+- syslog_write_all: SyslogClient.write_all of each batch to a local TCP sink
+
+Each stage runs --repeat times, the fastest run counts. Results are printed as
+events/s and MB/s of the stage's input or output, --save writes them as JSON, and
+--baseline compares them with a saved run: a stage more than --tolerance slower
+than the baseline is a regression and the exit status is 1.
+
+Usage:
+    python -m benchmarks.bench_hot_path [--events 20000] [--batch-size 100] [--repeat 3]
+        [--save results.json] [--baseline baseline.json] [--tolerance 0.1] [--stages ...]
+"""
+
+import argparse, copy, json, platform, sys, time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lookout_mra_client.event_forwarders.splunk_event_forwarder import SplunkEventForwarder
+from lookout_mra_client.event_passthrough import decode_events
+from lookout_mra_client.event_translators.leef_translator import LeefTranslator
+from lookout_mra_client.event_translators.utilities import flatten_event
+from lookout_mra_client.sse_client import SSEClient
+from lookout_mra_client.syslog_client import SyslogClient
+
+from .bench_sse_client import BufferedResponse
+from .event_generator import EventGenerator
+from .sinks import CountingStream, TCPSink
+
+# Result file format, bumped when results stop being comparable
+RESULTS_VERSION = 1
+
+
+class HotPath:
+    """
+    Inputs shared by the stages, and one method per stage returning (events, bytes),
+    bytes None for stages without byte output.
+    """
+
+    def __init__(self, events: int, batch_size: int, seed: int) -> None:
+        generated = EventGenerator(seed=seed).events(events)
+        self.batches = [
+            generated[i : i + batch_size] for i in range(0, len(generated), batch_size)
+        ]
+        self.data = [json.dumps({"events": batch}) for batch in self.batches]
+        self.decoded = [decode_events(data) for data in self.data]
+        self.stream = b"".join(
+            b"id: %d\nevent: events\ndata: %s\n\nevent: heartbeat\ndata: {}\n\n"
+            % (batch_id, data.encode())
+            for batch_id, data in enumerate(self.data)
+        )
+        # Events as the forwarders see them, with entName and the log source identifier
+        self.forwarded = copy.deepcopy(self.batches)
+        for batch in self.forwarded:
+            for event in batch:
+                event["entName"] = "bench"
+                event["qradarLogSourceIdentifier"] = "bench"
+        self.events = sum(len(batch) for batch in self.batches)
+        self.translator = LeefTranslator(mra_v2=True)
+        self.sink = TCPSink()
+        # NOTE: One NUL delimiter per message, the sink has the whole output once it counted it
+        self.syslog_bytes = sum(
+            sum(map(len, self.translator.encodeEvents(batch))) + len(batch)
+            for batch in self.forwarded
+        )
+
+    def stages(self) -> Dict[str, Callable[[], Tuple[int, Optional[int]]]]:
+        return {
+            "sse_parse": self.sse_parse,
+            "json_loads": self.json_loads,
+            "decode_events": self.decode_events,
+            "flatten_event": self.flatten_event,
+            "leef_format_event": self.leef_format_event,
+            "leef_encode_events": self.leef_encode_events,
+            "splunk_write": self.splunk_write,
+            "splunk_write_all": self.splunk_write_all,
+            "splunk_passthrough": self.splunk_passthrough,
+            "syslog_write": self.syslog_write,
+            "syslog_write_all": self.syslog_write_all,
+        }
+
+    def sse_parse(self) -> Tuple[int, Optional[int]]:
+        client = SSEClient(BufferedResponse(self.stream))
+        events = sum(1 for event in client.streamEvents() if event.event == "events")
+        assert events == len(self.batches)
+        return self.events, len(self.stream)
+
+    def json_loads(self) -> Tuple[int, Optional[int]]:
+        events = sum(len(json.loads(data)["events"]) for data in self.data)
+        return events, sum(len(data) for data in self.data)
+
+    def decode_events(self) -> Tuple[int, Optional[int]]:
+        events = sum(len(decode_events(data)) for data in self.data)
+        return events, sum(len(data) for data in self.data)
+
+    def flatten_event(self) -> Tuple[int, Optional[int]]:
+        for batch in self.batches:
+            for event in batch:
+                flatten_event(event)
+        return self.events, None
+
+    def leef_format_event(self) -> Tuple[int, Optional[int]]:
+        size = 0
+        format_event = self.translator.formatEvent
+        for batch in self.forwarded:
+            for event in batch:
+                size += len(format_event(event))
+        return self.events, size
+
+    def leef_encode_events(self) -> Tuple[int, Optional[int]]:
+        size = 0
+        for batch in self.forwarded:
+            size += sum(map(len, self.translator.encodeEvents(batch)))
+        return self.events, size
+
+    def splunk_write(self) -> Tuple[int, Optional[int]]:
+        return self.__splunk(lambda fwd: [fwd.write(e, "bench") for b in self.batches for e in b])
+
+    def splunk_write_all(self) -> Tuple[int, Optional[int]]:
+        return self.__splunk(lambda fwd: [fwd.write_all(b, "bench") for b in self.batches])
+
+    def splunk_passthrough(self) -> Tuple[int, Optional[int]]:
+        return self.__splunk(
+            lambda fwd: [fwd.write_all(b, "bench") for b in self.decoded], passthrough=True
+        )
+
+    def syslog_write(self) -> Tuple[int, Optional[int]]:
+        return self.__syslog(lambda client: [client.write(e) for b in self.forwarded for e in b])
+
+    def syslog_write_all(self) -> Tuple[int, Optional[int]]:
+        return self.__syslog(lambda client: [client.write_all(b) for b in self.forwarded])
+
+    def __splunk(
+        self, write: Callable[[SplunkEventForwarder], None], passthrough: bool = False
+    ) -> Tuple[int, int]:
+        stdout = CountingStream()
+        forwarder = SplunkEventForwarder(stream=stdout, passthrough=passthrough)
+        write(forwarder)
+        forwarder.close()
+        return self.events, stdout.bytes_written
+
+    def __syslog(self, write: Callable[[SyslogClient], None]) -> Tuple[int, int]:
+        client = SyslogClient(
+            "bench", self.translator.formatEvent, self.sink.address,
+            batch_formatter=self.translator.encodeEvents,
+        )
+        start_bytes = self.sink.bytes_received
+        write(client)
+        self.sink.wait_for(start_bytes + self.syslog_bytes)
+        client.close()
+        return self.events, self.sink.bytes_received - start_bytes
+
+
+def run(hot_path: HotPath, names: List[str], repeat: int) -> Dict[str, dict]:
+    results = {}
+    stages = hot_path.stages()
+    for name in names:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            events, size = stages[name]()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {
+            "events_per_second": events / best,
+            "bytes_per_second": size / best if size is not None else None,
+            "seconds": best,
+        }
+        throughput = f"{size / best / 1e6:>9.1f} MB/s" if size is not None else f"{'-':>9}     "
+        print(f"  {name:<20} {events / best:>12,.0f} events/s {throughput} {best * 1000:>9.1f} ms")
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: dict, tolerance: float) -> List[str]:
+    """
+    Returns:
+        List[str]: Stages slower than the baseline by more than the tolerance.
+    """
+    regressions = []
+    print(f"\nCompared with the baseline of {baseline.get('date', 'unknown date')}:")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<20} no baseline")
+            continue
+        change = result["events_per_second"] / before["events_per_second"] - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            f"  {name:<20} {before['events_per_second']:>12,.0f} -> "
+            f"{result['events_per_second']:>12,.0f} events/s {change:>+8.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest counts")
+    parser.add_argument("--stages", nargs="+", help="stages to run, default all")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="slowdown accepted before a regression"
+    )
+    args = parser.parse_args()
+
+    hot_path = HotPath(args.events, args.batch_size, args.seed)
+    names = args.stages or list(hot_path.stages())
+    unknown = set(names) - set(hot_path.stages())
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    print(
+        f"{hot_path.events:,} events in batches of {args.batch_size}, "
+        f"{len(hot_path.stream) / 1e6:.1f} MB SSE stream, best of {args.repeat}"
+    )
+    results = run(hot_path, names, args.repeat)
+    hot_path.sink.close()
+
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(
+                {
+                    "version": RESULTS_VERSION,
+                    "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "events": hot_path.events,
+                    "batch_size": args.batch_size,
+                    "results": results,
+                },
+                results_file,
+                indent=2,
+            )
+        print(f"\nResults saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("version") != RESULTS_VERSION:
+            sys.exit(f"Baseline {args.baseline} is of another results version")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nFAIL: {', '.join(regressions)} slower than the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark a stream of very large event batches through MRAv2StreamThread and the
+Splunk forwarder, with each batch decoded once it is complete (whole) or while it is
+received (streamed, SSEClient's stream_over):
+
+- peak traced memory of the run, tracemalloc of the stream and forwarding threads
+- seconds until the first event is written, and until all are
+- events/s of the run
+
+The stream is read from memory in 64 KiB chunks, as fast as the pipeline takes it.
+Timings come from a run without tracemalloc.
+
+Usage:
+    python -m benchmarks.bench_large_batch [--batches 3] [--batch-size 20000]
+        [--stream-over-kb 1024] [--stream-batch-events 100]
+"""
+
+import argparse, json, time, tracemalloc
+from typing import Generator, Tuple
+
+from lookout_mra_client.event_forwarders.splunk_event_forwarder import SplunkEventForwarder
+from lookout_mra_client.lag_tracker import LagTracker
+from lookout_mra_client.mra_v2_stream import YIELD_EVENTS
+from lookout_mra_client.mra_v2_stream_thread import MRAv2StreamThread
+from lookout_mra_client.replay import CountingForwarder
+from lookout_mra_client.sse_client import SSEClient, SSEvent
+
+from .bench_sse_client import BufferedResponse
+from .event_generator import EventGenerator
+from .sinks import CountingStream
+
+
+class MemoryStream:
+    """
+    Stand-in for MRAv2Stream serving an in-memory SSE stream, see MRAv2StreamThread.
+    """
+
+    def __init__(self, payload: bytes, stream_over: int) -> None:
+        self.payload = payload
+        self.stream_over = stream_over
+        self.last_event_id = 0
+        self.start_time = None
+        self.event_type = "bench"
+
+    def listenForEvents(self) -> Generator[SSEvent, None, None]:
+        client = SSEClient(BufferedResponse(self.payload), stream_over=self.stream_over)
+        for ss_event in client.streamEvents():
+            if ss_event.event in YIELD_EVENTS:
+                yield ss_event
+            if ss_event.id:
+                self.last_event_id = ss_event.id
+
+    def shutdown(self) -> Tuple[int, int]:
+        return (self.last_event_id, None)
+
+
+class FirstWriteForwarder(CountingForwarder):
+    """
+    Counting forwarder noting when the first events were written.
+    """
+
+    def __init__(self, forwarder) -> None:
+        super().__init__(forwarder)
+        self.first_write = None
+
+    def write_all(self, events: list, entName: str):
+        super().write_all(events, entName)
+        if self.first_write is None and events:
+            self.first_write = time.perf_counter()
+
+
+def run(payload: bytes, stream_over: int, stream_batch_events: int) -> Tuple[float, float, int]:
+    """
+    Returns:
+        tuple: Seconds until the first write, seconds until the stream ended, and the
+            number of events written.
+    """
+    forwarder = FirstWriteForwarder(SplunkEventForwarder(stream=CountingStream()))
+    thread = MRAv2StreamThread(
+        "bench",
+        forwarder,
+        stream=MemoryStream(payload, stream_over),
+        stream_batch_events=stream_batch_events,
+        lag_tracker=LagTracker("bench", stale_lag=float("inf")),
+    )
+    start = time.perf_counter()
+    thread.start()
+    thread.join()
+    elapsed = time.perf_counter() - start
+    forwarder.close()
+    return forwarder.first_write - start, elapsed, forwarder.events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=20000, help="events per batch")
+    parser.add_argument("--stream-over-kb", type=int, default=1024)
+    parser.add_argument("--stream-batch-events", type=int, default=100)
+    args = parser.parse_args()
+
+    generator = EventGenerator(seed=0)
+    payload = b"".join(
+        b"id: %d\nevent: events\ndata: %s\n\nevent: heartbeat\ndata: {}\n\n"
+        % (batch_id + 1, json.dumps({"events": generator.events(args.batch_size)}).encode())
+        for batch_id in range(args.batches)
+    )
+    events = args.batches * args.batch_size
+    print(
+        f"{args.batches} batches of {args.batch_size:,} events, "
+        f"{len(payload) / args.batches / 1e6:.1f} MB each"
+    )
+    print(
+        f"  {'variant':<10} {'peak MB':>9} {'first write s':>14} {'total s':>9} {'events/s':>10}"
+    )
+    for name, stream_over in (("whole", 0), ("streamed", args.stream_over_kb * 1024)):
+        tracemalloc.start()
+        _, _, written = run(payload, stream_over, args.stream_batch_events)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if written != events:
+            raise SystemExit(f"{name}: {written} of {events} events written")
+        first_write, elapsed, _ = run(payload, stream_over, args.stream_batch_events)
+        print(
+            f"  {name:<10} {peak / 1e6:>9.1f} {first_write:>14.3f} {elapsed:>9.2f} "
+            f"{events / elapsed:>10,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
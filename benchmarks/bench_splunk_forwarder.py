@@ -0,0 +1,114 @@
+"""
+Benchmark Splunk output to a pipe read by another process, as when Splunk runs the
+connector as a scripted input:
+
+- per_event: json.dumps and a text stdout write per event, the previous forwarder
+- per_event_unbuffered: the same, flushed after every event as with PYTHONUNBUFFERED
+- batch: SplunkEventForwarder writing every batch with one call, the default
+- buffered: SplunkEventForwarder buffering up to 64 KiB, flush_kb = 64
+
+Every run ends once the reader process received all bytes, the fastest of --repeat
+runs counts. json.dumps takes most of the time of every variant, the rest is the
+cost of the writes to the pipe.
+
+Usage:
+    python -m benchmarks.bench_splunk_forwarder [--events 50000] [--batch-size 100] [--repeat 3]
+"""
+
+import argparse, io, json, subprocess, sys, time
+
+from lookout_mra_client.event_forwarders.splunk_event_forwarder import (
+    SplunkEventForwarder,
+    SPLUNK_EVENT_DELIMITER,
+)
+
+from .event_generator import EventGenerator
+
+# Reader of the pipe, prints the number of bytes read
+PIPE_READER = """
+import sys
+read = 0
+while True:
+    data = sys.stdin.buffer.read1(1 << 20)
+    if not data:
+        break
+    read += len(data)
+print(read)
+"""
+
+
+def per_event(stdout: io.TextIOWrapper, batches: list, flush: bool) -> None:
+    for batch in batches:
+        for event in batch:
+            event["entName"] = "bench"
+            event["type"] = event.get("type", "UNKNOWN")
+            stdout.write(json.dumps(event) + SPLUNK_EVENT_DELIMITER)
+            if flush:
+                stdout.flush()
+    stdout.flush()
+
+
+def forwarder(stdout, batches: list, **kwargs) -> None:
+    splunk = SplunkEventForwarder(stream=stdout, **kwargs)
+    for batch in batches:
+        splunk.write_all(batch, "bench")
+    splunk.close()
+
+
+def bench(name: str, batches: list) -> tuple:
+    """
+    Returns:
+        tuple: Seconds until the reader got everything, the bytes it read, and the CPU
+            seconds of this process.
+    """
+    reader = subprocess.Popen(
+        [sys.executable, "-c", PIPE_READER], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    # NOTE: Block buffered like the stdout of an interpreter writing to a pipe
+    text = io.TextIOWrapper(reader.stdin, encoding="utf-8", newline="")
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    if name == "per_event":
+        per_event(text, batches, flush=False)
+    elif name == "per_event_unbuffered":
+        per_event(text, batches, flush=True)
+    elif name == "batch":
+        forwarder(reader.stdin, batches)
+    else:
+        forwarder(reader.stdin, batches, flush_bytes=64 * 1024)
+    reader.stdin.close()
+    read = int(reader.stdout.read())
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    reader.wait()
+    return elapsed, read, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant, the fastest counts")
+    args = parser.parse_args()
+
+    events = EventGenerator(seed=0).events(args.events)
+    print(f"{args.events:,} events in batches of {args.batch_size} to a pipe")
+    for name in ("per_event", "per_event_unbuffered", "batch", "buffered"):
+        runs = []
+        for _ in range(args.repeat):
+            # Fresh copies, the forwarders add fields to the events
+            batches = [
+                json.loads(json.dumps(events[i : i + args.batch_size]))
+                for i in range(0, len(events), args.batch_size)
+            ]
+            runs.append(bench(name, batches))
+        elapsed, read, cpu = min(runs)
+        print(
+            f"  {name:<22} {args.events / elapsed:>10,.0f} events/s "
+            f"{read / elapsed / 1e6:>8.1f} MB/s {elapsed * 1000:>9.1f} ms "
+            f"{cpu / args.events * 1e6:>6.1f} CPU us/event"
+        )
+
+
+if __name__ == "__main__":
+    main()
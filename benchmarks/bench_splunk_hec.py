@@ -0,0 +1,113 @@
+"""
+Benchmark the Splunk HTTP Event Collector forwarder against a local HEC stand-in,
+compared with the Splunk stdout forwarder writing to a pipe:
+
+- stdout: SplunkEventForwarder writing every batch with one call, to a pipe
+- hec: SplunkHECEventForwarder for every --in-flight, gzip compressed
+- hec_uncompressed: the same without compression
+
+Batches are written by --writers threads at once, as by several forward threads or
+tenants. Results are events/s, CPU time of the forwarding process per event, bytes
+on the wire (request bodies, or bytes written to the pipe) per event, and the
+requests and busy responses of the collector. The stand-in and the pipe reader run
+in other processes, on a machine with few CPUs they slow the forwarder down. With
+--busy-every N the stand-in answers every N-th request with a 503, which the
+forwarder retries, so delivered events are checked against the stand-in's count.
+
+Usage:
+    python -m benchmarks.bench_splunk_hec [--events 50000] [--batch-size 100]
+        [--writers 4] [--in-flight 1 4 8] [--busy-every 0]
+"""
+
+import argparse, json, logging, time, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from lookout_mra_client.event_forwarders import splunk_hec_event_forwarder
+from lookout_mra_client.event_forwarders.splunk_hec_event_forwarder import SplunkHECEventForwarder
+
+from . import splunk_hec_standin
+from .bench_splunk_forwarder import bench as bench_stdout
+from .event_generator import EventGenerator
+
+TOKEN = "bench"
+
+
+def stats(url: str) -> dict:
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        return json.loads(response.read())
+
+
+def bench_hec(url: str, batches: list, writers: int, **kwargs) -> tuple:
+    """
+    Returns:
+        tuple: Seconds until every batch was accepted, the CPU seconds of this process,
+            and the stand-in's counts.
+    """
+    forwarder = SplunkHECEventForwarder(url, TOKEN, **kwargs)
+    before = stats(url)
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(lambda batch: forwarder.write_all(batch, "bench"), batches))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    forwarder.close()
+    after = stats(url)
+    return elapsed, cpu, {name: after[name] - before[name] for name in after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--writers", type=int, default=4, help="threads writing batches")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--busy-every", type=int, default=0, help="answer every N-th request with 503")
+    args = parser.parse_args()
+
+    # NOTE: Short retry delays, the benchmark measures throughput rather than backoff
+    splunk_hec_event_forwarder.HEC_RETRY_DELAY = 0.01
+    logging.getLogger("lookout_mra_client").addHandler(logging.NullHandler())
+
+    standin, url = splunk_hec_standin.start_process(token=TOKEN, busy_every=args.busy_every)
+    events = EventGenerator(seed=0).events(args.events)
+
+    def batches() -> list:
+        # Fresh copies, the forwarders add fields to the events
+        return [
+            json.loads(json.dumps(events[i : i + args.batch_size]))
+            for i in range(0, len(events), args.batch_size)
+        ]
+
+    print(
+        f"{args.events:,} events in batches of {args.batch_size}, {args.writers} writer(s)"
+        + (f", 503 every {args.busy_every} requests" if args.busy_every else "")
+    )
+    print(
+        f"  {'variant':<28} {'events/s':>10} {'CPU us/event':>12} {'wire MB':>9} "
+        f"{'B/event':>8} {'requests':>9} {'503s':>6}"
+    )
+
+    elapsed, written, cpu = bench_stdout("batch", batches())
+    print(
+        f"  {'stdout':<28} {args.events / elapsed:>10,.0f} {cpu / args.events * 1e6:>12.1f} "
+        f"{written / 1e6:>9.2f} {written / args.events:>8.0f} {'-':>9} {'-':>6}"
+    )
+    for compresslevel in (1, 0):
+        for in_flight in args.in_flight:
+            name = f"hec{'' if compresslevel else '_uncompressed'} in_flight={in_flight}"
+            elapsed, cpu, counts = bench_hec(
+                url, batches(), args.writers, in_flight=in_flight, compresslevel=compresslevel
+            )
+            if counts["events"] != args.events:
+                raise SystemExit(f"{name}: {counts['events']} of {args.events} events arrived")
+            print(
+                f"  {name:<28} {args.events / elapsed:>10,.0f} {cpu / args.events * 1e6:>12.1f} "
+                f"{counts['body_bytes'] / 1e6:>9.2f} {counts['body_bytes'] / args.events:>8.0f} "
+                f"{counts['requests']:>9} {counts['busy']:>6}"
+            )
+    standin.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark SSEClient parsing throughput on multi-megabyte MRA v2 `events` batches.
+
+Usage:
+    python -m benchmarks.bench_sse_client [--batch-mb 4] [--batches 4] [--chunk-size 65536]
+"""
+
+import argparse, json, time
+
+from lookout_mra_client.sse_client import SSEClient, SSE_READ_CHUNK_SIZE
+
+
+class BufferedResponse:
+    """
+    Minimal stand-in for a streaming requests.Response backed by an in-memory buffer.
+    """
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    def iter_content(self, chunk_size: int):
+        view = memoryview(self.payload)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset : offset + chunk_size].tobytes()
+
+    def __iter__(self):
+        return self.iter_content(128)
+
+    def close(self) -> None:
+        pass
+
+
+def build_stream(batch_bytes: int, batches: int) -> bytes:
+    event = {
+        "id": "00000000-0000-0000-0000-000000000000",
+        "type": "THREAT",
+        "change_type": "CREATED",
+        "created_time": "2024-01-01T00:00:00.000+00:00",
+        "threat": {"classifications": ["MALWARE"], "severity": "HIGH", "type": "APPLICATION"},
+    }
+    encoded = json.dumps(event)
+    per_batch = max(1, batch_bytes // (len(encoded) + 2))
+    data = json.dumps({"events": [event] * per_batch}).encode()
+
+    parts = []
+    for batch_id in range(batches):
+        parts.append(b"id: %d\nevent: events\ndata: %s\n\n" % (batch_id, data))
+        parts.append(b"event: heartbeat\ndata: {}\n\n")
+    return b"".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-mb", type=float, default=4)
+    parser.add_argument("--batches", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=SSE_READ_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    payload = build_stream(int(args.batch_mb * 1e6), args.batches)
+    client = SSEClient(BufferedResponse(payload), chunk_size=args.chunk_size)
+
+    start = time.perf_counter()
+    count = sum(1 for _ in client.streamEvents())
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"parsed {count} SSE events, {len(payload) / 1e6:.1f} MB in {elapsed:.3f}s "
+        f"({len(payload) / 1e6 / elapsed:.1f} MB/s, chunk_size={args.chunk_size})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark a syslog outage with the disk spool: how fast batches are spooled while
+the receiver is down, and how fast the spool drains once a receiver is listening again.
+Fails if any byte is lost.
+
+Usage:
+    python -m benchmarks.bench_syslog_spool [--events 200000] [--batch-size 500] [--sync]
+"""
+
+import argparse, socket, tempfile, time
+
+from lookout_mra_client.event_translators.leef_translator import LeefTranslator
+from lookout_mra_client.syslog_spool import SyslogSpool, SpoolingSyslogWriter
+from lookout_mra_client.syslog_writer import SyslogWriter
+
+from .event_generator import EventGenerator
+from .sinks import TCPSink
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sync", action="store_true", help="msync every spooled batch")
+    args = parser.parse_args()
+
+    events = EventGenerator().events(args.batch_size)
+    for event in events:
+        event["entName"] = "bench"
+        event["qradarLogSourceIdentifier"] = "bench"
+    batch = LeefTranslator(mra_v2=True).encodeEvents(events)
+    batches = args.events // args.batch_size
+
+    # Nothing listens on the port, every send fails until the sink starts
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        spool = SyslogSpool(directory, sync=args.sync)
+        writer = SpoolingSyslogWriter(SyslogWriter(("127.0.0.1", port)), spool)
+        expected = len(writer.frame(batch)) * batches
+
+        start = time.perf_counter()
+        for _ in range(batches):
+            writer.send(batch)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Spooled  {batches * args.batch_size:,} events: "
+            f"{batches * args.batch_size / elapsed:>11,.0f} events/s, "
+            f"{expected / elapsed / 2**20:,.1f} MiB/s, {spool.disk_bytes / 2**20:,.0f} MiB on disk"
+        )
+
+        sink = TCPSink(port)
+        # NOTE: The drain thread retries with a backoff, time from its first successful write
+        while spool.drained_frames == 0:
+            time.sleep(0.001)
+        start = time.perf_counter()
+        sink.wait_for(expected, timeout=300)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Drained  {batches * args.batch_size:,} events: "
+            f"{batches * args.batch_size / elapsed:>11,.0f} events/s, "
+            f"{expected / elapsed / 2**20:,.1f} MiB/s"
+        )
+
+        time.sleep(0.1)
+        assert sink.bytes_received == expected, f"received {sink.bytes_received} of {expected} bytes"
+        assert spool.empty
+        writer.close()
+        spool.close()
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
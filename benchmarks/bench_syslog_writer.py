@@ -0,0 +1,74 @@
+"""
+Benchmark syslog writes to a local TCP sink: per-message logging.handlers.SysLogHandler
+versus SyslogWriter batches with each framing.
+
+Usage:
+    python -m benchmarks.bench_syslog_writer [--events 20000] [--batch-size 500]
+"""
+
+import argparse, logging, socket, time
+from logging.handlers import SysLogHandler
+
+from lookout_mra_client.event_translators.leef_translator import LeefTranslator
+from lookout_mra_client.syslog_writer import SyslogWriter, SYSLOG_FRAMINGS
+
+from .event_generator import EventGenerator
+from .sinks import TCPSink
+
+
+def bench_sysloghandler(sink: TCPSink, messages: list) -> float:
+    logger = logging.Logger("bench", logging.INFO)
+    handler = SysLogHandler(address=sink.address, socktype=socket.SOCK_STREAM)
+    handler.formatter = logging.Formatter("%(message)s")
+    logger.addHandler(handler)
+    texts = [message.decode("utf-8") for message in messages]
+    expected = sink.bytes_received + sum(len(m) + 5 for m in messages)
+
+    start = time.perf_counter()
+    for text in texts:
+        logger.info(text)
+    sink.wait_for(expected)
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed
+
+
+def bench_writer(sink: TCPSink, messages: list, batch_size: int, framing: str) -> float:
+    writer = SyslogWriter(sink.address, framing=framing)
+    batches = [messages[i : i + batch_size] for i in range(0, len(messages), batch_size)]
+    expected = sink.bytes_received + sum(len(writer.frame(batch)) for batch in batches)
+
+    start = time.perf_counter()
+    for batch in batches:
+        writer.send(batch)
+    sink.wait_for(expected)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    events = EventGenerator().events(args.events)
+    for event in events:
+        event["entName"] = "bench"
+        event["qradarLogSourceIdentifier"] = "bench"
+    messages = LeefTranslator(mra_v2=True).encodeEvents(events)
+
+    sink = TCPSink()
+    elapsed = bench_sysloghandler(sink, messages)
+    print(f"SysLogHandler per message: {len(messages) / elapsed:,.0f} msg/s")
+    for framing in SYSLOG_FRAMINGS:
+        elapsed = bench_writer(sink, messages, args.batch_size, framing)
+        print(
+            f"SyslogWriter {framing:>5}, batch {args.batch_size}: {len(messages) / elapsed:,.0f} msg/s"
+        )
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
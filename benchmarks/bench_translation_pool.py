@@ -0,0 +1,53 @@
+"""
+Benchmark LEEF translation throughput of the TranslationPool for an increasing
+number of worker processes, compared to a single in-process LeefTranslator.
+
+Usage:
+    python -m benchmarks.bench_translation_pool [--events 50000] [--batch-size 5000]
+"""
+
+import argparse, os, time
+
+from lookout_mra_client.event_translators.leef_translator import LeefTranslator
+from lookout_mra_client.event_translators.translation_pool import TranslationPool
+
+from .event_generator import EventGenerator
+
+
+def run(encode, batches: list) -> float:
+    start = time.perf_counter()
+    for batch in batches:
+        encode(batch)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    events = EventGenerator().events(args.events)
+    for event in events:
+        event["entName"] = "bench"
+        event["qradarLogSourceIdentifier"] = "bench"
+    batches = [events[i : i + args.batch_size] for i in range(0, len(events), args.batch_size)]
+
+    elapsed = run(LeefTranslator(mra_v2=True).encodeEvents, batches)
+    baseline = len(events) / elapsed
+    print(f"in-process: {baseline:,.0f} events/s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        pool = TranslationPool(workers, mra_v2=True)
+        run(pool.encodeEvents, batches[:1])  # start the worker processes
+        elapsed = run(pool.encodeEvents, batches)
+        pool.close()
+        rate = len(events) / elapsed
+        print(f"{workers:>3} worker(s): {rate:,.0f} events/s ({rate / baseline:.2f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Synthetic MRA v2 event generator following the fields in MRA_V2_LEEF_MAPPING.
+"""
+
+import random, uuid
+from datetime import datetime, timedelta, timezone
+
+THREAT_CLASSIFICATIONS = ["MALWARE", "PHISHING", "ROOT_JAILBREAK", "RISKWARE", "MAN_IN_THE_MIDDLE"]
+THREAT_SEVERITIES = ["LOW", "MEDIUM", "HIGH"]
+ACTIVATION_STATUSES = ["ACTIVATED", "DEACTIVATED", "PENDING", "DELETED"]
+SECURITY_STATUSES = ["SECURE", "THREATS_LOW", "THREATS_MEDIUM", "THREATS_HIGH"]
+AUDIT_TYPES = ["ATTRIBUTE_CHANGE", "USER_LOGIN", "DEVICE_GROUP_CHANGE"]
+CHANGE_TYPES = ["CREATED", "UPDATED", "DELETED"]
+PLATFORMS = ["ANDROID", "IOS"]
+
+
+class EventGenerator:
+    """
+    Generate MRA v2 THREAT, DEVICE and AUDIT events with realistic shapes.
+
+    Args:
+        seed (int, optional): Random seed, so runs are reproducible. Defaults to 0.
+        full (bool, optional): Populate every optional field. Defaults to False.
+    """
+
+    def __init__(self, seed: int = 0, full: bool = False) -> None:
+        self.random = random.Random(seed)
+        self.full = full
+        self.enterprise_guid = self.__guid()
+        self.created_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __guid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def __maybe(self, probability: float = 0.7) -> bool:
+        return self.full or self.random.random() < probability
+
+    def __general(self, event_type: str) -> dict:
+        self.created_time += timedelta(milliseconds=self.random.randint(1, 500))
+        return {
+            "id": self.__guid(),
+            "type": event_type,
+            "change_type": self.random.choice(CHANGE_TYPES),
+            "created_time": self.created_time.isoformat(timespec="milliseconds"),
+            "enterprise_guid": self.enterprise_guid,
+            "target": {"guid": self.__guid(), "type": "DEVICE"},
+            "actor": {"guid": self.__guid(), "type": "SYSTEM"},
+        }
+
+    def __device(self) -> dict:
+        device = {
+            "guid": self.__guid(),
+            "platform": self.random.choice(PLATFORMS),
+            "status": {
+                "activation_status": self.random.choice(ACTIVATION_STATUSES),
+                "protection_status": "PROTECTED",
+            },
+        }
+        if self.__maybe():
+            device["status"]["security_status"] = self.random.choice(SECURITY_STATUSES)
+            device["status"]["checkin_time"] = self.created_time.isoformat()
+        if self.__maybe():
+            device["profile_type"] = "DEFAULT"
+            device["client"] = {
+                "lookout_sdk_version": "9.1.0",
+                "ota_version": "2024.1",
+                "package_name": "com.lookout.enterprise",
+                "package_version": "10.2.1",
+            }
+        if self.__maybe():
+            device["hardware"] = {"manufacturer": "Google", "model": "Pixel 8"}
+            device["software"] = {
+                "latest_os_version": "14",
+                "latest_security_patch_level": "2024-01-01",
+                "os_version": "14",
+                "os_version_date": "2023-10-04",
+                "sdk_version": "34",
+                "security_patch_level": "2023-12-01",
+            }
+        if self.__maybe():
+            device["info"] = {
+                "customer_device_id": self.__guid(),
+                "device_group_guids": [self.__guid() for _ in range(self.random.randint(0, 3))],
+                "email": f"user{self.random.randint(0, 30000)}@example.com",
+                "external_id": self.__guid(),
+                "mdm_connector_id": self.random.randint(1, 10),
+                "mdm_type": "INTUNE",
+            }
+        return device
+
+    def threat(self) -> dict:
+        event = self.__general("THREAT")
+        details = {
+            "application_name": "Sample App",
+            "package_name": "com.example.sample",
+            "package_sha": "%064x" % self.random.getrandbits(256),
+            "file_name": "sample.apk",
+            "path": "/data/app/sample.apk",
+            "reason": "MALICIOUS_CODE",
+            "response": "NONE",
+        }
+        if self.__maybe(0.4):
+            details.update(
+                {
+                    "network_ssid": "Guest WiFi",
+                    "mac_address": "00:11:22:33:44:55",
+                    "dns_ip_addresses": ["10.0.0.1", "10.0.0.2"],
+                    "vpn_present": self.random.random() < 0.5,
+                    "network": {
+                        "connected": True,
+                        "network_name": "Guest WiFi",
+                        "network_type": "WIFI",
+                        "wifi_bssid": "00:11:22:33:44:66",
+                    },
+                }
+            )
+        event["threat"] = {
+            "guid": self.__guid(),
+            "severity": self.random.choice(THREAT_SEVERITIES),
+            "type": "APPLICATION",
+            "classifications": self.random.sample(THREAT_CLASSIFICATIONS, 2),
+            "assessments": ["ASSESSED"],
+            "details": details,
+        }
+        event["device"] = self.__device()
+        return event
+
+    def device(self) -> dict:
+        event = self.__general("DEVICE")
+        event["device"] = self.__device()
+        return event
+
+    def audit(self) -> dict:
+        event = self.__general("AUDIT")
+        event["audit"] = {
+            "type": self.random.choice(AUDIT_TYPES),
+            "attribute_changes": [
+                {"name": "email", "from": "old@example.com", "to": "new@example.com"}
+            ],
+        }
+        return event
+
+    def events(self, count: int, mix: tuple = (0.5, 0.4, 0.1)) -> list:
+        """
+        Generate a list of events with the given THREAT/DEVICE/AUDIT mix.
+        """
+        generators = (self.threat, self.device, self.audit)
+        return [self.random.choices(generators, mix)[0]() for _ in range(count)]
@@ -0,0 +1,116 @@
+"""
+Local stand-in for the MRA v2 token and SSE stream endpoints, used by the
+multi-tenant benchmarks.
+
+Every stream request gets `batches` event batches with increasing ids starting
+after the requested `id`, a heartbeat between batches, and a `reconnect` event
+after every `reconnect_every` batches. Once all batches were sent only heartbeats
+follow. Tokens expire after `token_ttl` seconds, expired tokens get a 401.
+
+Usage:
+    python -m benchmarks.mra_v2_standin [--port 0] [--batches 20] [--batch-size 50]
+"""
+
+import argparse, asyncio, itertools, json, multiprocessing, time
+
+from aiohttp import web
+
+from .event_generator import EventGenerator
+
+
+class MRAv2StandIn:
+    def __init__(
+        self,
+        batches: int = 20,
+        batch_size: int = 50,
+        interval: float = 0.05,
+        heartbeat: float = 1.0,
+        reconnect_every: int = 10,
+        token_ttl: int = 3600,
+    ) -> None:
+        self.batches = batches
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.reconnect_every = reconnect_every
+        self.token_ttl = token_ttl
+        self.payload = json.dumps({"events": EventGenerator(seed=1).events(batch_size)}).encode()
+        self.token_ids = itertools.count()
+        # token -> expiry time
+        self.tokens = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/oauth2/token", self.token)
+        app.router.add_get("/mra/stream/v2/events", self.stream)
+        return app
+
+    async def token(self, request: web.Request) -> web.Response:
+        await request.read()
+        token = f"token-{next(self.token_ids)}"
+        self.tokens[token] = time.time() + self.token_ttl
+        return web.json_response(
+            {"access_token": token, "token_type": "bearer", "expires_in": self.token_ttl}
+        )
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        if self.tokens.get(token, 0) < time.time():
+            return web.Response(status=401, text="token expired")
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        last_id = int(request.query.get("id") or 0)
+        sent = 0
+        try:
+            while True:
+                if last_id < self.batches:
+                    last_id += 1
+                    sent += 1
+                    await response.write(
+                        b"id: %d\nevent: events\ndata: %s\n\n" % (last_id, self.payload)
+                    )
+                    if sent % self.reconnect_every == 0:
+                        await response.write(b"event: reconnect\nretry: 100\ndata: {}\n\n")
+                        break
+                    await asyncio.sleep(self.interval)
+                else:
+                    await response.write(b"event: heartbeat\ndata: {}\n\n")
+                    await asyncio.sleep(self.heartbeat)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+
+def serve(port: int, ready=None, **kwargs) -> None:
+    async def start() -> None:
+        runner = web.AppRunner(MRAv2StandIn(**kwargs).app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", port, backlog=4096)
+        await site.start()
+        if ready is not None:
+            ready.put(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(start())
+
+
+def start_process(**kwargs):
+    """
+    Run the stand-in in a separate process, so its CPU is not measured with the client.
+
+    Returns:
+        (multiprocessing.Process, str): The server process and its base url.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(0, ready), kwargs=kwargs, daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ready.get(timeout=30)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    serve(args.port, batches=args.batches, batch_size=args.batch_size)
@@ -0,0 +1,71 @@
+"""
+Local receivers used as benchmark destinations.
+"""
+
+import socket, threading
+
+
+class TCPSink:
+    """
+    TCP server on localhost that accepts any number of connections and counts received bytes.
+    """
+
+    def __init__(self, port: int = 0) -> None:
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", port))
+        self.server.listen(128)
+        self.address = self.server.getsockname()
+
+        self.lock = threading.Lock()
+        self.bytes_received = 0
+        threading.Thread(target=self.__accept, daemon=True).start()
+
+    def __accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.__read, args=(conn,), daemon=True).start()
+
+    def __read(self, conn: socket.socket) -> None:
+        with conn:
+            while True:
+                data = conn.recv(1 << 20)
+                if not data:
+                    return
+                with self.lock:
+                    self.bytes_received += len(data)
+
+    def wait_for(self, byte_count: int, timeout: float = 30) -> None:
+        """
+        Block until at least byte_count bytes have been received in total.
+        """
+        event = threading.Event()
+        for _ in range(int(timeout * 1000)):
+            with self.lock:
+                if self.bytes_received >= byte_count:
+                    return
+            event.wait(0.001)
+        raise TimeoutError(f"received {self.bytes_received} of {byte_count} bytes")
+
+    def close(self) -> None:
+        self.server.close()
+
+
+class CountingStream:
+    """
+    Text or binary stream that discards what is written and counts the UTF-8 bytes, a
+    stand-in for the stdout read by Splunk.
+    """
+
+    def __init__(self) -> None:
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        self.bytes_written += len(data) if isinstance(data, bytes) else len(data.encode("utf-8"))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
@@ -0,0 +1,105 @@
+"""
+Soak test of the forwarding path: SSE parsing, JSON decoding, the duplicate filter,
+LEEF translation and syslog writes to a local TCP sink, with lag tracking, repeated
+for many rounds. After warm-up rounds, memory must stay flat: the traced memory may
+grow by at most --max-growth-kb and no loggers, handlers or sockets may be added.
+A memory report of the measured rounds is printed, the exit status is 1 on growth.
+
+--leak creates a logger per batch, the pattern that made memory creep in older
+releases, to show the soak test catches it.
+
+Usage:
+    python -m benchmarks.soak_memory [--rounds 10] [--batches 25] [--batch-size 100] [--leak]
+"""
+
+import argparse, json, logging, sys, time, tracemalloc
+
+from lookout_mra_client.event_dedup import EventDeduplicator
+from lookout_mra_client.event_forwarders.qradar_event_forwarder import QRadarEventForwarder
+from lookout_mra_client.lag_tracker import LagTracker
+from lookout_mra_client.memory_diagnostics import MemorySnapshot, growth, memory_report
+from lookout_mra_client.sse_client import SSEClient
+
+from .bench_sse_client import BufferedResponse
+from .event_generator import EventGenerator
+from .sinks import TCPSink
+
+
+def build_stream(generator: EventGenerator, batches: int, batch_size: int) -> bytes:
+    parts = []
+    for batch_id in range(batches):
+        data = json.dumps({"events": generator.events(batch_size)}).encode()
+        parts.append(b"id: %d\nevent: events\ndata: %s\n\n" % (batch_id, data))
+        parts.append(b"event: heartbeat\ndata: {}\n\n")
+    return b"".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10, help="measured rounds")
+    parser.add_argument("--warmup", type=int, default=2, help="rounds before the baseline")
+    parser.add_argument("--batches", type=int, default=25, help="event batches per round")
+    parser.add_argument("--batch-size", type=int, default=100)
+    # NOTE: Bounded caches, e.g. the LEEF header cache of up to 4096 entries, may still fill
+    parser.add_argument("--max-growth-kb", type=int, default=1024)
+    parser.add_argument("--leak", action="store_true", help="create a logger per batch")
+    args = parser.parse_args()
+
+    sink = TCPSink()
+    forwarder = QRadarEventForwarder(sink.address, "qradarLogSourceIdentifier", "soak", None)
+    deduplicator = EventDeduplicator(window=1000)
+    # NOTE: Generated events are old, no stale lag warnings
+    lag_tracker = LagTracker("soak", stale_lag=float("inf"))
+    generator = EventGenerator()
+
+    # NOTE: A frame per allocation, deeper tracebacks make the rounds many times slower
+    tracemalloc.start(1)
+    snapshots = []
+    start = time.perf_counter()
+    events = 0
+    for round in range(args.warmup + args.rounds):
+        if round >= args.warmup:
+            snapshots.append(MemorySnapshot())
+            if len(snapshots) > 2:
+                # Only the baseline and the last snapshot are diffed
+                snapshots[-2].snapshot = None
+        # NOTE: New events every round, the duplicate filter keeps its window full
+        stream = build_stream(generator, args.batches, args.batch_size)
+        for sse_event in SSEClient(BufferedResponse(stream)).streamEvents():
+            if sse_event.event != "events":
+                lag_tracker.heartbeat()
+                continue
+            received_at = time.time()
+            lag_tracker.received(sse_event.id)
+            batch = deduplicator.filter(json.loads(sse_event.data)["events"])
+            if args.leak:
+                logging.getLogger("MRAv2SyslogClient" + str(time.time()))
+            forwarder.write_all(batch, "soak")
+            deduplicator.record(batch)
+            lag_tracker.forwarded(batch, sse_event.id, received_at)
+            events += len(batch)
+    snapshots.append(MemorySnapshot())
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    forwarder.close()
+    sink.close()
+
+    print(f"{events:,} events in {args.warmup + args.rounds} rounds, {elapsed:.1f}s")
+    print(memory_report(snapshots, top=10))
+
+    change = growth(snapshots[0], snapshots[-1])
+    failures = [
+        f"{name} grew by {change[name]}"
+        for name in ("loggers", "handlers", "sockets")
+        if change[name] > 0
+    ]
+    if change["traced"] > args.max_growth_kb * 1024:
+        failures.append(f"traced memory grew by {change['traced'] / 1024:.0f} KiB")
+    if failures:
+        print("FAIL: " + ", ".join(failures))
+        sys.exit(1)
+    print(f"OK: traced memory grew by {change['traced'] / 1024:.0f} KiB over {args.rounds} rounds")
+
+
+if __name__ == "__main__":
+    main()
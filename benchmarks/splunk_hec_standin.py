@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Splunk HTTP Event Collector event endpoint, used by the HEC
+benchmark.
+
+Requests need the `Splunk <token>` authorization, and the concatenated event objects
+of the body are decoded and counted, gzip bodies are decompressed by aiohttp. Every
+`busy_every`-th request gets a 503 "Server is busy", as a collector with full queues
+answers. GET /stats returns the counts: requests, busy responses, events and body
+bytes received.
+
+Usage:
+    python -m benchmarks.splunk_hec_standin [--port 8088] [--token bench] [--busy-every 0]
+"""
+
+import argparse, asyncio, json, multiprocessing
+
+from aiohttp import web
+
+from lookout_mra_client.event_forwarders.splunk_hec_event_forwarder import HEC_EVENT_PATH
+
+
+class SplunkHECStandIn:
+    def __init__(self, token: str = "bench", busy_every: int = 0) -> None:
+        self.token = token
+        self.busy_every = busy_every
+        self.stats = {"requests": 0, "busy": 0, "events": 0, "body_bytes": 0}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post(HEC_EVENT_PATH, self.event)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    async def event(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self.stats["requests"] += 1
+        # NOTE: Bytes on the wire, the body is decompressed already
+        self.stats["body_bytes"] += request.content_length or 0
+        if request.headers.get("Authorization") != f"Splunk {self.token}":
+            return web.json_response({"text": "Invalid token", "code": 4}, status=403)
+        if self.busy_every and self.stats["requests"] % self.busy_every == 0:
+            self.stats["busy"] += 1
+            return web.json_response({"text": "Server is busy", "code": 9}, status=503)
+
+        text = body.decode("utf-8")
+        decoder = json.JSONDecoder()
+        events = 0
+        position = 0
+        try:
+            while position < len(text):
+                envelope, position = decoder.raw_decode(text, position)
+                if "event" not in envelope:
+                    return web.json_response(
+                        {"text": "Event field is required", "code": 12}, status=400
+                    )
+                events += 1
+                while position < len(text) and text[position].isspace():
+                    position += 1
+        except ValueError:
+            return web.json_response({"text": "Invalid data format", "code": 6}, status=400)
+        self.stats["events"] += events
+        return web.json_response({"text": "Success", "code": 0})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+def serve(port: int, ready=None, **kwargs) -> None:
+    async def start() -> None:
+        runner = web.AppRunner(SplunkHECStandIn(**kwargs).app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", port, backlog=4096)
+        await site.start()
+        if ready is not None:
+            ready.put(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(start())
+
+
+def start_process(**kwargs):
+    """
+    Run the stand-in in a separate process, so its CPU is not measured with the client.
+
+    Returns:
+        (multiprocessing.Process, str): The server process and its base url.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(0, ready), kwargs=kwargs, daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ready.get(timeout=30)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--token", default="bench")
+    parser.add_argument("--busy-every", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.port, token=args.token, busy_every=args.busy_every)
@@ -103,7 +103,9 @@ chmod +x "${INSTALL_DIR}/mrav2-connector" \
     "${INSTALL_DIR}/start-connector.sh" \
     "${INSTALL_DIR}/stop-connector.sh" \
     "${INSTALL_DIR}/restart-connector.sh" \
-    "${INSTALL_DIR}/status-connector.sh"
+    "${INSTALL_DIR}/status-connector.sh" \
+    "${INSTALL_DIR}/profile-connector.sh" \
+    "${INSTALL_DIR}/memory-connector.sh"
 
 echo ""
 echo "========================================"
@@ -0,0 +1,144 @@
+"""
+Module containing a duplicate filter for events MRA v2 delivers again.
+
+Streams resume from the id of the last whole batch, so a reconnect while a batch is
+being forwarded, or a restart between forwarding and the next checkpoint commit,
+delivers already forwarded events again. An `EventDeduplicator` remembers the ids of
+the last `window` forwarded events of one stream and drops events it has seen.
+
+The window is two generations of id sets: lookups check both, new ids go to the
+current one, and once it holds `window` ids the older generation is dropped. Every step
+is a set operation on the whole batch, well under a microsecond per event. With a file
+path every forwarded batch appends its ids to a journal, written before the batch is
+checkpointed, so a restarted connector still recognizes the events forwarded after the
+last checkpoint. The journal is rewritten with the two generations when one is dropped.
+"""
+
+import itertools, logging, os, threading
+from typing import List
+
+from .event_store.file_event_store import atomic_write
+from .lookout_logger import LOGGER_NAME
+
+# Number of most recently forwarded event ids remembered per stream
+DEFAULT_DEDUP_WINDOW = 10000
+
+
+class EventDeduplicator:
+    """
+    Drop events whose id is among the last `window` to 2 x `window` forwarded event ids
+    of a stream.
+
+    Args:
+        file_path (str, optional): Journal of forwarded event ids, kept across restarts.
+            Defaults to None, remembering ids in memory only.
+        window (int, optional): Number of forwarded event ids remembered.
+            Defaults to DEFAULT_DEDUP_WINDOW.
+    """
+
+    def __init__(self, file_path: str = None, window: int = DEFAULT_DEDUP_WINDOW) -> None:
+        self.file_path = file_path
+        self.window = window
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        # Ids of the current and the previous generation
+        self.ids = set()
+        self.previous_ids = set()
+        # Guards the generations, batches of one stream may be forwarded by several threads
+        self.lock = threading.Lock()
+        # Number of events dropped as duplicates
+        self.hits = 0
+
+        self.journal = None
+        if file_path:
+            self.__remember(self.__read())
+            self.__compact()
+
+    def filter(self, events: List[dict]) -> List[dict]:
+        """
+        Args:
+            events (List[dict]): MRA v2 events.
+
+        Returns:
+            List[dict]: Events not forwarded before, events without id are kept.
+        """
+        current, previous = self.ids, self.previous_ids
+        ids = [event.get("id") for event in events]
+        if current.isdisjoint(ids) and previous.isdisjoint(ids):
+            return events
+        new_events = [
+            event for event, id in zip(events, ids) if id not in current and id not in previous
+        ]
+        hits = len(events) - len(new_events)
+        if hits:
+            self.hits += hits
+            self.logger.debug(f"Dropped {hits} duplicate event(s)")
+        return new_events
+
+    def record(self, events: List[dict]) -> None:
+        """
+        Remember forwarded events, call once the events were written.
+
+        Args:
+            events (List[dict]): Forwarded MRA v2 events.
+        """
+        ids = [event["id"] for event in events if "id" in event]
+        if not ids:
+            return
+        with self.lock:
+            rotated = self.__remember(ids)
+            if self.journal:
+                try:
+                    if rotated:
+                        self.__compact()
+                    else:
+                        # NOTE: One write per batch, flushed to the OS so it survives a crash
+                        self.journal.write("\n".join(ids) + "\n")
+                        self.journal.flush()
+                except (OSError, ValueError) as e:
+                    self.logger.error(f"Failed to write event id journal {self.file_path}: {e}")
+
+    def close(self) -> None:
+        with self.lock:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+
+    def __remember(self, ids: List[str]) -> bool:
+        """
+        Add ids to the current generation, starting a new one once it is full.
+
+        Returns:
+            bool: True if the previous generation was dropped.
+        """
+        self.ids.update(ids)
+        if len(self.ids) < self.window:
+            return False
+        self.previous_ids, self.ids = self.ids, set()
+        return True
+
+    def __read(self) -> List[str]:
+        if not os.path.exists(self.file_path):
+            return []
+        try:
+            with open(self.file_path, "r") as journal:
+                # NOTE: A crash may leave a partial last line, a harmless unknown id
+                return journal.read().split()[-2 * self.window :]
+        except OSError as e:
+            self.logger.error(f"Ignoring unreadable event id journal {self.file_path}: {e}")
+            return []
+
+    def __compact(self) -> None:
+        """
+        Replace the journal with the ids of both generations and reopen it for appending.
+        """
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        # NOTE: Previous generation first, a restart reads the newest 2 x window ids
+        data = "\n".join(itertools.chain(self.previous_ids, self.ids)) + "\n"
+        try:
+            atomic_write(self.file_path, data)
+            self.journal = open(self.file_path, "a")
+        except OSError as e:
+            self.logger.error(f"Failed to write event id journal {self.file_path}: {e}")
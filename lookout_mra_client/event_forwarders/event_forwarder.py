@@ -1,11 +1,62 @@
+import asyncio
+
+
 class EventForwarder:
     """
     Generic interface for standardization of MRAv2StreamHandler
     """
 
+    # Events are decoded with the JSON text they were received as, see event_passthrough
+    passthrough = False
+
     def write_all(self, events: list, entName: str):
+        """
+        Write a batch of events. Streams checkpoint the batch and record its events as
+        forwarded once this returns, so a batch that was not delivered must raise.
+        """
         for event in events:
             self.write(event, entName)
 
+    async def write_all_async(self, events: list, entName: str):
+        """
+        Write events from an asyncio event loop, see MRAv2AsyncStreamThread.
+
+        Forwarders without non-blocking output run write_all in the default executor,
+        so a slow destination does not stall the other streams on the loop.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.write_all, events, entName)
+
+    def heartbeat(self, entName: str):
+        """
+        Called on every heartbeat of a stream, e.g. to write output buffered while it is quiet.
+        """
+        pass
+
+    async def heartbeat_async(self, entName: str):
+        """
+        Heartbeat from an asyncio event loop, see MRAv2AsyncStreamThread.
+        """
+        self.heartbeat(entName)
+
+    def flush(self):
+        """
+        Write output buffered by write_all, called before checkpoints are committed so
+        no checkpointed event is only buffered, see CheckpointStore.before_commit.
+        """
+        pass
+
     def write(self, _event: dict, _entName: str):
         raise NotImplementedError("Event forwarders must implement '.write()'")
+
+    def close(self):
+        """
+        Release resources held by the forwarder, e.g. connections or worker processes.
+        """
+        pass
+
+    async def close_async(self):
+        """
+        Release resources bound to the asyncio event loop, called before the loop stops.
+        """
+        pass
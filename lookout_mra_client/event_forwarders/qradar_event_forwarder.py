@@ -1,8 +1,13 @@
-import time
+import asyncio, logging, threading, time
 
 from .event_forwarder import EventForwarder
+from ..lookout_logger import LOGGER_NAME
+from ..metrics import SEND_SECONDS, TRANSLATE_SECONDS
 from ..event_translators.leef_translator import LeefTranslator
+from ..event_translators.translation_pool import TranslationPool
 from ..syslog_client import SyslogClient
+from ..syslog_spool import SyslogSpool
+from ..syslog_writer import AsyncSyslogWriter, SYSLOG_FRAMING_NUL
 
 
 class QRadarEventForwarder(EventForwarder):
@@ -10,12 +15,43 @@ class QRadarEventForwarder(EventForwarder):
     Lookout's QRadar plugin utilizes a syslog connection to forward events for ingestion.
     """
 
-    def __init__(self, qradar_address, log_identifier_key, log_identifier, callback):
+    def __init__(
+        self,
+        qradar_address,
+        log_identifier_key,
+        log_identifier,
+        callback,
+        use_event_time=False,
+        framing=SYSLOG_FRAMING_NUL,
+        translation_workers=0,
+        connections=1,
+        spool: SyslogSpool = None,
+    ):
         self.qradar_address = qradar_address
-        self.event_translator = LeefTranslator(mra_v2=True)
+        # Disk spool for batches written while QRadar is unavailable
+        self.spool = spool
+        # Syslog connections shared by all streams writing through this forwarder
+        self.connections = connections
+        self.framing = framing
+        self.event_translator = LeefTranslator(mra_v2=True, use_event_time=use_event_time)
+        # Optionally translate large batches in worker processes
+        self.translation_pool: TranslationPool = None
+        batch_formatter = self.event_translator.encodeEvents
+        if translation_workers > 0:
+            self.translation_pool = TranslationPool(
+                translation_workers, mra_v2=True, use_event_time=use_event_time
+            )
+            batch_formatter = self.translation_pool.encodeEvents
+        self.batch_formatter = batch_formatter
         self.log_identifier_key = log_identifier_key
         self.log_identifier = log_identifier
         self.callback = callback
+        self.syslog_client: SyslogClient = None
+        # Guards creating the syslog client, the forwarder may be shared by several streams
+        self.lock = threading.Lock()
+        # Non-blocking writer used by write_all_async, owned by the event loop
+        self.async_writer: AsyncSyslogWriter = None
+        self.logger = logging.getLogger(LOGGER_NAME)
 
     def write_all(self, events: list, entName: str):
         """
@@ -24,15 +60,74 @@ class QRadarEventForwarder(EventForwarder):
         Args:
             event (dict): MRA v2 event
 
-        Initialize Syslog Client here to avoid the syslog socket getting stale
+        The syslog client is created on first use and kept for the lifetime of the
+        forwarder, it reconnects by itself when the connection goes stale.
         JIRA: EMM-8312: Events stop appearing in QRadar if there has been long (~15 minute)
         break between events
         """
-        client_name = "MRAv2SyslogClient" + str(time.time())
-        syslog_client = SyslogClient(
-            client_name, self.event_translator.formatEvent, self.qradar_address
-        )
+        if self.syslog_client is None:
+            with self.lock:
+                if self.syslog_client is None:
+                    self.syslog_client = SyslogClient(
+                        "MRAv2SyslogClient",
+                        self.event_translator.formatEvent,
+                        self.qradar_address,
+                        batch_formatter=self.batch_formatter,
+                        framing=self.framing,
+                        connections=self.connections,
+                        spool=self.spool,
+                    )
 
+        self.__set_defaults(events, entName)
+
+        # Write the whole batch to syslog at once
+        self.syslog_client.write_all(events)
+
+        if self.callback:
+            self.callback(events)
+
+    async def write_all_async(self, events: list, entName: str):
+        """
+        Write MRA v2 events to QRadar without blocking the event loop.
+
+        Args:
+            events (list): MRA v2 events
+            entName (str): Enterprise name.
+
+        Raises:
+            OSError: If the events could not be written.
+        """
+        if self.spool is not None:
+            # NOTE: Spooled batches are drained by a thread over the blocking writer,
+            #   so batches keep their order through the spool.
+            return await super().write_all_async(events, entName)
+
+        if self.async_writer is None:
+            self.async_writer = AsyncSyslogWriter(self.qradar_address, self.framing)
+
+        self.__set_defaults(events, entName)
+
+        start = time.perf_counter()
+        # NOTE: Translated off the loop, a large batch would stall the other streams
+        loop = asyncio.get_running_loop()
+        messages = await loop.run_in_executor(None, self.batch_formatter, events)
+        translated = time.perf_counter()
+        TRANSLATE_SECONDS.observe(translated - start)
+        try:
+            await self.async_writer.send(messages)
+            SEND_SECONDS.observe(time.perf_counter() - translated)
+        except OSError as e:
+            # NOTE: Same as SyslogClient, the batch is not forwarded and must not be
+            #   checkpointed, the next send opens a new connection
+            self.logger.error(
+                f"MRAv2SyslogClient - Failed to write {len(messages)} event(s) to syslog: {e}"
+            )
+            raise
+
+        if self.callback:
+            self.callback(events)
+
+    def __set_defaults(self, events: list, entName: str):
         for event in events:
             # set defaults if not present
             event["entName"] = entName
@@ -41,7 +136,13 @@ class QRadarEventForwarder(EventForwarder):
             if self.log_identifier_key:
                 event[self.log_identifier_key] = self.log_identifier
 
-            # Write to syslog
-            syslog_client.write(event)
+    async def close_async(self):
+        if self.async_writer:
+            self.async_writer.close()
+            self.async_writer = None
 
-        self.callback(events)
+    def close(self):
+        if self.syslog_client:
+            self.syslog_client.close()
+        if self.translation_pool:
+            self.translation_pool.close()
@@ -1,23 +1,93 @@
-import json, sys
+import asyncio, json, logging, sys, threading, time
+from typing import Optional
+
 from .event_forwarder import EventForwarder
+from ..event_passthrough import encode_events
+from ..lookout_logger import LOGGER_NAME
 
 # Splunk requires a `\r\n` at the end of each event emitted.
 SPLUNK_EVENT_DELIMITER = "\r\n"
+# Buffered bytes written to stdout at once, 0 writes every batch before write_all returns
+DEFAULT_FLUSH_BYTES = 0
+# Longest time buffered events wait for more, so a quiet stream still flushes promptly
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
 
 
 class SplunkEventForwarder(EventForwarder):
     """
     Splunk indexes the STDOUT of a data input script
+
+    Events are serialized a batch at a time and written to the binary stdout with a
+    single call. With flush_bytes set, batches are buffered and written once the buffer
+    holds flush_bytes, once its oldest event waited flush_interval, on a heartbeat of
+    MRA v2, or when `flush` is called before checkpoints are committed. With passthrough,
+    events are written as the JSON text they were received as, see event_passthrough.
+
+    Args:
+        callback (callable, optional): Called with every written batch. Defaults to None.
+        stream (BinaryIO, optional): Output, defaults to the binary stdout.
+        flush_bytes (int, optional): Buffered bytes that trigger a write, 0 to write
+            every batch before write_all returns. Defaults to DEFAULT_FLUSH_BYTES.
+        flush_interval (float, optional): Seconds buffered events wait at most, 0 to write
+            every batch. Defaults to DEFAULT_FLUSH_INTERVAL.
+        flush_on_heartbeat (bool, optional): Write buffered events on every heartbeat.
+            Defaults to True.
+        passthrough (bool, optional): Write events without encoding them again.
+            Defaults to True.
     """
 
-    def __init__(self, callback=None):
+    def __init__(
+        self,
+        callback=None,
+        stream=None,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_on_heartbeat: bool = True,
+        passthrough: bool = True,
+    ):
         self.callback = callback
+        self.passthrough = passthrough
+        # NOTE: Text written to sys.stdout elsewhere is flushed before each binary write
+        self.text_stream = sys.stdout if stream is None else None
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.flush_on_heartbeat = flush_on_heartbeat
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.buffer = bytearray()
+        # Time the oldest buffered event was added
+        self.buffered_since: Optional[float] = None
+        # Guards the buffer and the stream, the forwarder may be shared by several streams
+        self.lock = threading.Lock()
+        # Flushes buffers older than flush_interval, started on first use
+        self.flusher: Optional[threading.Thread] = None
+        self.closed = threading.Event()
+        # Failed write of the flusher, raised by the next write
+        self.error: Optional[OSError] = None
 
     def write_all(self, events, entName=""):
-        super().write_all(events, entName)
+        """
+        Write a batch of MRA v2 events to Splunk
+
+        Args:
+            events (list): MRA v2 events
+            entName (str): Enterprise name.
+        """
+        if events:
+            self.__append(self.__encode(events, entName))
         if self.callback:
             self.callback(events)
 
+    async def heartbeat_async(self, entName: str):
+        if self.flush_on_heartbeat and self.buffer:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.heartbeat, entName)
+
+    def heartbeat(self, entName: str):
+        if self.flush_on_heartbeat:
+            self.flush()
+
     def write(self, event: dict, entName: str = "") -> None:
         """
         Write a MRA v2 event to Splunk
@@ -26,6 +96,83 @@ class SplunkEventForwarder(EventForwarder):
             event (dict): MRA v2 event
             entName (str): Enterprise name.
         """
-        event["entName"] = entName
-        event["type"] = event.get("type", "UNKNOWN")
-        sys.stdout.write(json.dumps(event) + SPLUNK_EVENT_DELIMITER)
+        self.__append(self.__encode([event], entName))
+
+    def flush(self) -> None:
+        """
+        Write the buffered events to the stream.
+        """
+        with self.lock:
+            self.__flush()
+
+    def close(self):
+        self.closed.set()
+        if self.flusher:
+            self.flusher.join()
+        try:
+            self.flush()
+        except OSError as e:
+            self.logger.error(f"Failed to write {len(self.buffer)} buffered bytes to Splunk: {e}")
+
+    def __encode(self, events: list, entName: str) -> bytes:
+        if self.passthrough:
+            # NOTE: Passed through text may hold non-ASCII characters
+            lines = encode_events(events, entName)
+            return "".join([line + SPLUNK_EVENT_DELIMITER for line in lines]).encode("utf-8")
+        for event in events:
+            event["entName"] = entName
+            event["type"] = event.get("type", "UNKNOWN")
+        # NOTE: json.dumps escapes non-ASCII characters, the text is ASCII already
+        dumps = json.dumps
+        return "".join([dumps(event) + SPLUNK_EVENT_DELIMITER for event in events]).encode("ascii")
+
+    def __append(self, data: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        with self.lock:
+            if self.buffered_since is None:
+                self.buffered_since = time.monotonic()
+            self.buffer += data
+            if len(self.buffer) >= self.flush_bytes or not self.flush_interval:
+                self.__flush()
+                return
+        if self.flusher is None:
+            with self.lock:
+                if self.flusher is None:
+                    self.flusher = threading.Thread(
+                        target=self.__flush_periodically, name="SplunkFlusher", daemon=True
+                    )
+                    self.flusher.start()
+
+    def __flush(self) -> None:
+        """
+        Write the buffer with one call, the caller holds the lock.
+        """
+        if not self.buffer:
+            return
+        if self.text_stream is not None:
+            self.text_stream.flush()
+        self.stream.write(bytes(self.buffer))
+        # NOTE: Cleared only once written, a failed write is retried by the next flush.
+        #   Data the stream took is not written again if only its flush fails.
+        self.buffer.clear()
+        self.buffered_since = None
+        self.stream.flush()
+
+    def __flush_periodically(self) -> None:
+        delay = self.flush_interval
+        while not self.closed.wait(delay):
+            with self.lock:
+                waited = 0.0
+                if self.buffered_since is not None:
+                    waited = time.monotonic() - self.buffered_since
+                if waited >= self.flush_interval:
+                    try:
+                        self.__flush()
+                    except OSError as e:
+                        # NOTE: E.g. Splunk stopped reading, the stream stops on its next write
+                        self.logger.error(f"Failed to write events to Splunk: {e}")
+                        self.error = e
+                        return
+                    waited = 0.0
+                delay = self.flush_interval - waited
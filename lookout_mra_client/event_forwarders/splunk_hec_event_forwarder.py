@@ -0,0 +1,230 @@
+import json, logging, random, threading, time, zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .event_forwarder import EventForwarder
+from ..event_passthrough import encode_events
+from ..lag_tracker import event_timestamp
+from ..lookout_logger import LOGGER_NAME
+from ..metrics import HEC_BYTES_SENT, HEC_REQUESTS, HEC_SEND_SECONDS
+
+# Event endpoint of the HTTP Event Collector, accepts concatenated JSON event objects
+HEC_EVENT_PATH = "/services/collector/event"
+# Requests sent at the same time by all streams, over as many keep-alive connections
+DEFAULT_HEC_IN_FLIGHT = 4
+# Uncompressed bytes of events sent in one request
+DEFAULT_HEC_BATCH_BYTES = 1024 * 1024
+# gzip level of request bodies, 0 to send them uncompressed
+DEFAULT_HEC_COMPRESSLEVEL = 1
+# Retries of a request the collector rejected as busy, that failed to connect or timed out
+DEFAULT_HEC_RETRIES = 5
+HEC_RETRY_DELAY = 0.5  # seconds
+HEC_MAX_RETRY_DELAY = 30  # seconds
+HEC_TIMEOUT = 30  # seconds
+# Statuses of a busy collector, e.g. full indexer queues
+HEC_RETRY_STATUSES = (503,)
+
+
+class SplunkHECEventForwarder(EventForwarder):
+    """
+    Splunk HTTP Event Collector forwarder.
+
+    A batch is serialized as concatenated HEC event objects, split into requests of up
+    to batch_bytes, gzip compressed, and sent over a pool of keep-alive connections with
+    up to in_flight requests at a time, shared by all streams. write_all returns once
+    every request of the batch was accepted, so checkpoints and the dedup journal never
+    pass unsent events. A stream therefore only has several requests in flight for a
+    batch over batch_bytes, or with several forward threads; in_flight pays off with
+    many tenants or forward threads, not for a single stream of small batches.
+    Requests the collector rejects as busy, that fail to connect or time out, are
+    retried with exponential backoff. With passthrough, events are sent as the JSON
+    text they were received as, see event_passthrough.
+
+    Args:
+        url (str): Collector base url, e.g. https://splunk.example.com:8088.
+        token (str): HEC token.
+        index (str, optional): Index of the events, the token's default if empty.
+        source (str, optional): Source of the events. Defaults to "mrav2".
+        sourcetype (str, optional): Sourcetype of the events. Defaults to "_json".
+        in_flight (int, optional): Requests sent at the same time by all streams.
+            Defaults to DEFAULT_HEC_IN_FLIGHT.
+        batch_bytes (int, optional): Uncompressed bytes of one request.
+            Defaults to DEFAULT_HEC_BATCH_BYTES.
+        compresslevel (int, optional): gzip level, 0 for no compression.
+            Defaults to DEFAULT_HEC_COMPRESSLEVEL.
+        retries (int, optional): Retries of a busy, unreachable or timed out collector.
+            Defaults to DEFAULT_HEC_RETRIES.
+        verify (bool, optional): Verify the collector's TLS certificate. Defaults to True.
+        callback (callable, optional): Called with every written batch. Defaults to None.
+        passthrough (bool, optional): Send events without encoding them again.
+            Defaults to True.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        index: str = "",
+        source: str = "mrav2",
+        sourcetype: str = "_json",
+        in_flight: int = DEFAULT_HEC_IN_FLIGHT,
+        batch_bytes: int = DEFAULT_HEC_BATCH_BYTES,
+        compresslevel: int = DEFAULT_HEC_COMPRESSLEVEL,
+        retries: int = DEFAULT_HEC_RETRIES,
+        verify: bool = True,
+        callback=None,
+        passthrough: bool = True,
+    ):
+        self.passthrough = passthrough
+        self.url = url.rstrip("/") + HEC_EVENT_PATH
+        self.batch_bytes = batch_bytes
+        self.compresslevel = compresslevel
+        self.retries = retries
+        self.callback = callback
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        # Fields of every HEC event object besides the event and its time
+        self.metadata = {"source": source, "sourcetype": sourcetype}
+        if index:
+            self.metadata["index"] = index
+        # Start of every HEC event object of a passed through event, up to its time
+        self.envelope_start = json.dumps(self.metadata)[:-1] + ", "
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Splunk {token}"})
+        if compresslevel:
+            self.session.headers.update({"Content-Encoding": "gzip"})
+        self.session.verify = verify
+        # NOTE: One keep-alive connection per request in flight, never more
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=in_flight, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=in_flight, thread_name_prefix="SplunkHEC")
+        self.closed = threading.Event()
+
+    def write_all(self, events: list, entName: str):
+        """
+        Write a batch of MRA v2 events to Splunk
+
+        Args:
+            events (list): MRA v2 events
+            entName (str): Enterprise name.
+
+        Raises:
+            requests.RequestException: If a request failed, also after its retries.
+        """
+        if events:
+            requests_sent = [
+                self.executor.submit(self.__send, payload)
+                for payload in self.__payloads(events, entName)
+            ]
+            # NOTE: Waits for every request, the first failure is raised
+            for request in requests_sent:
+                request.result()
+        if self.callback:
+            self.callback(events)
+
+    def write(self, event: dict, entName: str):
+        self.write_all([event], entName)
+
+    def close(self):
+        self.closed.set()
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __payloads(self, events: list, entName: str) -> List[bytes]:
+        """
+        Returns:
+            List[bytes]: Concatenated HEC event objects of up to batch_bytes each.
+        """
+        payloads = []
+        parts = []
+        size = 0
+        for part in self.__envelopes(events, entName):
+            if parts and size + len(part) > self.batch_bytes:
+                payloads.append("".join(parts).encode("utf-8"))
+                parts = []
+                size = 0
+            parts.append(part)
+            size += len(part)
+        if parts:
+            payloads.append("".join(parts).encode("utf-8"))
+        return payloads
+
+    def __envelopes(self, events: list, entName: str) -> List[str]:
+        """
+        Returns:
+            List[str]: The HEC event object of each event.
+        """
+        if self.passthrough:
+            envelopes = []
+            for event, text in zip(events, encode_events(events, entName)):
+                created = event_timestamp(event.get("created_time"))
+                time_field = "" if created is None else f'"time": {round(created, 3)}, '
+                envelopes.append(self.envelope_start + time_field + '"event": ' + text + "}")
+            return envelopes
+
+        envelopes = []
+        dumps = json.dumps
+        for event in events:
+            event["entName"] = entName
+            event["type"] = event.get("type", "UNKNOWN")
+            envelope = dict(self.metadata, event=event)
+            created = event_timestamp(event.get("created_time"))
+            if created is not None:
+                envelope["time"] = round(created, 3)
+            envelopes.append(dumps(envelope))
+        return envelopes
+
+    def __send(self, payload: bytes) -> None:
+        if self.compresslevel:
+            compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            payload = compressor.compress(payload) + compressor.flush()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = self.session.post(self.url, data=payload, timeout=HEC_TIMEOUT)
+                HEC_REQUESTS.labels(str(response.status_code)).inc()
+                HEC_BYTES_SENT.inc(len(payload))
+                if response.status_code not in HEC_RETRY_STATUSES:
+                    if not response.ok:
+                        self.logger.error(
+                            f"Splunk HEC rejected {len(payload)} bytes, status code: "
+                            f"{response.status_code}, response: {response.text}"
+                        )
+                    response.raise_for_status()
+                    HEC_SEND_SECONDS.observe(time.perf_counter() - start)
+                    return
+                error = f"status code {response.status_code}, response: {response.text}"
+                retry_after = response.headers.get("Retry-After")
+            # NOTE: A request that timed out may have been indexed, its retry is a duplicate
+            #   in Splunk rather than a lost batch
+            except (requests.ConnectionError, requests.Timeout) as e:
+                HEC_REQUESTS.labels("error").inc()
+                if attempt >= self.retries or self.closed.is_set():
+                    raise
+                error = str(e)
+            else:
+                if attempt >= self.retries or self.closed.is_set():
+                    response.raise_for_status()
+
+            delay = self.__retry_delay(attempt, retry_after)
+            attempt += 1
+            self.logger.warning(
+                f"Splunk HEC unavailable, retry {attempt} of {self.retries} "
+                f"in {delay:.1f}s: {error}"
+            )
+            if self.closed.wait(delay):
+                self.logger.warning("Splunk HEC forwarder closed while retrying")
+
+    def __retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        delay = HEC_RETRY_DELAY * 2 ** attempt
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        # NOTE: Jitter, so requests in flight do not all retry at once
+        return min(delay, HEC_MAX_RETRY_DELAY) * random.uniform(0.5, 1.0)
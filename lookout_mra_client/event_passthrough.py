@@ -0,0 +1,237 @@
+"""
+Module containing the JSON passthrough of MRA v2 events, for forwarders writing the
+events as JSON, e.g. to Splunk.
+
+Without passthrough, a batch is decoded with json.loads and every event is encoded
+again with json.dumps, only to add `entName` and `type`. With passthrough the
+`events` array of the batch is walked with JSONDecoder.raw_decode, and each event
+keeps the text it was received as, see `RawEvent`. `encode_events` splices the extra
+fields into that text instead of encoding the events again.
+
+Events are still decoded, the deduplicator, the lag tracker and the HEC time need
+their fields, but encoding them again, the larger cost, is skipped.
+
+`EventsDecoder` walks the array the same way while a large batch is still received,
+see SSEClient's stream_over.
+"""
+
+import json, re
+from typing import List
+
+# Start of a batch, anything else is decoded with json.loads
+EVENTS_ARRAY = re.compile(r'\s*\{\s*"events"\s*:\s*\[')
+# Separators between the events of the array
+EVENT_SEPARATOR = re.compile(r"[\s,]*")
+# End of a batch after the array
+EVENTS_END = re.compile(r"\s*\}\s*")
+# Characters of a batch without "[" after which it is not shaped {"events": [...]}
+EVENTS_ARRAY_MAX_START = 64
+# Type of events without one, as set by the forwarders
+UNKNOWN_EVENT_TYPE = "UNKNOWN"
+
+decoder = json.JSONDecoder()
+
+
+class RawEvent(dict):
+    """
+    Decoded MRA v2 event, with the JSON text it was received as.
+    """
+
+    __slots__ = ("raw",)
+
+
+def load_events(data: str) -> List[dict]:
+    """
+    Args:
+        data (str): SSE data of an events batch.
+
+    Returns:
+        List[dict]: The events of the batch, without their JSON text.
+    """
+    return json.loads(data).get("events", [])
+
+
+def decode_events(data: str) -> List[dict]:
+    """
+    Args:
+        data (str): SSE data of an events batch.
+
+    Returns:
+        List[dict]: The RawEvents of the batch, plain dicts if it is not shaped
+            {"events": [...]}.
+
+    Raises:
+        ValueError: If the batch is not valid JSON.
+    """
+    match = EVENTS_ARRAY.match(data)
+    if match is None:
+        return json.loads(data).get("events", [])
+
+    events = []
+    raw_decode = decoder.raw_decode
+    separator = EVENT_SEPARATOR.match
+    position = match.end()
+    while True:
+        position = separator(data, position).end()
+        if data.startswith("]", position):
+            break
+        event, end = raw_decode(data, position)
+        if not isinstance(event, dict):
+            return json.loads(data).get("events", [])
+        event = RawEvent(event)
+        event.raw = data[position:end]
+        events.append(event)
+        position = end
+    if not EVENTS_END.fullmatch(data, position + 1):
+        # NOTE: Keys after the array are ignored, the batch is decoded only to validate them
+        json.loads(data)
+    return events
+
+
+class EventsDecoder:
+    """
+    Incremental decoder of an events batch received in parts. Events are returned as
+    soon as their JSON is complete, only the text of an incomplete event is kept.
+    Batches not shaped {"events": [...]} are decoded whole by close.
+
+    NOTE: An incomplete event is decoded again once a part may complete it, an event
+    spanning many parts costs more than one decode.
+
+    Args:
+        passthrough (bool, optional): Decode RawEvents, see decode_events.
+            Defaults to False.
+    """
+
+    # Before the array, in the array, after it, and batches decoded by close
+    START, EVENTS, END, WHOLE = range(4)
+
+    def __init__(self, passthrough: bool = False) -> None:
+        self.passthrough = passthrough
+        self.state = self.START
+        # Text not decoded yet, from position
+        self.text = ""
+        self.position = 0
+        # Text after the array, or of a batch decoded by close
+        self.parts = []
+        # Whether the text holds an incomplete event
+        self.incomplete = False
+
+    def feed(self, text: str) -> List[dict]:
+        """
+        Args:
+            text (str): Next part of the batch.
+
+        Returns:
+            List[dict]: The events the part completes.
+        """
+        if self.state in (self.END, self.WHOLE):
+            self.parts.append(text)
+            return []
+        self.text = self.text[self.position :] + text
+        self.position = 0
+        if self.state == self.START:
+            if "[" not in self.text and len(self.text) < EVENTS_ARRAY_MAX_START:
+                return []
+            match = EVENTS_ARRAY.match(self.text)
+            if match is None:
+                self.state = self.WHOLE
+                self.parts.append(self.text)
+                self.text = ""
+                return []
+            self.state = self.EVENTS
+            self.position = match.end()
+        elif self.incomplete and "}" not in text:
+            # NOTE: Every event ends with "}", the part cannot complete one
+            return []
+        return self.__decode()
+
+    def close(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: Events of a batch decoded whole, the others were returned by feed.
+
+        Raises:
+            ValueError: If the batch is incomplete or not valid JSON.
+        """
+        if self.state == self.START:
+            self.parts.append(self.text)
+        if self.state in (self.START, self.WHOLE):
+            data = "".join(self.parts)
+            return decode_events(data) if self.passthrough else load_events(data)
+        if self.state == self.EVENTS:
+            raise ValueError("Incomplete events batch, the events array is not closed")
+
+        rest = "".join(self.parts)
+        if not EVENTS_END.fullmatch(rest):
+            rest = rest.strip()
+            if not rest.startswith(","):
+                raise ValueError(f"Invalid end of events batch: {rest[:32]!r}")
+            # NOTE: Keys after the array are ignored, they are decoded only to validate them
+            json.loads("{" + rest[1:])
+        return []
+
+    def __decode(self) -> List[dict]:
+        events = []
+        text = self.text
+        position = self.position
+        raw_decode = decoder.raw_decode
+        separator = EVENT_SEPARATOR.match
+        passthrough = self.passthrough
+        self.incomplete = False
+        while True:
+            position = separator(text, position).end()
+            if position == len(text):
+                break
+            if text[position] == "]":
+                self.state = self.END
+                self.parts.append(text[position + 1 :])
+                text = ""
+                position = 0
+                break
+            try:
+                event, end = raw_decode(text, position)
+            except ValueError:
+                self.incomplete = True
+                break
+            if not isinstance(event, dict):
+                if end == len(text):
+                    # NOTE: E.g. a number, the next part may continue it
+                    self.incomplete = True
+                    break
+            elif passthrough:
+                event = RawEvent(event)
+                event.raw = text[position:end]
+            events.append(event)
+            position = end
+        self.text = text
+        self.position = position
+        return events
+
+
+def encode_events(events: List[dict], entName: str) -> List[str]:
+    """
+    Args:
+        events (List[dict]): MRA v2 events, RawEvents or plain dicts.
+        entName (str): Enterprise name.
+
+    Returns:
+        List[str]: Each event as one line of JSON with `entName`, and `type` if it has none.
+    """
+    ent_name_fields = '{"entName": ' + json.dumps(entName) + ", "
+    unknown_type_field = '"type": "' + UNKNOWN_EVENT_TYPE + '", '
+    encoded = []
+    for event in events:
+        raw = getattr(event, "raw", None)
+        if raw is None or not event or "entName" in event:
+            event["entName"] = entName
+            event["type"] = event.get("type", UNKNOWN_EVENT_TYPE)
+            encoded.append(json.dumps(event))
+            continue
+        # NOTE: JSON strings cannot hold raw line breaks, any in the text are whitespace
+        if "\n" in raw or "\r" in raw:
+            raw = raw.replace("\r", " ").replace("\n", " ")
+        if "type" in event:
+            encoded.append(ent_name_fields + raw[1:])
+        else:
+            encoded.append(ent_name_fields + unknown_type_field + raw[1:])
+    return encoded
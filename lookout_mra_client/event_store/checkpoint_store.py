@@ -0,0 +1,252 @@
+"""
+Module containing a group-committed checkpoint file shared by all streams of the process.
+
+Streams update their position in memory after every forwarded batch. A background
+thread writes all changed positions in one atomic file replace, at most every
+`commit_interval` seconds, or earlier once `commit_events` events were checkpointed
+since the last commit. At high event rates this is one fsync per interval for all
+tenants instead of one per batch per tenant.
+"""
+
+import json, logging, os, threading, time
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List
+
+from .event_store import EventStore
+from .file_event_store import atomic_write
+from ..lookout_logger import LOGGER_NAME
+from ..metrics import CHECKPOINT_LAG_SECONDS, CHECKPOINT_PENDING_EVENTS
+
+# Maximum seconds a checkpoint stays in memory only
+DEFAULT_COMMIT_INTERVAL = 1.0
+# Commit before the interval once this many events were checkpointed
+DEFAULT_COMMIT_EVENTS = 10000
+
+# Index of the fields of a pending checkpoint, [id, event count, fetched at]
+PENDING_ID, PENDING_EVENTS, PENDING_FETCHED_AT = range(3)
+
+
+class CheckpointStore:
+    """
+    JSON file of the last forwarded event id per stream, committed atomically in groups.
+
+    Subclasses store checkpoints elsewhere by overriding `key`, `read` and `write`,
+    the grouping of commits is shared.
+
+    Args:
+        file_path (str): Checkpoint file.
+        commit_interval (float, optional): Seconds between commits while checkpoints
+            change. Defaults to DEFAULT_COMMIT_INTERVAL.
+        commit_events (int, optional): Checkpointed events that trigger an early commit.
+            Defaults to DEFAULT_COMMIT_EVENTS.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+        commit_events: int = DEFAULT_COMMIT_EVENTS,
+    ) -> None:
+        self.file_path = file_path
+        self.commit_interval = commit_interval
+        self.commit_events = commit_events
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.checkpoints = self.read()
+        # Checkpoints changed since the last commit, key -> [id, event count, fetched at]
+        self.pending: Dict[Hashable, List] = {}
+        # Guards checkpoints and pending
+        self.lock = threading.Lock()
+        # Serializes commits, held while writing
+        self.commit_lock = threading.Lock()
+        self.pending_events = 0
+        # When the oldest pending checkpoint was recorded
+        self.pending_since = time.monotonic()
+        # Number of commits, for monitoring the I/O rate
+        self.commits = 0
+        # Called before the checkpoints of a commit are written, e.g. EventForwarder.flush
+        #   to write the events they cover. A failure keeps the checkpoints pending.
+        self.before_commit: List[Callable[[], None]] = []
+
+        self.wake = threading.Event()
+        self.closed = False
+        self.committer = threading.Thread(
+            target=self.__commit_loop, name="CheckpointCommitter", daemon=True
+        )
+        self.committer.start()
+
+        CHECKPOINT_PENDING_EVENTS.set_function(lambda: self.pending_events)
+        CHECKPOINT_LAG_SECONDS.set_function(self.lag)
+
+    def key(self, ent_name: str, stream_type: str = "") -> Hashable:
+        """
+        Args:
+            ent_name (str): Enterprise name.
+            stream_type (str, optional): Event types of the stream, e.g. "THREAT,DEVICE".
+
+        Returns:
+            Hashable: Key of the stream's checkpoint. The JSON file keeps one
+                position per enterprise.
+        """
+        return ent_name
+
+    def load(self, ent_name: str, stream_type: str = "") -> str:
+        """
+        Args:
+            ent_name (str): Enterprise name.
+            stream_type (str, optional): Event types of the stream, e.g. "THREAT,DEVICE".
+
+        Returns:
+            str: Last checkpointed event id of the stream, "" if there is none.
+        """
+        with self.lock:
+            return self.checkpoints.get(self.key(ent_name, stream_type), "")
+
+    def checkpoint(self, key: Hashable, id: str, event_count: int = 0) -> None:
+        """
+        Record the last forwarded event id of a stream, committed with the next group.
+
+        Args:
+            key (Hashable): Stream key, see `key`.
+            id (str): Last forwarded event id.
+            event_count (int, optional): Events forwarded since the previous checkpoint.
+                Defaults to 0.
+        """
+        id = str(id)
+        fetched_at = datetime.now()
+        with self.lock:
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.checkpoints[key] = id
+            pending = self.pending.get(key)
+            if pending is None:
+                self.pending[key] = [id, event_count, fetched_at]
+            else:
+                pending[PENDING_ID] = id
+                pending[PENDING_EVENTS] += event_count
+                pending[PENDING_FETCHED_AT] = fetched_at
+            self.pending_events += event_count
+            if self.pending_events >= self.commit_events:
+                self.wake.set()
+
+    def lag(self) -> float:
+        """
+        Returns:
+            float: Seconds since the oldest checkpoint not committed yet was recorded,
+                0 if all checkpoints are committed.
+        """
+        with self.lock:
+            return time.monotonic() - self.pending_since if self.pending else 0.0
+
+    def eventStore(self, ent_name: str, stream_type: str = "") -> "CheckpointEventStore":
+        """
+        Args:
+            ent_name (str): Enterprise name.
+            stream_type (str, optional): Event types of the stream, e.g. "THREAT,DEVICE".
+
+        Returns:
+            CheckpointEventStore: EventStore of a single stream in this store.
+        """
+        return CheckpointEventStore(self, self.key(ent_name, stream_type))
+
+    def commit(self) -> None:
+        """
+        Write the checkpoints changed since the last commit.
+        """
+        with self.commit_lock:
+            with self.lock:
+                changes, self.pending = self.pending, {}
+                self.pending_events = 0
+                if not changes:
+                    return
+                checkpoints = dict(self.checkpoints)
+            try:
+                for callback in self.before_commit:
+                    callback()
+                self.write(changes, checkpoints)
+                self.commits += 1
+            except Exception as e:
+                self.logger.error(f"Failed to commit checkpoints to {self.file_path}: {e}")
+                # Keep the changes for the next commit, newer checkpoints take precedence
+                with self.lock:
+                    for key, change in changes.items():
+                        pending = self.pending.setdefault(key, change)
+                        if pending is not change:
+                            pending[PENDING_EVENTS] += change[PENDING_EVENTS]
+
+    def close(self) -> None:
+        """
+        Stop the committer and commit the remaining checkpoints.
+        """
+        self.closed = True
+        self.wake.set()
+        self.committer.join()
+        self.commit()
+
+    def read(self) -> Dict[Hashable, str]:
+        """
+        Returns:
+            Dict[Hashable, str]: Last committed event id of each stream.
+        """
+        if not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, "r") as checkpoint_file:
+                return {key: str(id) for key, id in json.load(checkpoint_file).items()}
+        except (OSError, ValueError, AttributeError) as e:
+            # NOTE: Writes are atomic, so this is a file edited or damaged by hand
+            self.logger.error(f"Ignoring unreadable checkpoint file {self.file_path}: {e}")
+            return {}
+
+    def write(self, changes: Dict[Hashable, List], checkpoints: Dict[Hashable, str]) -> None:
+        """
+        Persist one group of checkpoints.
+
+        Args:
+            changes (Dict[Hashable, List]): Checkpoints changed since the last commit,
+                [id, event count, fetched at] by key.
+            checkpoints (Dict[Hashable, str]): Latest event id of every stream.
+        """
+        atomic_write(self.file_path, json.dumps(checkpoints, indent=2, sort_keys=True))
+
+    def __commit_loop(self) -> None:
+        last_commit = time.monotonic()
+        while not self.closed:
+            self.wake.wait(max(0, self.commit_interval - (time.monotonic() - last_commit)))
+            self.wake.clear()
+            if self.closed:
+                return
+            with self.lock:
+                due = self.pending_events >= self.commit_events or (
+                    time.monotonic() - last_commit >= self.commit_interval
+                )
+            if due:
+                self.commit()
+                last_commit = time.monotonic()
+
+
+class CheckpointEventStore(EventStore):
+    """
+    EventStore of one stream in a CheckpointStore.
+
+    Every received event updates the checkpoint in memory, the CheckpointStore
+    coalesces the file writes of all streams.
+    """
+
+    def __init__(self, checkpoint_store: CheckpointStore, key: Hashable):
+        super().__init__()
+        self.checkpoint_store = checkpoint_store
+        self.key = key
+
+    def received_event(self, id: str, count: int = 1):
+        self.checkpoint_store.checkpoint(self.key, id, count)
+
+    def flush(self):
+        self.checkpoint_store.commit()
+
+    def save(self, id: str):
+        self.checkpoint_store.checkpoint(self.key, id)
+
+    def load(self) -> str:
+        with self.checkpoint_store.lock:
+            return self.checkpoint_store.checkpoints.get(self.key, "")
@@ -1,20 +1,61 @@
+import time
+
+
 class EventStore:
     """
     Generic interface for saving the last received event.
     On restart the event thread will load this store and pick up from the saved event.
+
+    Saves are coalesced: the latest id is saved once `event_threshold` events were
+    received since the last save, or once `save_interval` seconds passed.
     """
 
     DEFAULT_EVENT_THRESHOLD = 5
+    # Seconds after which the latest id is saved regardless of the event count, None to disable
+    DEFAULT_SAVE_INTERVAL = None
 
-    def __init__(self):
+    def __init__(self, event_threshold: int = None, save_interval: float = None):
+        """
+        Args:
+            event_threshold (int, optional): Events received before the latest id is saved.
+                Defaults to DEFAULT_EVENT_THRESHOLD.
+            save_interval (float, optional): Seconds after which the latest id is saved on
+                the next received event. Defaults to DEFAULT_SAVE_INTERVAL.
+        """
         self.__event_count = 0
-        self.__event_threshold = self.DEFAULT_EVENT_THRESHOLD
+        self.__event_threshold = (
+            self.DEFAULT_EVENT_THRESHOLD if event_threshold is None else event_threshold
+        )
+        self.__save_interval = self.DEFAULT_SAVE_INTERVAL if save_interval is None else save_interval
+        self.__pending_id = None
+        self.__last_save = time.monotonic()
 
-    def received_event(self, id: int):
-        self.__event_count += 1
-        if self.__event_count >= self.__event_threshold:
-            self.save(id)
-            self.__event_count = 0
+    def received_event(self, id: str, count: int = 1):
+        """
+        Record received events, saving the latest id when the threshold or interval is reached.
+
+        Args:
+            id (str): Id of the latest received event.
+            count (int, optional): Number of events received up to `id`. Defaults to 1.
+        """
+        self.__event_count += count
+        self.__pending_id = id
+        if self.__event_count >= self.__event_threshold or (
+            self.__save_interval is not None
+            and time.monotonic() - self.__last_save >= self.__save_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Save the latest received id if it has not been saved yet.
+        """
+        if self.__pending_id is None:
+            return
+        self.save(self.__pending_id)
+        self.__pending_id = None
+        self.__event_count = 0
+        self.__last_save = time.monotonic()
 
     def save(self, id: str):
         raise NotImplementedError("Event stores must implement '.save()'")
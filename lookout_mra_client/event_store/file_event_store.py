@@ -2,18 +2,45 @@ import os
 from .event_store import EventStore
 
 
+def atomic_write(file_path: str, data: str) -> None:
+    """
+    Replace the contents of a file so that readers and crashes only ever see the old or
+    the new contents: write a temp file in the same directory, fsync it, rename it over
+    the file and fsync the directory.
+
+    Args:
+        file_path (str): File to replace.
+        data (str): New contents.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w") as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, file_path)
+
+    # NOTE: The rename itself is only durable once the directory entry is synced
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
 class FileEventStore(EventStore):
-    def __init__(self, file_path):
-        super().__init__()
+    def __init__(self, file_path, event_threshold=None, save_interval=None):
+        super().__init__(event_threshold, save_interval)
         self.file_path = file_path
         self.__current_value = ""
 
     def save(self, id):
+        id = str(id)
         if self.__current_value == id:
             return  # No need to save if value hasn't changed
-        with open(self.file_path, "w+") as file_store:
-            file_store.write(id)
-            self.__current_value = id
+        atomic_write(self.file_path, id)
+        self.__current_value = id
 
     def load(self):
         if not os.path.exists(self.file_path):
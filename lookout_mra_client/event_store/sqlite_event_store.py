@@ -0,0 +1,115 @@
+"""
+Module containing a SQLite checkpoint store for many tenants, through the peewee models.
+
+Each stream is one `StreamCheckpoint` row keyed by enterprise name and stream type.
+Checkpoints of all streams are grouped like `CheckpointStore` and written in one
+transaction, together with the fetch count and last fetched time of each stream.
+The database runs in WAL mode, so readers such as a status page never block the commit.
+"""
+
+from typing import Dict, Hashable, List, Tuple
+
+from peewee import EXCLUDED, Database, SqliteDatabase
+
+from .checkpoint_store import (
+    CheckpointStore,
+    DEFAULT_COMMIT_INTERVAL,
+    DEFAULT_COMMIT_EVENTS,
+    PENDING_ID,
+    PENDING_EVENTS,
+    PENDING_FETCHED_AT,
+)
+from ..models.stream_checkpoint import StreamCheckpoint
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    # NOTE: In WAL mode FULL syncs the log on every commit, one fsync per group commit
+    "synchronous": "full",
+    # Wait for another process holding the write lock instead of failing
+    "busy_timeout": 5000,
+}
+# Rows per upsert statement, below SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 100
+
+
+class SqliteEventStore(CheckpointStore):
+    """
+    Group-committed checkpoints of many streams in one SQLite database.
+
+    Args:
+        database (Union[str, Database]): Path of the SQLite database, or an open
+            peewee database, e.g. the one `db_proxy` is initialized with.
+        commit_interval (float, optional): See CheckpointStore.
+            Defaults to DEFAULT_COMMIT_INTERVAL.
+        commit_events (int, optional): See CheckpointStore. Defaults to DEFAULT_COMMIT_EVENTS.
+    """
+
+    def __init__(
+        self,
+        database,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+        commit_events: int = DEFAULT_COMMIT_EVENTS,
+    ) -> None:
+        if isinstance(database, Database):
+            self.database = database
+            file_path = database.database
+        else:
+            self.database = SqliteDatabase(database, pragmas=SQLITE_PRAGMAS)
+            file_path = database
+        # NOTE: Binds only this model, Configuration keeps using db_proxy
+        self.database.bind([StreamCheckpoint], bind_refs=False, bind_backrefs=False)
+        self.database.create_tables([StreamCheckpoint], safe=True)
+
+        super().__init__(file_path, commit_interval, commit_events)
+
+    def key(self, ent_name: str, stream_type: str = "") -> Tuple[str, str]:
+        return (ent_name, stream_type)
+
+    def fetchStats(self, ent_name: str, stream_type: str = "") -> StreamCheckpoint:
+        """
+        Args:
+            ent_name (str): Enterprise name.
+            stream_type (str, optional): Event types of the stream, e.g. "THREAT,DEVICE".
+
+        Returns:
+            StreamCheckpoint: Committed position, fetch count and last fetched time,
+                None if the stream was never checkpointed.
+        """
+        return StreamCheckpoint.get_or_none(
+            (StreamCheckpoint.ent_name == ent_name) & (StreamCheckpoint.stream_type == stream_type)
+        )
+
+    def read(self) -> Dict[Hashable, str]:
+        return {
+            (row.ent_name, row.stream_type): row.stream_position
+            for row in StreamCheckpoint.select()
+        }
+
+    def write(self, changes: Dict[Hashable, List], checkpoints: Dict[Hashable, str]) -> None:
+        rows = [
+            {
+                "ent_name": ent_name,
+                "stream_type": stream_type,
+                "stream_position": change[PENDING_ID],
+                "fetch_count": change[PENDING_EVENTS],
+                "fetched_at": change[PENDING_FETCHED_AT],
+            }
+            for (ent_name, stream_type), change in changes.items()
+        ]
+        # NOTE: peewee connects on first use, each thread keeps its own connection
+        with self.database.atomic():
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                # NOTE: EXCLUDED is the row that failed to insert, counts are added up
+                StreamCheckpoint.insert_many(rows[start : start + UPSERT_BATCH_SIZE]).on_conflict(
+                    conflict_target=[StreamCheckpoint.ent_name, StreamCheckpoint.stream_type],
+                    update={
+                        StreamCheckpoint.stream_position: EXCLUDED.stream_position,
+                        StreamCheckpoint.fetch_count: StreamCheckpoint.fetch_count
+                        + EXCLUDED.fetch_count,
+                        StreamCheckpoint.fetched_at: EXCLUDED.fetched_at,
+                    },
+                ).execute()
+
+    def close(self) -> None:
+        super().close()
+        self.database.close()
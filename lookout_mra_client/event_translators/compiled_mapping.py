@@ -0,0 +1,178 @@
+"""
+Module containing a compiled form of the event mapping tuples used by `transform_event`.
+
+`transform_event` flattens the whole event and then checks every mapping tuple against
+the flattened dict. A `CompiledMapping` instead generates a single function that reads
+each mapped field straight from the nested event. Mappings are grouped by their
+top-level key, so a THREAT event never looks further into `device.*` or `audit.*`
+paths than checking the top-level key is absent.
+
+The result is the same dict `transform_event` returns for the same mappings.
+"""
+
+from typing import Tuple
+
+from .utilities import MAPPING_TYPES, KEY_CHANGE, KEY_VALUE_CHANGE, handle_matches
+
+# Values flatten_event copies into the flattened event unchanged
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+# Types flatten_event joins into a comma separated string when a list only contains them
+JOINABLE_TYPES = (float, int, bool, str)
+
+# Sentinel for a source key that does not exist in the flattened event
+MISSING = object()
+# Stand-in for a missing or non-dict parent, so child lookups are always MISSING
+EMPTY = {}
+
+
+def flat_value(val, key: str):
+    """
+    Convert a nested event value to the value flatten_event would produce for it.
+
+    Args:
+        val: Value found in the nested event, or MISSING.
+        key (str): Key the value was found under.
+
+    Returns:
+        The flattened value, or MISSING if flatten_event would not produce the key.
+    """
+    if val is MISSING or isinstance(val, dict):
+        # Dicts are flattened into their children, so the key itself never exists
+        return MISSING
+    if key == "matches":
+        val = handle_matches(val, True, False)
+    if isinstance(val, list) and all(isinstance(i, JOINABLE_TYPES) for i in val):
+        return ",".join(val)
+    return val
+
+
+def resolve_path(raw_event: dict, keys: Tuple[str, ...]):
+    """
+    Look up the value flatten_event would produce for the given key path.
+
+    Args:
+        raw_event (dict): Unprocessed event dict.
+        keys (Tuple[str, ...]): Nested keys, e.g. ("threat", "details", "url").
+
+    Returns:
+        The flattened value, or MISSING if flatten_event would not produce the key.
+    """
+    val = raw_event
+    for key in keys:
+        # NOTE: Only dicts are flattened further, keys below any other value do not exist.
+        if not isinstance(val, dict) or key not in val:
+            return MISSING
+        val = val[key]
+    return flat_value(val, keys[-1])
+
+
+class CompiledMapping:
+    """
+    Mapping tuples compiled into a single function of direct nested key lookups.
+
+    Args:
+        mappings (tuple): Tuple containing mapping tuples for each event field,
+            in the format accepted by `transform_event`.
+        sep (str, optional): Separator used in the mapping field names. Defaults to ".".
+
+    Raises:
+        ValueError: If a provided field mapping is not supported.
+    """
+
+    def __init__(self, mappings: tuple, sep: str = ".") -> None:
+        self.mappings = mappings
+        self.source = self.__generate(sep)
+
+        namespace = {
+            "MISSING": MISSING,
+            "EMPTY": EMPTY,
+            "SCALAR_TYPES": SCALAR_TYPES,
+            "flat_value": flat_value,
+            "resolve_path": resolve_path,
+            "mappings": mappings,
+        }
+        exec(compile(self.source, f"<CompiledMapping {id(self):#x}>", "exec"), namespace)
+        self.__transform = namespace["transform"]
+
+    def __generate(self, sep: str) -> str:
+        """
+        Generate the source of `transform(raw_event) -> dict`.
+
+        Consecutive mappings sharing a top-level key are emitted inside one
+        `if <top-level key is a dict>:` block. Mappings are emitted in their original
+        order, so duplicate new keys keep the first position and last value, exactly
+        like `transform_event`.
+        """
+        lines = ["def transform(raw_event):", "    transformed_event = {}"]
+        block_root = None
+        # Variable names of the dict nodes already looked up in the current block
+        nodes = {}
+
+        def node(path: Tuple[str, ...], indent: str) -> str:
+            """
+            Emit the lookup of the dict at `path`, returning its variable name.
+            """
+            if path in nodes:
+                return nodes[path]
+            parent = node(path[:-1], indent)
+            name = f"n{len(nodes)}"
+            lines.append(f"{indent}{name} = {parent}.get({path[-1]!r}, EMPTY)")
+            lines.append(f"{indent}if not isinstance({name}, dict):")
+            lines.append(f"{indent}    {name} = EMPTY")
+            nodes[path] = name
+            return name
+
+        for index, mapping in enumerate(self.mappings):
+            mapping_type = len(mapping)
+            field_name = mapping[0]
+            if mapping_type not in MAPPING_TYPES:
+                raise ValueError(f"Unsupported mapping for field: {field_name}")
+
+            keys = tuple(field_name.split(sep))
+            if len(keys) == 1:
+                block_root = None
+                indent = "    "
+                parent = "raw_event"
+            else:
+                indent = "        "
+                if keys[0] != block_root:
+                    block_root = keys[0]
+                    nodes = {(): "raw_event"}
+                    root = node(keys[:1], "    ")
+                    lines.append(f"    if {root} is not EMPTY:")
+                parent = node(keys[:-1], indent)
+
+            lines.append(f"{indent}val = {parent}.get({keys[-1]!r}, MISSING)")
+            lines.append(f"{indent}if val.__class__ not in SCALAR_TYPES:")
+            lines.append(f"{indent}    val = flat_value(val, {keys[-1]!r})")
+            lines.append(f"{indent}if val is not MISSING:")
+
+            if mapping_type == KEY_CHANGE:
+                new_key, value = mapping[1], "val"
+            elif mapping_type == KEY_VALUE_CHANGE:
+                new_key, value = mapping[1], f"mappings[{index}][2](val)"
+            else:
+                new_key, value = mapping[2], f"mappings[{index}][3](val, val1)"
+                second_keys = tuple(mapping[1].split(sep))
+                lines.append(f"{indent}    val1 = resolve_path(raw_event, {second_keys!r})")
+                lines.append(f"{indent}    if val1 is MISSING:")
+                lines.append(f"{indent}        raise KeyError({mapping[1]!r})")
+            lines.append(f"{indent}    transformed_event[{new_key!r}] = {value}")
+
+        lines.append("    return transformed_event")
+        return "\n".join(lines) + "\n"
+
+    def transform(self, raw_event: dict) -> dict:
+        """
+        Transform an event dict using the compiled mappings.
+
+        Args:
+            raw_event (dict): Unprocessed event dict.
+
+        Raises:
+            KeyError: If the second key of a key pair mapping is missing from the event.
+
+        Returns:
+            dict: Transformed event dict.
+        """
+        return self.__transform(raw_event)
@@ -15,33 +15,187 @@ We use the following values while building the LEEF header:
 
 """
 
+import re, time
 from datetime import datetime
-from .utilities import transform_event
+from typing import List, Tuple
+from .compiled_mapping import CompiledMapping
 from .mra_v1_leef_mapping import MRA_V1_LEEF_MAPPING
 from .mra_v2_leef_mapping import MRA_V2_LEEF_MAPPING
 
 LEEF_FIELD_SEP = "\t"
 TIMESTAMP_FMT = "%b %d %H:%M:%S"
+MRA_V2_LEEF_HEADER = "{timestamp} {logId} LEEF:2.0|Lookout|MRAv2 Client|2.0|{type},{cat}|"
+MRA_V1_LEEF_HEADER = "{timestamp} {logId} LEEF:1.0|Lookout|SIEM Client|0.2|{type},{cat}|"
+# Maximum number of cached headers before the header cache is cleared
+HEADER_CACHE_SIZE = 4096
+# ISO 8601 event time, split into the time up to the second and the UTC offset
+EVENT_TIME_RE = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?(Z|[+-]\d\d:\d\d)?$")
+
+
+def join_category(n1, n2):
+    return n1 + "_" + n2
+
+
+# Category mappings, prepended to the event mapping depending on the event type/status
+MRA_V2_CAT_MAPPINGS = {
+    "change_type": (("change_type", "cat"),),
+    "threat": (("threat.classifications", "cat"),),
+    "device_activation": (("device.status.activation_status", "cat"),),
+    "device_security": (
+        (
+            "device.status.activation_status",
+            "device.status.security_status",
+            "cat",
+            join_category,
+        ),
+    ),
+    "audit": (("audit.type", "cat"),),
+}
+MRA_V1_CAT_MAPPINGS = {
+    "details_type": (("details.type", "cat"),),
+    "threat": (("details.classifications", "cat"),),
+    "device_activation": (("details.activationStatus", "cat"),),
+    "device_activation_security": (
+        (
+            "details.activationStatus",
+            "details.securityStatus",
+            "cat",
+            join_category,
+        ),
+    ),
+    "device_security": (("details.securityStatus", "cat"),),
+}
+
+# Full mappings compiled once per category mapping
+MRA_V2_COMPILED_MAPPINGS = {
+    cat: CompiledMapping(cat_mapping + MRA_V2_LEEF_MAPPING)
+    for cat, cat_mapping in MRA_V2_CAT_MAPPINGS.items()
+}
+MRA_V1_COMPILED_MAPPINGS = {
+    cat: CompiledMapping(cat_mapping + MRA_V1_LEEF_MAPPING)
+    for cat, cat_mapping in MRA_V1_CAT_MAPPINGS.items()
+}
+
+
+class LeefHeaderCache:
+    """
+    Cache of formatted LEEF headers, keyed by timestamp second, log source id,
+    event type and category. Within a second each distinct header is only formatted once.
+
+    Args:
+        header_fmt (str): LEEF header format string.
+        time_field (str): Event field holding the ISO 8601 event time.
+        use_event_time (bool, optional): Timestamp headers with the event time instead of
+            the current time. Defaults to False.
+    """
+
+    def __init__(self, header_fmt: str, time_field: str, use_event_time: bool = False) -> None:
+        self.header_fmt = header_fmt
+        self.time_field = time_field
+        self.use_event_time = use_event_time
+        self.__headers = {}
+
+    def header(self, event: dict, event_cat: str) -> str:
+        """
+        Get the LEEF header for an event.
+
+        Args:
+            event (dict): Event to build the header for.
+            event_cat (str): Category of the event.
+
+        Returns:
+            str: Formatted LEEF header.
+        """
+        second = None
+        if self.use_event_time:
+            match = EVENT_TIME_RE.match(event.get(self.time_field) or "")
+            if match:
+                second = match.group(1, 2)
+        if second is None:
+            second = int(time.time())
+
+        key = (second, event["qradarLogSourceIdentifier"], event["type"], event_cat)
+        leef_header = self.__headers.get(key)
+        if leef_header is None:
+            if len(self.__headers) >= HEADER_CACHE_SIZE:
+                self.__headers = {}
+            leef_header = self.header_fmt.format(
+                timestamp=self.__timestamp(second), logId=key[1], type=key[2], cat=key[3]
+            )
+            self.__headers[key] = leef_header
+        return leef_header
+
+    def __timestamp(self, second) -> str:
+        """
+        Format either an epoch second or an event time (time, offset) tuple in local time.
+        """
+        if isinstance(second, int):
+            return datetime.fromtimestamp(second).strftime(TIMESTAMP_FMT)
+
+        event_time, offset = second
+        if offset == "Z":
+            offset = "+00:00"
+        try:
+            event_dt = datetime.fromisoformat(event_time + (offset or ""))
+        except ValueError:
+            return datetime.now().strftime(TIMESTAMP_FMT)
+        return event_dt.astimezone().strftime(TIMESTAMP_FMT)
 
 
 class LeefTranslator:
-    def __init__(self, mra_v2: bool = False):
+    def __init__(self, mra_v2: bool = False, use_event_time: bool = False):
         self.mra_v2 = mra_v2
+        if mra_v2:
+            self.__categorize = self.__categorize_mra_v2_event
+            self.__mappings = MRA_V2_COMPILED_MAPPINGS
+            self.__headers = LeefHeaderCache(MRA_V2_LEEF_HEADER, "created_time", use_event_time)
+        else:
+            self.__categorize = self.__categorize_mra_v1_event
+            self.__mappings = MRA_V1_COMPILED_MAPPINGS
+            self.__headers = LeefHeaderCache(MRA_V1_LEEF_HEADER, "eventTime", use_event_time)
 
     def formatEvent(self, event: dict) -> str:
-        if self.mra_v2:
-            return self.__format_mra_v2_event(event)
-        else:
-            return self.__format_mra_v1_event(event)
+        event_cat, cat_mapping = self.__categorize(event)
+        return self.__headers.header(event, event_cat) + self.__attributes(cat_mapping, event)
+
+    def encodeEvents(self, events: list) -> List[bytes]:
+        """
+        Format a batch of events into a list of UTF-8 encoded messages, without framing.
+
+        Headers come from the header cache, so repeated headers within a batch are
+        only built once.
+
+        Args:
+            events (list): Events to format.
+
+        Returns:
+            List[bytes]: One encoded message per event.
+        """
+        messages = []
+        for event in events:
+            event_cat, cat_mapping = self.__categorize(event)
+            message = self.__headers.header(event, event_cat) + self.__attributes(cat_mapping, event)
+            messages.append(message.encode("utf-8"))
+        return messages
 
-    def __format_mra_v2_event(self, event: dict) -> str:
+    def __attributes(self, cat_mapping: str, event: dict) -> str:
+        mapped_event = self.__mappings[cat_mapping].transform(event)
+        return LEEF_FIELD_SEP.join(f"{key}={val}" for key, val in mapped_event.items())
+
+    def __categorize_mra_v2_event(self, event: dict) -> Tuple[str, str]:
+        """
+        Determine the LEEF category of a MRA v2 event.
+
+        Returns:
+            Tuple[str, str]: Category for the header, key of the `cat` attribute mapping.
+        """
         event_cat = event["change_type"]
-        cat_mapping = (("change_type", "cat"),)
+        cat_mapping = "change_type"
 
         # Use details.classifications for a more granual categorization of threat events
         if event["type"] == "THREAT":
             event_cat = event["threat"]["classifications"][0]
-            cat_mapping = (("threat.classifications", "cat"),)
+            cat_mapping = "threat"
         elif event["type"] == "DEVICE":
             # can contain: activationStatus, protectionStatus, securityStatus
             device_status = event["device"]["status"]
@@ -50,48 +204,36 @@ class LeefTranslator:
 
             if activation_status in ("DELETED", "DEACTIVATED", "PENDING"):
                 event_cat = activation_status
-                cat_mapping = (("device.status.activation_status", "cat"),)
+                cat_mapping = "device_activation"
             elif "security_status" in device_status:
                 security_status = device_status["security_status"]
 
                 event_cat = activation_status + "_" + security_status
-                cat_mapping = (
-                    (
-                        "device.status.activation_status",
-                        "device.status.security_status",
-                        "cat",
-                        lambda n1, n2: n1 + "_" + n2,
-                    ),
-                )
+                cat_mapping = "device_security"
             else:
                 event_cat = event["change_type"]
-                cat_mapping = (("change_type", "cat"),)
+                cat_mapping = "change_type"
 
         elif event["type"] == "AUDIT":
             event_cat = event["audit"]["type"]
-            cat_mapping = (("audit.type", "cat"),)
-
-        mapping = cat_mapping + MRA_V2_LEEF_MAPPING
-
-        timestamp = datetime.now().strftime(TIMESTAMP_FMT)
-        logId = event["qradarLogSourceIdentifier"]
-        leef_header = (
-            f"{timestamp} {logId} LEEF:2.0|Lookout|MRAv2 Client|2.0|{event['type']},{event_cat}|"
-        )
+            cat_mapping = "audit"
 
-        mapped_event = transform_event(mapping, event)
-        event_attr = LEEF_FIELD_SEP.join(f"{key}={val}" for key, val in mapped_event.items())
+        return event_cat, cat_mapping
 
-        return leef_header + event_attr
+    def __categorize_mra_v1_event(self, event: dict) -> Tuple[str, str]:
+        """
+        Determine the LEEF category of a MRA v1 event.
 
-    def __format_mra_v1_event(self, event: dict) -> str:
+        Returns:
+            Tuple[str, str]: Category for the header, key of the `cat` attribute mapping.
+        """
         event_cat = event["details"]["type"]
-        cat_mapping = (("details.type", "cat"),)
+        cat_mapping = "details_type"
 
         # Use details.classifications for a more granual categorization of threat events
         if event["type"] == "THREAT":
             event_cat = event["details"]["classifications"][0]
-            cat_mapping = (("details.classifications", "cat"),)
+            cat_mapping = "threat"
         elif event["type"] == "DEVICE":
             # can contain: activationStatus, protectionStatus, securityStatus
             updated_details = event["updatedDetails"]
@@ -100,33 +242,15 @@ class LeefTranslator:
 
             if activation_status in ("DELETED", "DEACTIVATED", "PENDING"):
                 event_cat = activation_status
-                cat_mapping = (("details.activationStatus", "cat"),)
+                cat_mapping = "device_activation"
             elif "securityStatus" in updated_details:
                 security_status = event["details"]["securityStatus"]
 
                 if "activationStatus" in updated_details:
                     event_cat = activation_status + "_" + security_status
-                    cat_mapping = (
-                        (
-                            "details.activationStatus",
-                            "details.securityStatus",
-                            "cat",
-                            lambda n1, n2: n1 + "_" + n2,
-                        ),
-                    )
+                    cat_mapping = "device_activation_security"
                 else:
                     event_cat = security_status
-                    cat_mapping = (("details.securityStatus", "cat"),)
-
-        mapping = cat_mapping + MRA_V1_LEEF_MAPPING
-
-        timestamp = datetime.now().strftime(TIMESTAMP_FMT)
-        logId = event["qradarLogSourceIdentifier"]
-        leef_header = (
-            f"{timestamp} {logId} LEEF:1.0|Lookout|SIEM Client|0.2|{event['type']},{event_cat}|"
-        )
-
-        mapped_event = transform_event(mapping, event)
-        event_attr = LEEF_FIELD_SEP.join(f"{key}={val}" for key, val in mapped_event.items())
+                    cat_mapping = "device_security"
 
-        return leef_header + event_attr
+        return event_cat, cat_mapping
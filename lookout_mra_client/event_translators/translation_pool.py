@@ -0,0 +1,93 @@
+"""
+Module containing a process pool for translating large event batches on multiple cores.
+
+LEEF translation is CPU bound, so during a large catch-up a single stream thread is
+limited to one core by the GIL. A `TranslationPool` splits each batch into chunks,
+translates the chunks in worker processes and returns the messages in the original
+event order, so the stream position saved after a batch stays correct.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from .leef_translator import LeefTranslator
+
+# Events per chunk sent to a worker process
+DEFAULT_CHUNK_SIZE = 250
+# Batches smaller than this are translated in the calling thread
+DEFAULT_MIN_POOL_BATCH = 500
+
+# Translator of the current worker process, set by init_worker
+worker_translator: LeefTranslator = None
+
+
+def init_worker(mra_v2: bool, use_event_time: bool) -> None:
+    global worker_translator
+    worker_translator = LeefTranslator(mra_v2=mra_v2, use_event_time=use_event_time)
+
+
+def encode_chunk(events: list) -> List[bytes]:
+    return worker_translator.encodeEvents(events)
+
+
+class TranslationPool:
+    """
+    Pool of worker processes running LeefTranslator.encodeEvents.
+
+    Args:
+        workers (int): Number of worker processes.
+        mra_v2 (bool, optional): Translate MRA v2 events. Defaults to False.
+        use_event_time (bool, optional): See LeefTranslator. Defaults to False.
+        chunk_size (int, optional): Events per chunk sent to a worker.
+            Defaults to DEFAULT_CHUNK_SIZE.
+        min_pool_batch (int, optional): Batches smaller than this are translated in the
+            calling thread, where sending them to a worker costs more than it saves.
+            Defaults to DEFAULT_MIN_POOL_BATCH.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        mra_v2: bool = False,
+        use_event_time: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        min_pool_batch: int = DEFAULT_MIN_POOL_BATCH,
+    ) -> None:
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.min_pool_batch = min_pool_batch
+        self.translator = LeefTranslator(mra_v2=mra_v2, use_event_time=use_event_time)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(mra_v2, use_event_time),
+        )
+
+    def encodeEvents(self, events: list) -> List[bytes]:
+        """
+        Format a batch of events into a list of UTF-8 encoded messages, without framing.
+
+        Args:
+            events (list): Events to format.
+
+        Returns:
+            List[bytes]: One encoded message per event, in the order of `events`.
+        """
+        if len(events) < self.min_pool_batch:
+            return self.translator.encodeEvents(events)
+
+        chunks = [
+            events[start : start + self.chunk_size]
+            for start in range(0, len(events), self.chunk_size)
+        ]
+        messages = []
+        # NOTE: Executor.map yields results in the order of the chunks
+        for chunk_messages in self.executor.map(encode_chunk, chunks):
+            messages.extend(chunk_messages)
+        return messages
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,223 @@
+"""
+Module containing the lag tracking of a stream, how far forwarding is behind real time.
+
+For every forwarded batch the `created_time` of its newest event is compared with the
+time the batch was received from MRA v2 and the time it was written to syslog:
+
+- delivery lag, created to received, grows when MRA v2 is slow to deliver
+- pipeline time, received to written, grows when the connector or the SIEM is slow
+- event lag, created to written, the end-to-end lag
+
+Each is kept as a rolling window of samples for percentiles. The event id distance
+is the number of stream positions received but not forwarded yet. Lags are logged
+every `report_interval`, exposed as metrics and in the status query of the metrics
+server, and a warning is logged while the event lag exceeds `stale_lag` or nothing
+was forwarded for `stale_lag` seconds although batches are waiting.
+"""
+
+import logging, threading, time
+from collections import deque
+from datetime import datetime, timezone
+from functools import partial
+from typing import Deque, List, Optional
+
+from .lookout_logger import LOGGER_NAME
+from .metrics import DELIVERY_LAG_SECONDS, EVENT_ID_DISTANCE, EVENT_LAG_SECONDS, PIPELINE_SECONDS
+
+# Number of batches in the rolling percentile window
+DEFAULT_LAG_WINDOW = 1024
+# Warn when forwarding is this many seconds behind
+DEFAULT_STALE_LAG = 300  # seconds
+# Seconds between lag log lines, and between repeated stale lag warnings
+DEFAULT_LAG_REPORT_INTERVAL = 60  # seconds
+LAG_PERCENTILES = (50, 90, 99)
+
+
+def event_timestamp(value: str) -> Optional[float]:
+    """
+    Args:
+        value (str): ISO 8601 event time, e.g. "2024-01-01T00:00:00.000+00:00".
+
+    Returns:
+        Optional[float]: POSIX timestamp, None if the time cannot be parsed.
+    """
+    if not value:
+        return None
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        event_time = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if event_time.tzinfo is None:
+        event_time = event_time.replace(tzinfo=timezone.utc)
+    return event_time.timestamp()
+
+
+def percentile(samples: Deque[float], percent: float) -> Optional[float]:
+    """
+    Nearest-rank percentile, None without samples.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def id_distance(received_id, forwarded_id) -> Optional[int]:
+    try:
+        return max(0, int(received_id) - int(forwarded_id))
+    except (TypeError, ValueError):
+        return None
+
+
+class LagTracker:
+    """
+    Lag of one tenant stream.
+
+    Args:
+        name (str): Tenant name, used in logs and metric labels.
+        window (int, optional): Batches in the rolling percentile window.
+            Defaults to DEFAULT_LAG_WINDOW.
+        stale_lag (float, optional): Seconds behind real time that trigger a warning.
+            Defaults to DEFAULT_STALE_LAG.
+        report_interval (float, optional): Seconds between lag log lines.
+            Defaults to DEFAULT_LAG_REPORT_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = DEFAULT_LAG_WINDOW,
+        stale_lag: float = DEFAULT_STALE_LAG,
+        report_interval: float = DEFAULT_LAG_REPORT_INTERVAL,
+    ) -> None:
+        self.name = name
+        self.stale_lag = stale_lag
+        self.report_interval = report_interval
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.event_lag: Deque[float] = deque(maxlen=window)
+        self.delivery_lag: Deque[float] = deque(maxlen=window)
+        self.pipeline: Deque[float] = deque(maxlen=window)
+        self.received_id = None
+        self.forwarded_id = None
+        self.last_forward = time.time()
+        # Guards the samples, batches of one stream may be forwarded by several threads
+        self.lock = threading.Lock()
+        self.stale = False
+        self.last_alert = 0.0
+        self.last_report = time.monotonic()
+
+        for percent in LAG_PERCENTILES:
+            quantile = str(percent / 100)
+            for metric, samples in (
+                (EVENT_LAG_SECONDS, self.event_lag),
+                (DELIVERY_LAG_SECONDS, self.delivery_lag),
+                (PIPELINE_SECONDS, self.pipeline),
+            ):
+                metric.labels(name, quantile).set_function(partial(self.percentile, samples, percent))
+        EVENT_ID_DISTANCE.labels(name).set_function(self.id_distance)
+
+    def received(self, last_event_id) -> None:
+        """
+        Record the stream position of a batch received from MRA v2.
+        """
+        self.received_id = last_event_id
+
+    def forwarded(self, events: List[dict], last_event_id, received_at: float) -> None:
+        """
+        Record a batch written to syslog.
+
+        Args:
+            events (List[dict]): Forwarded MRA v2 events, the last is the newest.
+            last_event_id: Stream position of the batch.
+            received_at (float): time.time() when the batch was received from MRA v2.
+        """
+        now = time.time()
+        created = event_timestamp(events[-1].get("created_time")) if events else None
+        with self.lock:
+            self.forwarded_id = last_event_id
+            self.last_forward = now
+            self.pipeline.append(now - received_at)
+            if created is not None:
+                self.event_lag.append(now - created)
+                self.delivery_lag.append(received_at - created)
+            self.__check(now)
+
+    def heartbeat(self) -> None:
+        """
+        Check for stale lag while MRA v2 has no new events, e.g. a blocked forwarder.
+        A heartbeat with every received batch forwarded means the stream caught up.
+        """
+        with self.lock:
+            self.__check(time.time(), heartbeat=True)
+
+    def percentile(self, samples: Deque[float], percent: float) -> float:
+        with self.lock:
+            value = percentile(samples, percent)
+        return float("nan") if value is None else value
+
+    def id_distance(self) -> float:
+        distance = id_distance(self.received_id, self.forwarded_id)
+        return float("nan") if distance is None else distance
+
+    def status(self) -> dict:
+        """
+        Returns:
+            dict: Lag percentiles in seconds, stream positions and stale flag.
+        """
+        with self.lock:
+            status = {
+                name: dict(
+                    {f"p{percent}": percentile(samples, percent) for percent in LAG_PERCENTILES},
+                    last=samples[-1] if samples else None,
+                )
+                for name, samples in (
+                    ("event_lag", self.event_lag),
+                    ("delivery_lag", self.delivery_lag),
+                    ("pipeline", self.pipeline),
+                )
+            }
+            status.update(
+                received_id=self.received_id,
+                forwarded_id=self.forwarded_id,
+                id_distance=id_distance(self.received_id, self.forwarded_id),
+                seconds_since_forward=round(time.time() - self.last_forward, 3),
+                stale=self.stale,
+            )
+        return status
+
+    def __check(self, now: float, heartbeat: bool = False) -> None:
+        """
+        Log stale lag and the periodic lag report, must hold the lock.
+        """
+        lag = self.event_lag[-1] if self.event_lag else 0.0
+        idle = now - self.last_forward
+        distance = id_distance(self.received_id, self.forwarded_id)
+        caught_up = heartbeat and not distance
+        if (lag > self.stale_lag and not caught_up) or (distance and idle > self.stale_lag):
+            if not self.stale or now - self.last_alert >= self.report_interval:
+                self.logger.warning(
+                    f"{self.name} - forwarding is stale: event lag {lag:.1f}s, "
+                    f"{idle:.1f}s since the last forwarded batch, id distance {distance}"
+                )
+                self.last_alert = now
+            self.stale = True
+        elif self.stale:
+            self.logger.info(f"{self.name} - forwarding caught up, event lag {lag:.1f}s")
+            self.stale = False
+
+        monotonic = time.monotonic()
+        if monotonic - self.last_report >= self.report_interval and self.event_lag:
+            self.last_report = monotonic
+            self.logger.info(
+                f"{self.name} - event lag {self.__percentiles(self.event_lag)}, "
+                f"delivery lag {self.__percentiles(self.delivery_lag)}, "
+                f"pipeline {self.__percentiles(self.pipeline)}, id distance {distance}"
+            )
+
+    def __percentiles(self, samples: Deque[float]) -> str:
+        return " ".join(
+            f"p{percent}={percentile(samples, percent):.3f}s" for percent in LAG_PERCENTILES
+        )
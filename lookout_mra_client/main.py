@@ -9,16 +9,87 @@ import argparse
 import configparser
 import logging
 import os
+import re
 import signal
 import sys
 import threading
 from datetime import datetime
-from typing import Tuple
+from typing import List, Tuple
 
 from .lookout_logger import init_lookout_logger
-from .mra_v2_stream_thread import MRAv2StreamThread
+from .mra_v2_stream_thread import (
+    MRAv2StreamThread,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_STREAM_BATCH_EVENTS,
+)
 from .event_forwarders.qradar_event_forwarder import QRadarEventForwarder
-from .event_forwarders.splunk_event_forwarder import SplunkEventForwarder
+from .event_forwarders.splunk_event_forwarder import (
+    SplunkEventForwarder,
+    DEFAULT_FLUSH_BYTES,
+    DEFAULT_FLUSH_INTERVAL,
+)
+from .event_forwarders.splunk_hec_event_forwarder import (
+    SplunkHECEventForwarder,
+    DEFAULT_HEC_IN_FLIGHT,
+    DEFAULT_HEC_BATCH_BYTES,
+    DEFAULT_HEC_COMPRESSLEVEL,
+    DEFAULT_HEC_RETRIES,
+)
+from .syslog_writer import SYSLOG_FRAMING_NUL
+from .syslog_spool import (
+    SyslogSpool,
+    DEFAULT_SEGMENT_SIZE,
+    DEFAULT_SPOOL_MAX_BYTES,
+    SPOOL_OVERFLOW_BLOCK,
+)
+from .event_store.checkpoint_store import (
+    CheckpointStore,
+    DEFAULT_COMMIT_INTERVAL,
+    DEFAULT_COMMIT_EVENTS,
+)
+from .event_store.sqlite_event_store import SqliteEventStore
+from .event_dedup import EventDeduplicator, DEFAULT_DEDUP_WINDOW
+from .metrics import (
+    MetricsServer,
+    DEFAULT_METRICS_ADDRESS,
+    DEFAULT_METRICS_PORT,
+    MEMORY_ROUTE,
+    PROFILE_ROUTE,
+)
+from .profiler import SamplingProfiler, DEFAULT_PROFILE_SECONDS, DEFAULT_SAMPLE_INTERVAL
+from .memory_diagnostics import (
+    MemoryDiagnostics,
+    DEFAULT_MEMORY_SECONDS,
+    DEFAULT_MEMORY_INTERVAL,
+    DEFAULT_TRACE_FRAMES,
+)
+from .sse_capture import StreamRecorder, DEFAULT_CAPTURE_SEGMENT_SIZE, DEFAULT_CAPTURE_MAX_BYTES
+from .lag_tracker import (
+    LagTracker,
+    DEFAULT_LAG_WINDOW,
+    DEFAULT_STALE_LAG,
+    DEFAULT_LAG_REPORT_INTERVAL,
+)
+
+# KiB of an events batch after which it is decoded while it is received (threads engine)
+DEFAULT_STREAM_OVER_KB = 1024
+# Stream engines, selected with `engine` in the [performance] section
+ENGINE_THREADS = "threads"
+ENGINE_ASYNCIO = "asyncio"
+# Config sections of additional tenants, e.g. [tenant:my-company]
+TENANT_SECTION_PREFIX = "tenant:"
+# Checkpoint file name, created next to the config file unless configured
+DEFAULT_CHECKPOINT_FILE = "mrav2-checkpoints.json"
+DEFAULT_SQLITE_CHECKPOINT_FILE = "mrav2-checkpoints.db"
+# Checkpoint stores, selected with `backend` in the [checkpoint] section
+CHECKPOINT_BACKEND_JSON = "json"
+CHECKPOINT_BACKEND_SQLITE = "sqlite"
+# Syslog spool directory, created next to the config file unless configured
+DEFAULT_SPOOL_DIRECTORY = "mrav2-spool"
+# Event id journals of the dedup stage, created next to the checkpoint file
+DEFAULT_DEDUP_DIRECTORY = "mrav2-dedup"
+# Raw SSE captures of the record mode, created next to the config file unless configured
+DEFAULT_RECORD_DIRECTORY = "mrav2-capture"
 
 shutdown_event = threading.Event()
 
@@ -26,8 +97,8 @@ shutdown_event = threading.Event()
 def signal_handler(sig, frame):
     """Handle shutdown signals gracefully"""
     print("\nShutdown signal received. Stopping connector...")
+    # NOTE: main() stops the stream threads and commits the checkpoints
     shutdown_event.set()
-    sys.exit(0)
 
 
 def parse_args():
@@ -64,28 +135,119 @@ def load_config(config_file: str) -> dict:
     config = configparser.ConfigParser()
     config.read(config_file)
 
-    required_sections = ["lookout", "syslog"]
-    for section in required_sections:
-        if section not in config:
-            raise ValueError(f"Missing required section in config: [{section}]")
+    if "syslog" not in config:
+        raise ValueError("Missing required section in config: [syslog]")
+    if "lookout" not in config and not tenant_sections(config):
+        raise ValueError(
+            f"Missing required section in config: [lookout] or [{TENANT_SECTION_PREFIX}<name>]"
+        )
 
     return config
 
 
-def parse_event_types(config: configparser.ConfigParser) -> str:
+def tenant_file_name(entity_name: str) -> str:
+    """File name safe version of a tenant name"""
+    return re.sub(r"[^\w.-]", "_", entity_name)
+
+
+def tenant_sections(config: configparser.ConfigParser) -> List[str]:
+    """List the [tenant:<name>] sections of the config"""
+    return [section for section in config.sections() if section.startswith(TENANT_SECTION_PREFIX)]
+
+
+def parse_event_types(config: configparser.ConfigParser, section: str = "lookout") -> str:
     """Parse enabled event types from config"""
     event_types = []
-    
-    if config.getboolean("lookout", "threat_enabled", fallback=True):
+
+    # NOTE: Tenant sections fall back to the [lookout] section for options they do not set
+    def enabled(option: str, default: bool) -> bool:
+        fallback = config.getboolean("lookout", option, fallback=default)
+        return config.getboolean(section, option, fallback=fallback)
+
+    if enabled("threat_enabled", True):
         event_types.append("THREAT")
-    if config.getboolean("lookout", "device_enabled", fallback=True):
+    if enabled("device_enabled", True):
         event_types.append("DEVICE")
-    if config.getboolean("lookout", "audit_enabled", fallback=False):
+    if enabled("audit_enabled", False):
         event_types.append("AUDIT")
 
     return ",".join(event_types) if event_types else "THREAT,DEVICE"
 
 
+def parse_tenants(
+    config: configparser.ConfigParser, proxies: dict, logger: logging.Logger
+) -> List[Tuple[str, dict]]:
+    """
+    Parse the tenants to stream from config.
+
+    Each [tenant:<name>] section is a tenant, options it does not set are taken from
+    the [lookout] section. Without tenant sections, [lookout] is the only tenant.
+
+    Returns:
+        List[Tuple[str, dict]]: Entity name and MRAv2Stream arguments of each tenant
+
+    Raises:
+        ValueError: If two tenants have the same name, or names mapping to the same file
+            name of their dedup journals and recordings.
+    """
+    sections = tenant_sections(config) or ["lookout"]
+
+    tenants = []
+    # Section of each tenant name and tenant file name
+    names = {}
+    file_names = {}
+    for section in sections:
+        if section == "lookout":
+            entity_name = config.get("lookout", "entity_name")
+        else:
+            entity_name = config.get(
+                section, "entity_name", fallback=section[len(TENANT_SECTION_PREFIX) :]
+            )
+        if entity_name in names:
+            raise ValueError(
+                f"Duplicate tenant name '{entity_name}' in [{names[entity_name]}] and [{section}]"
+            )
+        file_name = tenant_file_name(entity_name)
+        if file_name in file_names:
+            raise ValueError(
+                f"Tenant names in [{file_names[file_name]}] and [{section}] both map to the "
+                f"file name '{file_name}', rename one of them"
+            )
+        names[entity_name] = file_names[file_name] = section
+
+        stream_args = {
+            "api_domain": config.get(
+                section, "api_domain", fallback=config.get("lookout", "api_domain", fallback="")
+            ),
+            "api_key": config.get(section, "api_key"),
+            "event_type": parse_event_types(config, section),
+            "proxies": proxies,
+        }
+
+        # Stream position and start time are per tenant, never inherited
+        stream_position = config.get(section, "stream_position", fallback="0")
+        start_time_str = config.get(section, "start_time", fallback="")
+
+        logger.info(f"Entity: {entity_name}")
+        logger.info(f"API Domain: {stream_args['api_domain']}")
+        logger.info(f"Event Types: {stream_args['event_type']}")
+
+        # Set stream position or start time
+        if stream_position and stream_position != "0":
+            stream_args["last_event_id"] = int(stream_position)
+            logger.info(f"Starting from stream position: {stream_position}")
+        elif start_time_str:
+            start_time = datetime.fromisoformat(start_time_str)
+            stream_args["start_time"] = start_time
+            logger.info(f"Starting from time: {start_time}")
+        else:
+            stream_args["last_event_id"] = 0
+            logger.info("Starting from beginning (position 0)")
+
+        tenants.append((entity_name, stream_args))
+    return tenants
+
+
 def parse_proxy(config: configparser.ConfigParser) -> dict:
     """Parse proxy configuration"""
     if "proxy" not in config:
@@ -114,8 +276,216 @@ def parse_proxy(config: configparser.ConfigParser) -> dict:
     return {}
 
 
+def create_checkpoint_store(
+    config: configparser.ConfigParser, config_file: str, logger: logging.Logger
+) -> CheckpointStore:
+    """Create the checkpoint store, by default next to the config file"""
+    backend = config.get("checkpoint", "backend", fallback=CHECKPOINT_BACKEND_JSON).lower()
+    default_file = os.path.join(
+        os.path.dirname(os.path.abspath(config_file)),
+        DEFAULT_SQLITE_CHECKPOINT_FILE
+        if backend == CHECKPOINT_BACKEND_SQLITE
+        else DEFAULT_CHECKPOINT_FILE,
+    )
+    checkpoint_file = config.get("checkpoint", "file", fallback="") or default_file
+    commit_interval = config.getfloat(
+        "checkpoint", "commit_interval", fallback=DEFAULT_COMMIT_INTERVAL
+    )
+    commit_events = config.getint("checkpoint", "commit_events", fallback=DEFAULT_COMMIT_EVENTS)
+
+    logger.info(f"Saving stream positions to {checkpoint_file}")
+    if backend == CHECKPOINT_BACKEND_SQLITE:
+        return SqliteEventStore(checkpoint_file, commit_interval, commit_events)
+    return CheckpointStore(checkpoint_file, commit_interval, commit_events)
+
+
+def create_deduplicators(
+    config: configparser.ConfigParser,
+    config_file: str,
+    tenants: List[Tuple[str, dict]],
+    logger: logging.Logger,
+) -> dict:
+    """Create the duplicate filter of each tenant if enabled, journaled next to the checkpoints"""
+    if not config.getboolean("dedup", "enabled", fallback=False):
+        return {}
+    checkpoint_file = config.get("checkpoint", "file", fallback="") or config_file
+    default_directory = os.path.join(
+        os.path.dirname(os.path.abspath(checkpoint_file)), DEFAULT_DEDUP_DIRECTORY
+    )
+    directory = config.get("dedup", "directory", fallback="") or default_directory
+    window = config.getint("dedup", "window", fallback=DEFAULT_DEDUP_WINDOW)
+    os.makedirs(directory, exist_ok=True)
+
+    logger.info(f"Dropping duplicates of the last {window} events per tenant, journal in {directory}")
+    deduplicators = {}
+    for entity_name, _ in tenants:
+        file_name = tenant_file_name(entity_name) + ".ids"
+        deduplicators[entity_name] = EventDeduplicator(os.path.join(directory, file_name), window)
+    return deduplicators
+
+
+def create_stream_recorders(
+    config: configparser.ConfigParser,
+    config_file: str,
+    tenants: List[Tuple[str, dict]],
+    logger: logging.Logger,
+) -> dict:
+    """Create the raw SSE recorder of each tenant if enabled, by default next to the config file"""
+    if not config.getboolean("record", "enabled", fallback=False):
+        return {}
+    default_directory = os.path.join(
+        os.path.dirname(os.path.abspath(config_file)), DEFAULT_RECORD_DIRECTORY
+    )
+    directory = config.get("record", "directory", fallback="") or default_directory
+    mib = 1024 * 1024
+    segment_size = config.getint(
+        "record", "segment_size_mb", fallback=DEFAULT_CAPTURE_SEGMENT_SIZE // mib
+    )
+    max_size = config.getint("record", "max_size_mb", fallback=DEFAULT_CAPTURE_MAX_BYTES // mib)
+
+    logger.info(f"Recording the raw SSE streams to {directory}, up to {max_size} MiB per tenant")
+    return {
+        entity_name: StreamRecorder(
+            os.path.join(directory, tenant_file_name(entity_name)), segment_size * mib, max_size * mib
+        )
+        for entity_name, _ in tenants
+    }
+
+
+def resume_from_checkpoint(
+    tenants: List[Tuple[str, dict]], checkpoint_store: CheckpointStore, logger: logging.Logger
+) -> None:
+    """Resume each tenant after its last checkpoint, overriding the configured position"""
+    for entity_name, stream_args in tenants:
+        stream_position = checkpoint_store.load(entity_name, stream_args["event_type"])
+        if stream_position:
+            stream_args["last_event_id"] = int(stream_position)
+            stream_args.pop("start_time", None)
+            logger.info(f"{entity_name}: resuming from saved stream position: {stream_position}")
+
+
+def create_syslog_spool(
+    config: configparser.ConfigParser, config_file: str, logger: logging.Logger
+) -> SyslogSpool:
+    """Create the disk spool for syslog outages if enabled, by default next to the config file"""
+    if not config.getboolean("spool", "enabled", fallback=False):
+        return None
+    default_directory = os.path.join(
+        os.path.dirname(os.path.abspath(config_file)), DEFAULT_SPOOL_DIRECTORY
+    )
+    directory = config.get("spool", "directory", fallback="") or default_directory
+    mib = 1024 * 1024
+    segment_size = config.getint("spool", "segment_size_mb", fallback=DEFAULT_SEGMENT_SIZE // mib)
+    max_size = config.getint("spool", "max_size_mb", fallback=DEFAULT_SPOOL_MAX_BYTES // mib)
+    overflow = config.get("spool", "overflow", fallback=SPOOL_OVERFLOW_BLOCK).lower()
+    sync = config.getboolean("spool", "sync", fallback=False)
+
+    logger.info(f"Spooling syslog outages to {directory}, up to {max_size} MiB")
+    return SyslogSpool(directory, segment_size * mib, max_size * mib, overflow, sync)
+
+
+def create_lag_trackers(
+    config: configparser.ConfigParser, tenants: List[Tuple[str, dict]]
+) -> dict:
+    """Create the lag tracker of each tenant"""
+    window = config.getint("lag", "window", fallback=DEFAULT_LAG_WINDOW)
+    stale_lag = config.getfloat("lag", "stale_seconds", fallback=DEFAULT_STALE_LAG)
+    report_interval = config.getfloat(
+        "lag", "report_interval", fallback=DEFAULT_LAG_REPORT_INTERVAL
+    )
+    return {
+        entity_name: LagTracker(entity_name, window, stale_lag, report_interval)
+        for entity_name, _ in tenants
+    }
+
+
+def create_profiler(
+    config: configparser.ConfigParser, log_file: str, logger: logging.Logger
+) -> SamplingProfiler:
+    """Create the on-demand CPU profiler if enabled, profiles are written next to the log file"""
+    if not config.getboolean("profiling", "enabled", fallback=True):
+        # NOTE: Ignored instead of the default action, SIGUSR1 would terminate the connector
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        return None
+    directory = config.get("profiling", "directory", fallback="") or os.path.dirname(
+        os.path.abspath(log_file)
+    )
+    seconds = config.getfloat("profiling", "seconds", fallback=DEFAULT_PROFILE_SECONDS)
+    interval_ms = config.getfloat(
+        "profiling", "interval_ms", fallback=DEFAULT_SAMPLE_INTERVAL * 1000
+    )
+    profiler = SamplingProfiler(directory, interval_ms / 1000, seconds)
+    signal.signal(signal.SIGUSR1, profiler.signal_handler)
+    logger.debug(f"Send SIGUSR1 to profile for {seconds:g}s, profiles are written to {directory}")
+    return profiler
+
+
+def create_memory_diagnostics(
+    config: configparser.ConfigParser, log_file: str, logger: logging.Logger
+) -> MemoryDiagnostics:
+    """Create the on-demand memory diagnostics if enabled, reports are written next to the log file"""
+    if not config.getboolean("memory", "enabled", fallback=True):
+        # NOTE: Ignored instead of the default action, SIGUSR2 would terminate the connector
+        signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+        return None
+    directory = config.get("memory", "directory", fallback="") or os.path.dirname(
+        os.path.abspath(log_file)
+    )
+    seconds = config.getfloat("memory", "seconds", fallback=DEFAULT_MEMORY_SECONDS)
+    interval = config.getfloat("memory", "interval", fallback=DEFAULT_MEMORY_INTERVAL)
+    frames = config.getint("memory", "frames", fallback=DEFAULT_TRACE_FRAMES)
+    memory_diagnostics = MemoryDiagnostics(directory, seconds, interval, frames)
+    signal.signal(signal.SIGUSR2, memory_diagnostics.signal_handler)
+    logger.debug(f"Send SIGUSR2 to trace memory for {seconds:g}s, reports are written to {directory}")
+    return memory_diagnostics
+
+
+def start_metrics_server(
+    config: configparser.ConfigParser,
+    logger: logging.Logger,
+    lag_trackers: dict = None,
+    profiler: SamplingProfiler = None,
+    memory_diagnostics: MemoryDiagnostics = None,
+) -> MetricsServer:
+    """Serve the metrics in Prometheus text format, the lag status and control commands if enabled"""
+    if not config.getboolean("metrics", "enabled", fallback=False):
+        return None
+    address = config.get("metrics", "address", fallback="") or DEFAULT_METRICS_ADDRESS
+    port = config.getint("metrics", "port", fallback=DEFAULT_METRICS_PORT)
+    lag_trackers = lag_trackers or {}
+    commands = {}
+    if profiler:
+        # POST /profile?seconds=N, answers whether a capture started
+        commands[PROFILE_ROUTE] = lambda query: {
+            "started": profiler.start(float(query["seconds"]) if "seconds" in query else None),
+            **profiler.status(),
+        }
+    if memory_diagnostics:
+        # POST /memory?seconds=N&interval=M, answers whether a capture started
+        commands[MEMORY_ROUTE] = lambda query: {
+            "started": memory_diagnostics.start(
+                float(query["seconds"]) if "seconds" in query else None,
+                float(query["interval"]) if "interval" in query else None,
+            ),
+            **memory_diagnostics.status(),
+        }
+    metrics_server = MetricsServer(
+        address,
+        port,
+        status=lambda: {
+            "tenants": {name: tracker.status() for name, tracker in lag_trackers.items()},
+            "profiler": profiler.status() if profiler else None,
+            "memory": memory_diagnostics.status() if memory_diagnostics else None,
+        },
+        commands=commands,
+    )
+    metrics_server.start()
+    logger.info(f"Serving metrics on http://{address}:{metrics_server.address[1]}/metrics")
+    return metrics_server
+
+
 def create_event_forwarder(
-    config: configparser.ConfigParser, logger: logging.Logger
+    config: configparser.ConfigParser, logger: logging.Logger, spool: SyslogSpool = None
 ) -> Tuple:
     """Create appropriate event forwarder based on config"""
     syslog_host = config.get("syslog", "host", fallback="localhost")
@@ -124,18 +494,67 @@ def create_event_forwarder(
     
     log_identifier_key = config.get("syslog", "log_identifier_key", fallback="")
     log_identifier = config.get("syslog", "log_identifier", fallback="")
+    use_event_time = config.getboolean("syslog", "use_event_time", fallback=False)
+    framing = config.get("syslog", "framing", fallback=SYSLOG_FRAMING_NUL).lower()
+    translation_workers = config.getint("performance", "translation_workers", fallback=0)
+    connections = config.getint("syslog", "connections", fallback=1)
 
     console_address = (syslog_host, syslog_port)
-
-    if forwarder_type == "splunk":
-        logger.info(f"Using Splunk event forwarder to {syslog_host}:{syslog_port}")
+    passthrough = config.getboolean("splunk", "passthrough", fallback=True)
+
+    if forwarder_type == "splunk_hec":
+        url = config.get("splunk", "hec_url")
+        in_flight = config.getint("splunk", "hec_in_flight", fallback=DEFAULT_HEC_IN_FLIGHT)
+        batch_kb = config.getint("splunk", "hec_batch_kb", fallback=DEFAULT_HEC_BATCH_BYTES // 1024)
+        compresslevel = config.getint(
+            "splunk", "hec_compress_level", fallback=DEFAULT_HEC_COMPRESSLEVEL
+        )
+        logger.info(f"Using Splunk HTTP Event Collector forwarder to {url}")
+        return SplunkHECEventForwarder(
+            url,
+            config.get("splunk", "hec_token"),
+            index=config.get("splunk", "hec_index", fallback=""),
+            source=config.get("splunk", "hec_source", fallback="mrav2"),
+            sourcetype=config.get("splunk", "hec_sourcetype", fallback="_json"),
+            in_flight=in_flight,
+            batch_bytes=batch_kb * 1024,
+            compresslevel=compresslevel,
+            retries=config.getint("splunk", "hec_retries", fallback=DEFAULT_HEC_RETRIES),
+            verify=config.getboolean("splunk", "hec_verify_tls", fallback=True),
+            passthrough=passthrough,
+        )
+    elif forwarder_type == "splunk":
+        flush_kb = config.getint("splunk", "flush_kb", fallback=DEFAULT_FLUSH_BYTES // 1024)
+        flush_interval = config.getfloat(
+            "splunk", "flush_interval", fallback=DEFAULT_FLUSH_INTERVAL
+        )
+        flush_on_heartbeat = config.getboolean("splunk", "flush_on_heartbeat", fallback=True)
+        if flush_kb:
+            logger.info(
+                f"Using Splunk event forwarder to stdout, "
+                f"flushing {flush_kb} KiB or every {flush_interval:g}s"
+            )
+        else:
+            logger.info("Using Splunk event forwarder to stdout")
         return SplunkEventForwarder(
-            console_address, log_identifier_key, log_identifier, None
+            None,
+            flush_bytes=flush_kb * 1024,
+            flush_interval=flush_interval,
+            flush_on_heartbeat=flush_on_heartbeat,
+            passthrough=passthrough,
         )
     else:
         logger.info(f"Using QRadar event forwarder to {syslog_host}:{syslog_port}")
         return QRadarEventForwarder(
-            console_address, log_identifier_key, log_identifier, None
+            console_address,
+            log_identifier_key,
+            log_identifier,
+            None,
+            use_event_time,
+            framing,
+            translation_workers,
+            connections,
+            spool,
         )
 
 
@@ -162,45 +581,74 @@ def main():
         logger.info(f"Loaded configuration from {args.config}")
 
         # Parse configuration
-        entity_name = config.get("lookout", "entity_name")
-        api_domain = config.get("lookout", "api_domain")
-        api_key = config.get("lookout", "api_key")
-        event_types = parse_event_types(config)
         proxies = parse_proxy(config)
-        
-        stream_position = config.get("lookout", "stream_position", fallback="0")
-        start_time_str = config.get("lookout", "start_time", fallback="")
-
-        logger.info(f"Entity: {entity_name}")
-        logger.info(f"API Domain: {api_domain}")
-        logger.info(f"Event Types: {event_types}")
-
-        # Create event forwarder
-        event_forwarder = create_event_forwarder(config, logger)
-
-        # Setup stream arguments
-        stream_args = {
-            "api_domain": api_domain,
-            "api_key": api_key,
-            "event_type": event_types,
-            "proxies": proxies,
-        }
+        tenants = parse_tenants(config, proxies, logger)
+        lag_trackers = create_lag_trackers(config, tenants)
+        profiler = create_profiler(config, args.log_file, logger)
+        memory_diagnostics = create_memory_diagnostics(config, args.log_file, logger)
+        metrics_server = start_metrics_server(
+            config, logger, lag_trackers, profiler, memory_diagnostics
+        )
 
-        # Set stream position or start time
-        if stream_position and stream_position != "0":
-            stream_args["last_event_id"] = int(stream_position)
-            logger.info(f"Starting from stream position: {stream_position}")
-        elif start_time_str:
-            start_time = datetime.fromisoformat(start_time_str)
-            stream_args["start_time"] = start_time
-            logger.info(f"Starting from time: {start_time}")
+        # Resume every tenant after its last forwarded batch
+        checkpoint_store = create_checkpoint_store(config, args.config, logger)
+        resume_from_checkpoint(tenants, checkpoint_store, logger)
+        deduplicators = create_deduplicators(config, args.config, tenants, logger)
+        recorders = create_stream_recorders(config, args.config, tenants, logger)
+
+        # Create one event forwarder shared by all tenants
+        spool = create_syslog_spool(config, args.config, logger)
+        event_forwarder = create_event_forwarder(config, logger, spool)
+        # NOTE: Checkpoints are only committed once the events they cover left the forwarder
+        checkpoint_store.before_commit.append(event_forwarder.flush)
+
+        # Create and start MRA stream threads
+        engine = config.get("performance", "engine", fallback=ENGINE_THREADS).lower()
+        if engine == ENGINE_ASYNCIO:
+            # NOTE: Imported here, the asyncio engine needs the optional aiohttp dependency
+            from .mra_v2_async_stream_thread import MRAv2AsyncStreamThread
+
+            logger.info("Using asyncio stream engine")
+            mra_thread = MRAv2AsyncStreamThread()
+            for entity_name, stream_args in tenants:
+                mra_thread.addStream(
+                    entity_name,
+                    event_forwarder,
+                    checkpoint_store.eventStore(entity_name, stream_args["event_type"]),
+                    deduplicators.get(entity_name),
+                    lag_trackers[entity_name],
+                    recorder=recorders.get(entity_name),
+                    **stream_args,
+                )
+            mra_threads = [mra_thread]
         else:
-            stream_args["last_event_id"] = 0
-            logger.info("Starting from beginning (position 0)")
-
-        # Create and start MRA stream thread
-        mra_thread = MRAv2StreamThread(entity_name, event_forwarder, **stream_args)
-        mra_thread.start()
+            queue_size = config.getint("performance", "queue_size", fallback=DEFAULT_QUEUE_SIZE)
+            forward_threads = config.getint("performance", "forward_threads", fallback=1)
+            stream_over_kb = config.getint(
+                "performance", "stream_over_kb", fallback=DEFAULT_STREAM_OVER_KB
+            )
+            stream_batch_events = config.getint(
+                "performance", "stream_batch_events", fallback=DEFAULT_STREAM_BATCH_EVENTS
+            )
+            mra_threads = [
+                MRAv2StreamThread(
+                    entity_name,
+                    event_forwarder,
+                    queue_size=queue_size,
+                    forward_threads=forward_threads,
+                    stream_batch_events=stream_batch_events,
+                    stream_over=stream_over_kb * 1024,
+                    event_store=checkpoint_store.eventStore(entity_name, stream_args["event_type"]),
+                    deduplicator=deduplicators.get(entity_name),
+                    lag_tracker=lag_trackers[entity_name],
+                    recorder=recorders.get(entity_name),
+                    **stream_args,
+                )
+                for entity_name, stream_args in tenants
+            ]
+        for mra_thread in mra_threads:
+            mra_thread.start()
+        logger.info(f"Streaming {len(tenants)} tenant(s)")
 
         logger.info("MRAv2 Syslog Connector started successfully")
         logger.info("Press Ctrl+C to stop")
@@ -211,10 +659,20 @@ def main():
 
         # Shutdown gracefully
         logger.info("Shutting down...")
-        mra_thread.shutdown_flag.set()
-        if mra_thread.is_alive():
-            mra_thread.join(timeout=10)
-        
+        for mra_thread in mra_threads:
+            mra_thread.shutdown_flag.set()
+        for mra_thread in mra_threads:
+            if mra_thread.is_alive():
+                mra_thread.join(timeout=10)
+        event_forwarder.close()
+        if spool:
+            spool.close()
+        checkpoint_store.close()
+        for recorder in recorders.values():
+            recorder.close()
+        if metrics_server:
+            metrics_server.close()
+
         logger.info("MRAv2 Syslog Connector stopped")
 
     except Exception as e:
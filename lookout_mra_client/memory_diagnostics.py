@@ -0,0 +1,321 @@
+"""
+Module containing the on-demand memory diagnostics of the connector.
+
+A capture is started by SIGUSR2 or by POST /memory on the metrics server. It starts
+tracemalloc, takes a baseline `MemorySnapshot`, another one every `interval` seconds
+for `seconds`, and writes a report next to the log file: the trend of traced memory,
+RSS and object counts, the allocation sites that grew most since the baseline, and
+the object types that grew, e.g. loggers, handlers, sockets or dicts. tracemalloc is
+stopped again after the capture, it slows allocations down while it traces.
+
+`MemorySnapshot` and `growth` can also be used directly, e.g. by a soak test asserting
+that memory stays flat, see benchmarks/soak_memory.py.
+"""
+
+import gc, logging, os, socket, threading, time, tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .lookout_logger import LOGGER_NAME
+
+# Length of a capture
+DEFAULT_MEMORY_SECONDS = 300  # seconds
+# Time between two snapshots of a capture
+DEFAULT_MEMORY_INTERVAL = 30  # seconds
+# Upper bound of a requested capture length
+MAX_MEMORY_SECONDS = 24 * 60 * 60  # seconds
+# Stack frames stored per traced allocation
+DEFAULT_TRACE_FRAMES = 10
+# Allocation sites and object types listed in the report
+MEMORY_TOP_ENTRIES = 25
+MEMORY_FILE_PREFIX = "mrav2-memory-"
+# Modules whose objects are not counted in a snapshot
+DIAGNOSTICS_MODULES = ("tracemalloc", __name__)
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Returns:
+        Optional[int]: Resident set size of the process, None if unknown.
+    """
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def open_files() -> Optional[int]:
+    """
+    Returns:
+        Optional[int]: Open file descriptors of the process, None if unknown.
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def type_name(cls: type) -> str:
+    if cls.__module__ == "builtins":
+        return cls.__qualname__
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class MemorySnapshot:
+    """
+    Memory usage of the process at one point in time.
+
+    Args:
+        trace (bool, optional): Include a tracemalloc snapshot, if tracemalloc is tracing.
+            Defaults to True.
+    """
+
+    def __init__(self, trace: bool = True) -> None:
+        self.time = time.time()
+        gc.collect()
+        objects = gc.get_objects()
+        # Objects tracked by the garbage collector by type, e.g. dict, list or classes.
+        # NOTE: A plain dict of counts is not tracked itself, and objects of the diagnostics
+        #   and of tracemalloc are left out, so earlier snapshots do not count as growth.
+        self.objects: Dict[str, int] = dict(
+            Counter(
+                type_name(cls)
+                for cls in map(type, objects)
+                if cls.__module__ not in DIAGNOSTICS_MODULES
+            )
+        )
+        sockets = sum(1 for obj in objects if isinstance(obj, socket.socket))
+        del objects
+        # Usual suspects of leaks, by name
+        self.resources: Dict[str, Optional[int]] = {
+            "loggers": len(logging.Logger.manager.loggerDict),
+            # NOTE: Every handler ever created and not collected, also closed ones
+            "handlers": len(getattr(logging, "_handlerList", ())),
+            "sockets": sockets,
+            "threads": threading.active_count(),
+            "open_files": open_files(),
+        }
+        self.rss = rss_bytes()
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.traced: Optional[int] = None
+        if tracemalloc.is_tracing():
+            self.traced = tracemalloc.get_traced_memory()[0]
+            if trace:
+                # NOTE: Snapshots taken before are traced too, they are left out of the size
+                self.snapshot = tracemalloc.take_snapshot().filter_traces(
+                    (
+                        tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, __file__, all_frames=True),
+                    )
+                )
+                self.traced = sum(stat.size for stat in self.snapshot.statistics("filename"))
+
+    @property
+    def counts(self) -> Dict[str, Optional[int]]:
+        """
+        Returns:
+            Dict[str, Optional[int]]: Resources, RSS, traced bytes and number of objects.
+        """
+        return dict(
+            self.resources,
+            rss=self.rss,
+            traced=self.traced,
+            objects=sum(self.objects.values()),
+        )
+
+
+def growth(before: MemorySnapshot, after: MemorySnapshot) -> Dict[str, int]:
+    """
+    Returns:
+        Dict[str, int]: Change of every count known in both snapshots, see MemorySnapshot.counts.
+    """
+    return {
+        name: after.counts[name] - value
+        for name, value in before.counts.items()
+        if value is not None and after.counts[name] is not None
+    }
+
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return "n/a"
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return f"{sign}{value:.0f}{unit}" if unit == "B" else f"{sign}{value:.1f}{unit}"
+        value /= 1024
+    return f"{sign}{value:.1f}GiB"
+
+
+def memory_report(snapshots: List[MemorySnapshot], top: int = MEMORY_TOP_ENTRIES) -> str:
+    """
+    Args:
+        snapshots (List[MemorySnapshot]): Snapshots in time order, the first is the baseline.
+        top (int, optional): Allocation sites and object types listed.
+            Defaults to MEMORY_TOP_ENTRIES.
+
+    Returns:
+        str: Trend of the counts, allocation sites and object types that grew since the
+            baseline, and the object types that grew between every two snapshots.
+    """
+    baseline, last = snapshots[0], snapshots[-1]
+    lines = [
+        f"Memory report of {len(snapshots)} snapshot(s) over {last.time - baseline.time:.0f}s",
+        "",
+        "Trend:",
+        f"{'seconds':>8} {'rss':>10} {'traced':>10} {'objects':>9} {'loggers':>8} "
+        f"{'handlers':>8} {'sockets':>8} {'threads':>8} {'files':>6}",
+    ]
+    for snapshot in snapshots:
+        counts = snapshot.counts
+        lines.append(
+            f"{snapshot.time - baseline.time:>8.0f} {format_bytes(counts['rss']):>10} "
+            f"{format_bytes(counts['traced']):>10} {counts['objects']:>9} {counts['loggers']:>8} "
+            f"{counts['handlers']:>8} {counts['sockets']:>8} {counts['threads']:>8} "
+            f"{counts['open_files'] if counts['open_files'] is not None else 'n/a':>6}"
+        )
+    lines += ["", "Growth since the baseline:"]
+    lines += [f"{name:>12} {value:+}" for name, value in growth(baseline, last).items()]
+
+    if baseline.snapshot and last.snapshot:
+        lines += ["", "Top allocation sites by growth since the baseline:"]
+        for stat in last.snapshot.compare_to(baseline.snapshot, "traceback")[:top]:
+            if stat.size_diff <= 0:
+                break
+            lines.append(
+                f"{format_bytes(stat.size_diff):>10} {stat.count_diff:>+9} blocks, "
+                f"{format_bytes(stat.size)} in {stat.count} blocks"
+            )
+            lines += [f"    {line}" for line in stat.traceback.format(most_recent_first=True)]
+
+    lines += ["", "Object types by growth since the baseline:"]
+    type_growth = Counter(last.objects)
+    type_growth.subtract(baseline.objects)
+    for name, count in type_growth.most_common(top):
+        if count <= 0:
+            break
+        lines.append(f"{count:>+10} {last.objects.get(name, 0):>10}  {name}")
+
+    if len(snapshots) > 2:
+        steady = [
+            name
+            for name in last.objects
+            if all(
+                later.objects.get(name, 0) > earlier.objects.get(name, 0)
+                for earlier, later in zip(snapshots, snapshots[1:])
+            )
+        ]
+        lines += ["", "Object types that grew between every two snapshots:"]
+        lines += [f"{last.objects[name]:>10}  {name}" for name in steady] or ["      none"]
+    return "\n".join(lines) + "\n"
+
+
+class MemoryDiagnostics:
+    """
+    Time-boxed memory capture, one at a time.
+
+    Args:
+        directory (str): Directory of the reports.
+        seconds (float, optional): Default capture length. Defaults to DEFAULT_MEMORY_SECONDS.
+        interval (float, optional): Seconds between snapshots.
+            Defaults to DEFAULT_MEMORY_INTERVAL.
+        frames (int, optional): Stack frames stored per allocation.
+            Defaults to DEFAULT_TRACE_FRAMES.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        seconds: float = DEFAULT_MEMORY_SECONDS,
+        interval: float = DEFAULT_MEMORY_INTERVAL,
+        frames: int = DEFAULT_TRACE_FRAMES,
+    ) -> None:
+        self.directory = directory
+        self.seconds = seconds
+        self.interval = interval
+        self.frames = frames
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        # Path of the report of the last finished capture
+        self.last_report: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds: float = None, interval: float = None) -> bool:
+        """
+        Start a capture in the background, safe to call from a signal handler.
+
+        Args:
+            seconds (float, optional): Capture length, capped at MAX_MEMORY_SECONDS.
+                Defaults to the diagnostics' seconds.
+            interval (float, optional): Seconds between snapshots.
+                Defaults to the diagnostics' interval.
+
+        Returns:
+            bool: False if a capture is already running.
+        """
+        seconds = min(seconds or self.seconds, MAX_MEMORY_SECONDS)
+        interval = min(interval or self.interval, seconds)
+        with self.lock:
+            if self.running:
+                self.logger.warning("Memory capture already running, request ignored")
+                return False
+            self.thread = threading.Thread(
+                target=self.__capture, args=(seconds, interval), name="MemoryDiagnostics", daemon=True
+            )
+            self.thread.start()
+        return True
+
+    def status(self) -> dict:
+        return {"running": self.running, "last_report": self.last_report}
+
+    def signal_handler(self, sig, frame) -> None:
+        self.start()
+
+    def __capture(self, seconds: float, interval: float) -> None:
+        self.logger.info(f"Tracing memory for {seconds:g}s, a snapshot every {interval:g}s")
+        # NOTE: Left running if it was started elsewhere, e.g. PYTHONTRACEMALLOC
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(self.frames)
+        try:
+            snapshots = [MemorySnapshot()]
+            deadline = time.monotonic() + seconds
+            while True:
+                delay = min(interval, deadline - time.monotonic())
+                if delay > 0:
+                    time.sleep(delay)
+                snapshots.append(MemorySnapshot())
+                if len(snapshots) > 2:
+                    # NOTE: Only the baseline and the last snapshot are diffed, drop the traces between
+                    snapshots[-2].snapshot = None
+                if time.monotonic() >= deadline:
+                    break
+            report = memory_report(snapshots)
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        path = os.path.join(
+            self.directory, MEMORY_FILE_PREFIX + time.strftime("%Y%m%d-%H%M%S") + ".txt"
+        )
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w") as report_file:
+                report_file.write(report)
+        except OSError as e:
+            self.logger.error(f"Failed to write memory report to {self.directory}: {e}")
+            return
+        self.last_report = path
+        change = growth(snapshots[0], snapshots[-1])
+        self.logger.info(
+            f"Memory report written to {path}, RSS {format_bytes(change.get('rss'))}, "
+            f"{change['objects']:+} objects, {change['loggers']:+} loggers, "
+            f"{change['sockets']:+} sockets since the baseline"
+        )
@@ -0,0 +1,426 @@
+"""
+Module containing an in-process metrics registry, exposed over HTTP in the Prometheus
+text format.
+
+Counters and histograms keep one row of counts per thread, so recording a value never
+takes a lock: a thread only ever increments its own row, and a scrape adds up the rows
+of all threads. Histograms use fixed buckets and one bisect per observation. The
+connector records a handful of values per event batch, not per event, about 2us per
+batch or under 0.1% of decoding and translating 100 events, see benchmarks/bench_metrics.py.
+
+The metrics of the connector are defined at the bottom of this module.
+"""
+
+import http.server, json, logging, math, threading
+from bisect import bisect_left
+from urllib.parse import parse_qsl
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .lookout_logger import LOGGER_NAME
+
+# Upper bounds in seconds of the latency histogram buckets, +Inf is implicit
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEFAULT_METRICS_ADDRESS = "127.0.0.1"
+# Port of the metrics endpoint, the default of Prometheus exporters in development
+DEFAULT_METRICS_PORT = 9464
+METRICS_ROUTE = "/metrics"
+# JSON status of the connector, e.g. the lag of every tenant
+STATUS_ROUTE = "/status"
+# Control commands starting a CPU profile and a memory diagnostics capture
+PROFILE_ROUTE = "/profile"
+MEMORY_ROUTE = "/memory"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class ThreadCells:
+    """
+    Per-thread rows of counts. Each thread increments its own row without locking.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.local = threading.local()
+        # Rows of all threads, also of threads that ended, their counts still count
+        self.rows: List[list] = []
+        self.lock = threading.Lock()
+
+    def row(self) -> list:
+        try:
+            return self.local.row
+        except AttributeError:
+            row = [0] * self.size
+            with self.lock:
+                self.rows.append(row)
+            self.local.row = row
+            return row
+
+    def totals(self) -> list:
+        with self.lock:
+            rows = list(self.rows)
+        return [sum(column) for column in zip(*rows)] if rows else [0] * self.size
+
+
+class CounterChild:
+    def __init__(self) -> None:
+        self.cells = ThreadCells(1)
+        self.local = self.cells.local
+
+    def inc(self, amount: float = 1) -> None:
+        try:
+            self.local.row[0] += amount
+        except AttributeError:
+            self.cells.row()[0] += amount
+
+    def samples(self) -> Iterable[Tuple[str, tuple, float]]:
+        yield "", (), self.cells.totals()[0]
+
+
+class GaugeChild:
+    def __init__(self) -> None:
+        self.value = 0
+        self.function: Callable[[], float] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Read the value from function on every scrape instead.
+        """
+        self.function = function
+
+    def samples(self) -> Iterable[Tuple[str, tuple, float]]:
+        yield "", (), self.function() if self.function else self.value
+
+
+class HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # Row: count per bucket, +Inf bucket, sum of the observed values
+        self.cells = ThreadCells(len(buckets) + 2)
+        self.local = self.cells.local
+
+    def observe(self, value: float) -> None:
+        try:
+            row = self.local.row
+        except AttributeError:
+            row = self.cells.row()
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, tuple, float]]:
+        totals = self.cells.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), totals):
+            cumulative += count
+            yield "_bucket", (("le", format_value(bound)),), cumulative
+        yield "_sum", (), totals[-1]
+        yield "_count", (), cumulative
+
+
+class Metric:
+    """
+    Metric family, one child per combination of label values.
+
+    Args:
+        name (str): Metric name.
+        help (str): Description.
+        labelnames (Tuple[str, ...], optional): Label names. Defaults to no labels.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[tuple, object] = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            # Metrics without labels are exposed from the start, e.g. 0 reconnects
+            self.labels()
+
+    def labels(self, *values: str):
+        """
+        Returns:
+            The child of the label values, created on first use. Keep it to record
+            values without the lookup.
+        """
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self.lock:
+            children = list(self.children.items())
+        for values, child in children:
+            labels = tuple(zip(self.labelnames, values))
+            for suffix, extra_labels, value in child.samples():
+                lines.append(
+                    f"{self.name}{suffix}{format_labels(labels + extra_labels)} {format_value(value)}"
+                )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """
+    Named metrics of the process. Creating a metric that exists returns the existing one.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.__register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.__register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.__register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def __register(self, metric: Metric) -> Metric:
+        with self.lock:
+            existing = self.metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric):
+            raise ValueError(f"{metric.name} is already registered as a {existing.type}")
+        return existing
+
+
+class MetricsServer:
+    """
+    HTTP server answering GET /metrics and GET /status, and POSTs of control commands,
+    from a daemon thread.
+
+    Args:
+        address (str, optional): Listen address. Defaults to DEFAULT_METRICS_ADDRESS.
+        port (int, optional): Listen port, 0 for any free port. Defaults to DEFAULT_METRICS_PORT.
+        registry (MetricsRegistry, optional): Metrics to expose. Defaults to REGISTRY.
+        status (Callable[[], dict], optional): Returns the JSON served on /status.
+            Defaults to None, an empty status.
+        commands (Dict[str, Callable[[dict], dict]], optional): Control commands by route,
+            called with the query parameters of a POST, return the JSON response.
+            Defaults to None, no commands.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_METRICS_ADDRESS,
+        port: int = DEFAULT_METRICS_PORT,
+        registry: "MetricsRegistry" = None,
+        status: Callable[[], dict] = None,
+        commands: Dict[str, Callable[[dict], dict]] = None,
+    ) -> None:
+        self.registry = registry or REGISTRY
+        self.status = status
+        self.commands = commands or {}
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.server = http.server.ThreadingHTTPServer((address, port), self.__handler())
+        self.server.daemon_threads = True
+        self.address = self.server.server_address[:2]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="MetricsServer", daemon=True
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __handler(self) -> type:
+        server = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                route = self.path.split("?")[0]
+                if route == METRICS_ROUTE:
+                    body = server.registry.render().encode("utf-8")
+                    content_type = CONTENT_TYPE
+                elif route == STATUS_ROUTE:
+                    status = server.status() if server.status else {}
+                    body = json.dumps(status, indent=2, default=str).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.__respond(body, content_type)
+
+            def do_POST(self) -> None:
+                route, _, query = self.path.partition("?")
+                command = server.commands.get(route)
+                if command is None:
+                    self.send_error(404)
+                    return
+                try:
+                    result = command(dict(parse_qsl(query)))
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self.__respond(json.dumps(result, default=str).encode("utf-8"), "application/json")
+
+            def __respond(self, body: bytes, content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                server.logger.debug(f"Metrics endpoint - {self.address_string()} {format % args}")
+
+        return MetricsHandler
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics of the connector
+EVENTS_RECEIVED = REGISTRY.counter(
+    "mrav2_events_received_total", "MRA v2 events received.", ("tenant",)
+)
+BYTES_RECEIVED = REGISTRY.counter(
+    "mrav2_bytes_received_total", "Bytes of MRA v2 event batches received.", ("tenant",)
+)
+# NOTE: SSE framing is not included, it is read by the stream before the batch is decoded
+DECODE_SECONDS = REGISTRY.histogram(
+    "mrav2_decode_seconds", "Time decoding the JSON of one event batch.", ("tenant",)
+)
+TRANSLATE_SECONDS = REGISTRY.histogram(
+    "mrav2_translate_seconds", "Time translating one event batch to syslog messages."
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "mrav2_syslog_send_seconds", "Time writing one event batch to syslog."
+)
+RECONNECTS = REGISTRY.counter("mrav2_reconnects_total", "Reconnects to the MRA v2 stream.")
+TOKEN_FETCHES = REGISTRY.counter("mrav2_token_fetches_total", "OAuth2 access token requests.")
+QUEUE_DEPTH = REGISTRY.gauge(
+    "mrav2_queue_depth", "Event batches waiting to be forwarded (threads engine).", ("tenant",)
+)
+CHECKPOINT_PENDING_EVENTS = REGISTRY.gauge(
+    "mrav2_checkpoint_pending_events", "Forwarded events whose checkpoint is not saved yet."
+)
+CHECKPOINT_LAG_SECONDS = REGISTRY.gauge(
+    "mrav2_checkpoint_lag_seconds", "Age of the oldest forwarded batch whose checkpoint is not saved yet."
+)
+EVENT_LAG_SECONDS = REGISTRY.gauge(
+    "mrav2_event_lag_seconds",
+    "Rolling percentiles of the time from event creation to the syslog write.",
+    ("tenant", "quantile"),
+)
+DELIVERY_LAG_SECONDS = REGISTRY.gauge(
+    "mrav2_delivery_lag_seconds",
+    "Rolling percentiles of the time from event creation to receiving it from MRA v2.",
+    ("tenant", "quantile"),
+)
+PIPELINE_SECONDS = REGISTRY.gauge(
+    "mrav2_pipeline_seconds",
+    "Rolling percentiles of the time from receiving a batch to its syslog write.",
+    ("tenant", "quantile"),
+)
+EVENT_ID_DISTANCE = REGISTRY.gauge(
+    "mrav2_event_id_distance",
+    "Stream positions received from MRA v2 but not forwarded yet.",
+    ("tenant",),
+)
+HEC_REQUESTS = REGISTRY.counter(
+    "mrav2_hec_requests_total", "Splunk HTTP Event Collector requests by status.", ("status",)
+)
+HEC_BYTES_SENT = REGISTRY.counter(
+    "mrav2_hec_bytes_sent_total", "Request body bytes sent to the Splunk HTTP Event Collector."
+)
+HEC_SEND_SECONDS = REGISTRY.histogram(
+    "mrav2_hec_send_seconds", "Time sending one request to the Splunk HTTP Event Collector, with retries."
+)
@@ -0,0 +1,29 @@
+from peewee import *
+
+from .base_model import BaseModel
+
+
+class StreamCheckpoint(BaseModel):
+    """
+    Last forwarded position of one MRA v2 stream, one row per enterprise and stream type.
+    """
+
+    ent_name = CharField()
+    stream_type = CharField()
+    stream_position = CharField()
+    fetch_count = IntegerField(default=0)
+    fetched_at = DateTimeField(null=True)
+
+    class Meta:
+        table_name = "StreamCheckpoint"
+        indexes = ((("ent_name", "stream_type"), True),)
+
+    def __repr__(self) -> str:
+        return f"""
+StreamCheckpoint(
+    ent_name:        {self.ent_name}
+    stream_type:     {self.stream_type}
+    stream_position: {self.stream_position}
+    fetch_count:     {self.fetch_count}
+    fetched_at:      {self.fetched_at}
+)"""
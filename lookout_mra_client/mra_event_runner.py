@@ -57,6 +57,7 @@ class MRAEventRunner:
         self.refresh_config_count = 0
 
         self.mra_client = None
+        self.syslog_client: SyslogClient = None
 
         self.running = True
 
@@ -101,12 +102,15 @@ class MRAEventRunner:
             self.logger.info("Received {} events from mra".format(len(events)))
 
             """
-            Initialize Syslog Client here to avoid the syslog socket getting stale
+            The Syslog Client is kept between fetches and reconnects by itself when the
+            syslog socket goes stale.
             JIRA: EMM-8312: Events stop appearing in QRadar if there has been long (~15 minute)
             break between events
             """
-            client_name = "SyslogClient" + str(time.time())
-            syslog_client = SyslogClient(client_name, self.event_formatter, self.console_address)
+            if self.syslog_client is None:
+                self.syslog_client = SyslogClient(
+                    "SyslogClient", self.event_formatter, self.console_address
+                )
 
             for event in events:
                 # set defaults if not present
@@ -116,7 +120,7 @@ class MRAEventRunner:
                     event[self.log_identifier_key] = self.log_identifier
 
                 # Write to syslog
-                syslog_client.write(event)
+                self.syslog_client.write(event)
 
             self.logger.info("Wrote {} events to syslog".format(len(events)))
 
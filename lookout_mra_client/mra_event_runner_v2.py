@@ -57,8 +57,8 @@ class MRAEventRunnerV2:
             self.logger.info(f"Wrote {len(events)} events to syslog")
 
             # Save current stream position to avoid repeating events.
-            if self.mra_v2.stream.last_event_id != self.configuration.stream_position:
-                self.configuration.stream_position = self.mra_v2.stream.last_event_id
+            if self.mra_v2.last_event_id != self.configuration.stream_position:
+                self.configuration.stream_position = self.mra_v2.last_event_id
                 self.configuration.fetch_count += len(events)
         else:
             self.logger.info("No new events...")
@@ -0,0 +1,196 @@
+import asyncio, logging, threading, sys, time
+from typing import List
+
+import aiohttp
+
+from .event_dedup import EventDeduplicator
+from .event_forwarders.event_forwarder import EventForwarder
+from .event_passthrough import decode_events, load_events
+from .event_store.event_store import EventStore
+from .lag_tracker import LagTracker
+from .lookout_logger import LOGGER_NAME
+from .metrics import BYTES_RECEIVED, EVENTS_RECEIVED, DECODE_SECONDS
+from .mra_v2_async_stream import AsyncMRAv2Stream
+
+# How often the event loop checks the shutdown flag
+SHUTDOWN_POLL_INTERVAL = 1  # seconds
+
+
+class MRAv2StreamTask:
+    """
+    One tenant stream of a MRAv2AsyncStreamThread, reading events from
+    AsyncMRAv2Stream and writing them with the tenant's event forwarder.
+
+    Exposes the same `last_event_id` and `error` attributes as MRAv2StreamThread.
+    """
+
+    def __init__(
+        self,
+        entName: str,
+        eventForwarder: EventForwarder,
+        event_store: EventStore = None,
+        deduplicator: EventDeduplicator = None,
+        lag_tracker: LagTracker = None,
+        **kwargs,
+    ) -> None:
+        """
+        Args:
+            entName (str): Enterprise name.
+            eventForwarder (EventForwarder): Forwarder receiving the event batches.
+            event_store (EventStore, optional): Store receiving the event id of every
+                forwarded batch, so a restart resumes after it. Defaults to None.
+            deduplicator (EventDeduplicator, optional): Drops events delivered again after
+                a reconnect or restart. Defaults to None.
+            lag_tracker (LagTracker, optional): Lag of the stream.
+                Defaults to a LagTracker with default thresholds.
+            kwargs: AsyncMRAv2Stream arguments.
+        """
+        self.ent_name = entName
+        self.event_store = event_store
+        self.deduplicator = deduplicator
+        self.lag_tracker = lag_tracker or LagTracker(entName)
+        self.name = f"MRAv2StreamTask-{entName}"
+        self.event_forwarder = eventForwarder
+        # Decoder of the event batches, keeps the JSON text of events for passthrough
+        self.decode_events = decode_events if eventForwarder.passthrough else load_events
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.error = None
+
+        self.stream = AsyncMRAv2Stream(**kwargs)
+        # Event id of the latest batch handed to the event forwarder
+        self.last_event_id = self.stream.last_event_id
+
+        self.events_received = EVENTS_RECEIVED.labels(entName)
+        self.bytes_received = BYTES_RECEIVED.labels(entName)
+        self.decode_seconds = DECODE_SECONDS.labels(entName)
+
+    async def run(self, session: aiohttp.ClientSession) -> None:
+        """
+        Listen for events and write them until the stream ends or the task is cancelled.
+
+        NOTE: The next batch is only read once the forwarder wrote the current one,
+        which pushes back on MRA v2 through TCP flow control like the threaded reader.
+        """
+        try:
+            self.logger.info(
+                f"{self.name} - Fetching {self.stream.event_type} events starting at id: {self.stream.last_event_id} or time: {self.stream.start_time}"
+            )
+            async for event in self.stream.listenForEvents(session):
+                if event.event == "events":
+                    received_at = time.time()
+                    self.lag_tracker.received(self.stream.last_event_id)
+                    self.bytes_received.inc(len(event.data))
+                    mra_events = []
+                    start = time.perf_counter()
+                    try:
+                        mra_events = self.decode_events(event.data)
+                    except Exception as e:
+                        self.logger.error(f"failed to parse mra events from sse client: {e}")
+                    self.decode_seconds.observe(time.perf_counter() - start)
+                    self.events_received.inc(len(mra_events))
+
+                    self.logger.debug(f"{self.name} - received {len(mra_events)} event(s)")
+                    if self.deduplicator:
+                        mra_events = self.deduplicator.filter(mra_events)
+                    self.last_event_id = self.stream.last_event_id
+                    await self.event_forwarder.write_all_async(mra_events, self.ent_name)
+                    # NOTE: Only a delivered batch is recorded and checkpointed, forwarders
+                    #   raise on failure, see EventForwarder.write_all
+                    if self.deduplicator:
+                        self.deduplicator.record(mra_events)
+                    self.lag_tracker.forwarded(mra_events, self.last_event_id, received_at)
+                    if self.event_store:
+                        self.event_store.received_event(self.last_event_id, len(mra_events))
+                elif event.event == "heartbeat":
+                    self.logger.debug(f"{self.name} - received heartbeat")
+                    self.lag_tracker.heartbeat()
+                    await self.event_forwarder.heartbeat_async(self.ent_name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"{self.name} - Exception in stream task: {str(e)}")
+            self.error = sys.exc_info()
+        finally:
+            self.stream.shutdown()
+            if self.deduplicator:
+                self.logger.info(f"{self.name} - dropped {self.deduplicator.hits} duplicate event(s)")
+                self.deduplicator.close()
+            if self.event_store:
+                self.event_store.flush()
+
+
+class MRAv2AsyncStreamThread(threading.Thread):
+    """
+    Thread running one asyncio event loop that drives many MRA v2 streams.
+
+    Every tenant stream is a task on the loop instead of a thread, all tasks share
+    one aiohttp session and connection pool, and syslog output goes through the
+    forwarders' non-blocking `write_all_async`. Tenants cost no thread stack or
+    OS thread, see benchmarks/bench_async_tenants.py for memory and CPU per tenant.
+    Event batches are decoded on the loop, LEEF translation runs in the default
+    executor.
+    """
+
+    def __init__(self) -> None:
+        # The shutdown_flag is a threading.Event object that
+        # indicates whether the thread should be terminated.
+        self.shutdown_flag = threading.Event()
+        self.shutdown_flag.clear()
+
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.streams: List[MRAv2StreamTask] = []
+
+        threading.Thread.__init__(self)
+
+    def addStream(
+        self,
+        entName: str,
+        eventForwarder: EventForwarder,
+        event_store: EventStore = None,
+        deduplicator: EventDeduplicator = None,
+        lag_tracker: LagTracker = None,
+        **kwargs,
+    ) -> MRAv2StreamTask:
+        """
+        Add a tenant stream, must be called before the thread is started.
+
+        Args:
+            entName (str): Enterprise name.
+            eventForwarder (EventForwarder): Forwarder receiving the event batches.
+                Forwarders may be shared by several streams.
+            event_store (EventStore, optional): See MRAv2StreamTask. Defaults to None.
+            deduplicator (EventDeduplicator, optional): See MRAv2StreamTask. Defaults to None.
+            lag_tracker (LagTracker, optional): See MRAv2StreamTask. Defaults to None.
+            kwargs: AsyncMRAv2Stream arguments.
+
+        Returns:
+            MRAv2StreamTask: The tenant stream.
+        """
+        stream = MRAv2StreamTask(
+            entName, eventForwarder, event_store, deduplicator, lag_tracker, **kwargs
+        )
+        self.streams.append(stream)
+        return stream
+
+    def run(self) -> None:
+        """
+        Run the event loop until every stream ended or the thread is shut down.
+        """
+        asyncio.run(self.__run_streams())
+
+    async def __run_streams(self) -> None:
+        # NOTE: No connection limit, every tenant holds one long-lived streaming connection
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = [asyncio.ensure_future(stream.run(session)) for stream in self.streams]
+            pending = set(tasks)
+            while pending:
+                if self.shutdown_flag.is_set():
+                    for task in pending:
+                        task.cancel()
+                _, pending = await asyncio.wait(pending, timeout=SHUTDOWN_POLL_INTERVAL)
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            forwarders = {id(stream.event_forwarder): stream.event_forwarder for stream in self.streams}
+            for forwarder in forwarders.values():
+                await forwarder.close_async()
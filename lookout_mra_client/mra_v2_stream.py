@@ -4,7 +4,10 @@ from typing import Generator, Tuple
 from oauthlib.oauth2 import TokenExpiredError
 
 from .lookout_logger import LOGGER_NAME
+from .metrics import RECONNECTS
 from .oauth2_client import OAuth2Client
+from .sse_capture import StreamRecorder
+from .server_sent_event import StreamedSSEvent
 from .sse_client import SSEClient, SSEvent, streamRequest
 from . import __prj_name__
 
@@ -35,6 +38,8 @@ class MRAv2Stream:
         event_type: str = "THREAT,DEVICE",
         proxies: dict = None,
         user_agent: str = None,
+        recorder: StreamRecorder = None,
+        stream_over: int = 0,
     ) -> None:
         self.last_event_id = last_event_id
         self.start_time = start_time
@@ -51,6 +56,10 @@ class MRAv2Stream:
         self.logger = logging.getLogger(LOGGER_NAME)
         self.oauth_client = OAuth2Client("MRAv2", api_domain, api_key, proxies)
         self.mra_v2_client: SSEClient = None
+        # Records the raw SSE bytes of every connection, see sse_capture.py
+        self.recorder = recorder
+        # Bytes of an events batch after which it is streamed, see SSEClient
+        self.stream_over = stream_over
 
     @backoff.on_exception(backoff.expo, Exception, max_tries=5, jitter=None, logger=LOGGER_NAME)
     def __init_stream(self) -> None:
@@ -79,7 +88,11 @@ class MRAv2Stream:
                 f"Failed to connect to MRA v2, status code: {mra_stream.status_code}, response: {mra_stream.text}"
             )
             mra_stream.raise_for_status()
-        self.mra_v2_client = SSEClient(mra_stream)
+        if self.recorder:
+            self.recorder.connect()
+        self.mra_v2_client = SSEClient(
+            mra_stream, recorder=self.recorder, stream_over=self.stream_over
+        )
 
     @backoff.on_exception(backoff.expo, Exception, max_tries=5, jitter=None, logger=LOGGER_NAME)
     def __restart_stream(self) -> None:
@@ -87,6 +100,7 @@ class MRAv2Stream:
         Restart the stream client, fetching a new access token if needed.
         """
         self.logger.info("Restarting MRA v2 stream...")
+        RECONNECTS.inc()
         self.shutdown()
 
         self.oauth_client.fetchAccessToken()
@@ -107,7 +121,11 @@ class MRAv2Stream:
                 f"Failed to connect to MRA v2, status code: {mra_stream.status_code}, response: {mra_stream.text}"
             )
             mra_stream.raise_for_status()
-        self.mra_v2_client = SSEClient(mra_stream)
+        if self.recorder:
+            self.recorder.connect()
+        self.mra_v2_client = SSEClient(
+            mra_stream, recorder=self.recorder, stream_over=self.stream_over
+        )
 
     def listenForEvents(self) -> Generator[SSEvent, None, None]:
         """
@@ -124,10 +142,15 @@ class MRAv2Stream:
         while True:
             try:
                 for ss_event in self.mra_v2_client.streamEvents():
-                    if ss_event.id:
+                    streamed = isinstance(ss_event, StreamedSSEvent)
+                    if ss_event.id and not streamed:
                         self.last_event_id = ss_event.id
                     if ss_event.event in YIELD_EVENTS:
                         yield ss_event
+                        # NOTE: A streamed batch moves the stream position once it was read
+                        #   whole, a reconnect resumes before a batch that was cut off
+                        if streamed and ss_event.complete and ss_event.id:
+                            self.last_event_id = ss_event.id
                     elif ss_event.event in RECONNECT_EVENTS:
                         if ss_event.retry:
                             self.retry_ms = ss_event.retry
@@ -1,16 +1,71 @@
-import logging, threading, json, sys
+import logging, threading, queue, sys, time
+from .event_dedup import EventDeduplicator
 from .event_forwarders.event_forwarder import EventForwarder
+from .event_passthrough import EventsDecoder, decode_events, load_events
+from .event_store.event_store import EventStore
+from .lag_tracker import LagTracker
 from .lookout_logger import LOGGER_NAME
+from .metrics import BYTES_RECEIVED, EVENTS_RECEIVED, DECODE_SECONDS, QUEUE_DEPTH
 from .mra_v2_stream import MRAv2Stream
+from .server_sent_event import StreamedSSEvent
+
+# Maximum number of SSE event batches waiting to be forwarded
+DEFAULT_QUEUE_SIZE = 16
+# How often a blocked stream reader checks for shutdown
+QUEUE_POLL_INTERVAL = 1  # seconds
+# Events of a batch streamed by SSEClient forwarded together, before the batch is complete
+DEFAULT_STREAM_BATCH_EVENTS = 100
 
 
 class MRAv2StreamThread(threading.Thread):
     """
     Thread wrapper around MRAv2Stream. This allows a controlling program
     to control multiple mra v2 streams.
+
+    The thread only reads the SSE stream, event batches are handed to one or more
+    forwarding threads through a bounded queue. When the queue is full the reader
+    stops reading, which pushes back on MRA v2 through TCP flow control instead
+    of buffering events in memory.
+
+    Batches larger than stream_over bytes are decoded by the reader while they are
+    received, see SSEClient, and queued in parts of stream_batch_events events. Only
+    the last part of a batch carries its event id, so checkpoints never pass a batch
+    that is partly forwarded.
     """
 
-    def __init__(self, entName: str, eventForwarder: EventForwarder, **kwargs) -> None:
+    def __init__(
+        self,
+        entName: str,
+        eventForwarder: EventForwarder,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        forward_threads: int = 1,
+        event_store: EventStore = None,
+        deduplicator: EventDeduplicator = None,
+        lag_tracker: LagTracker = None,
+        stream: MRAv2Stream = None,
+        stream_batch_events: int = DEFAULT_STREAM_BATCH_EVENTS,
+        **kwargs,
+    ) -> None:
+        """
+        Args:
+            entName (str): Enterprise name.
+            eventForwarder (EventForwarder): Forwarder receiving the event batches.
+            queue_size (int, optional): Maximum number of batches waiting to be forwarded.
+                Defaults to DEFAULT_QUEUE_SIZE.
+            forward_threads (int, optional): Number of forwarding threads. Batches are only
+                forwarded in stream order with a single thread. Defaults to 1.
+            event_store (EventStore, optional): Store receiving the event id of every
+                forwarded batch, so a restart resumes after it. Defaults to None.
+            deduplicator (EventDeduplicator, optional): Drops events delivered again after
+                a reconnect or restart. Defaults to None.
+            lag_tracker (LagTracker, optional): Lag of the stream.
+                Defaults to a LagTracker with default thresholds.
+            stream (MRAv2Stream, optional): Source of the SSE events, e.g. a ReplayStream
+                replaying a capture. Defaults to a MRAv2Stream created with kwargs.
+            stream_batch_events (int, optional): Events of a streamed batch queued
+                together. Defaults to DEFAULT_STREAM_BATCH_EVENTS.
+            kwargs: MRAv2Stream arguments, e.g. stream_over.
+        """
         # The shutdown_flag is a threading.Event object that
         # indicates whether the thread should be terminated.
         self.shutdown_flag = threading.Event()
@@ -18,38 +73,237 @@ class MRAv2StreamThread(threading.Thread):
 
         self.ent_name = entName
         self.event_forwarder = eventForwarder
+        # Decoder of the event batches, keeps the JSON text of events for passthrough
+        self.decode_events = decode_events if eventForwarder.passthrough else load_events
         self.logger = logging.getLogger(LOGGER_NAME)
         self.error = None
+        # Error of a forwarding thread, the remaining batches are dropped. After an error
+        # of the reader the batches already queued are still forwarded.
+        self.forward_error = None
 
-        self.stream = MRAv2Stream(**kwargs)
+        self.stream = stream or MRAv2Stream(**kwargs)
+
+        # Queue of (sequence number, last event id, SSE data, time received) for each events batch,
+        # or (sequence number, None, events, time received) for parts of a streamed batch but
+        # its last, None stops a forwarder
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.forward_threads = forward_threads
+        self.stream_batch_events = stream_batch_events
+        # Event id of the latest batch handed to the event forwarder
+        self.last_event_id = self.stream.last_event_id
+
+        self.event_store = event_store
+        self.deduplicator = deduplicator
+        self.lag_tracker = lag_tracker or LagTracker(entName)
+        # Batches forwarded out of order, by sequence number, guarded by checkpoint_lock
+        self.checkpoint_lock = threading.Lock()
+        self.forwarded = {}
+        self.next_checkpoint = 0
+        # Events forwarded in order since the last checkpoint, of parts without an event id
+        self.unsaved_count = 0
+        # Total seconds the stream reader waited on a full queue
+        self.blocked_time = 0.0
+
+        self.events_received = EVENTS_RECEIVED.labels(entName)
+        self.bytes_received = BYTES_RECEIVED.labels(entName)
+        self.decode_seconds = DECODE_SECONDS.labels(entName)
+        QUEUE_DEPTH.labels(entName).set_function(self.queue.qsize)
 
         threading.Thread.__init__(self)
 
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of event batches waiting to be forwarded.
+        """
+        return self.queue.qsize()
+
     def run(self) -> None:
         """
-        Start listening for and writing events.
+        Start listening for events and the threads writing them.
         """
+        forwarders = [
+            threading.Thread(target=self.__forward, name=f"{self.name}-forwarder-{i}", daemon=True)
+            for i in range(self.forward_threads)
+        ]
+        for forwarder in forwarders:
+            forwarder.start()
+
         try:
             self.logger.info(
                 f"{self.name} - Fetching {self.stream.event_type} events starting at id: {self.stream.last_event_id} or time: {self.stream.start_time}"
             )
+            sequence = 0
             for event in self.stream.listenForEvents():
                 if self.shutdown_flag.is_set():
-                    self.stream.shutdown()
-                    sys.exit(0)
-
-                if event.event == "events":
-                    mra_events = []
-                    try:
-                        mra_events = json.loads(event.data).get("events", [])
-                    except Exception as e:
-                        self.logger.error(f"failed to parse mra events from sse client: {e}")
-
-                    self.logger.debug(f"{self.name} - received {len(mra_events)} event(s)")
-                    self.event_forwarder.write_all(mra_events, self.ent_name)
+                    break
+
+                if isinstance(event, StreamedSSEvent):
+                    sequence = self.__enqueue_streamed(event, sequence)
+                    if self.shutdown_flag.is_set():
+                        # NOTE: The next event would read the rest of the batch first
+                        break
+                elif event.event == "events":
+                    self.bytes_received.inc(len(event.data))
+                    self.lag_tracker.received(self.stream.last_event_id)
+                    self.__enqueue((sequence, self.stream.last_event_id, event.data, time.time()))
+                    sequence += 1
                 elif event.event == "heartbeat":
                     self.logger.debug(f"{self.name} - received heartbeat")
+                    self.lag_tracker.heartbeat()
+                    self.event_forwarder.heartbeat(self.ent_name)
             self.stream.shutdown()
         except Exception as e:
             self.logger.error(f"{self.name} - Exception in stream thread: {str(e)}")
             self.error = sys.exc_info()
+
+        # Let the forwarders drain the queue, then stop them
+        for _ in forwarders:
+            self.__enqueue(None, force=True)
+        for forwarder in forwarders:
+            forwarder.join()
+        if self.deduplicator:
+            self.logger.info(f"{self.name} - dropped {self.deduplicator.hits} duplicate event(s)")
+            self.deduplicator.close()
+        if self.event_store:
+            self.event_store.flush()
+
+    def __enqueue_streamed(self, event: StreamedSSEvent, sequence: int) -> int:
+        """
+        Decode a batch while it is received, queueing its events in parts.
+
+        Args:
+            event (StreamedSSEvent): Batch being received.
+            sequence (int): Sequence number of its first part.
+
+        Returns:
+            int: Sequence number of the next batch.
+        """
+        received_at = time.time()
+        # NOTE: MRA v2 sends the id before the data, the stream position is known already
+        self.lag_tracker.received(event.id or self.stream.last_event_id)
+        decoder = EventsDecoder(self.event_forwarder.passthrough)
+        events = []
+        decode_seconds = 0.0
+        for part in event.parts:
+            self.bytes_received.inc(len(part))
+            start = time.perf_counter()
+            events += decoder.feed(part)
+            decode_seconds += time.perf_counter() - start
+            if len(events) >= self.stream_batch_events:
+                self.__enqueue((sequence, None, events, received_at))
+                sequence += 1
+                events = []
+            if self.shutdown_flag.is_set():
+                return sequence
+
+        last_event_id = None
+        if event.complete:
+            start = time.perf_counter()
+            try:
+                events += decoder.close()
+            except Exception as e:
+                self.logger.error(f"failed to parse mra events from sse client: {e}")
+            decode_seconds += time.perf_counter() - start
+            last_event_id = event.id or self.stream.last_event_id
+        else:
+            # NOTE: The stream reconnects after the last checkpoint, dedup drops the
+            #   events forwarded already when they are sent again
+            self.logger.warning(f"{self.name} - batch interrupted after {len(events)} event(s)")
+        self.decode_seconds.observe(decode_seconds)
+        self.__enqueue((sequence, last_event_id, events, received_at))
+        return sequence + 1
+
+    def __enqueue(self, item: tuple, force: bool = False) -> None:
+        """
+        Put an item on the forwarding queue, waiting while the queue is full.
+
+        Args:
+            item (tuple): Queue item.
+            force (bool, optional): Keep waiting after shutdown. Defaults to False.
+        """
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        start = time.monotonic()
+        try:
+            while force or not self.shutdown_flag.is_set():
+                try:
+                    self.queue.put(item, timeout=QUEUE_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self.blocked_time += time.monotonic() - start
+
+    def __forward(self) -> None:
+        """
+        Forwarding thread, decode event batches from the queue and write them.
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.forward_error is not None:
+                # A forwarder failed, drop the remaining batches
+                continue
+
+            sequence, last_event_id, data, received_at = item
+            mra_events = []
+            if isinstance(data, list):
+                # Events of a streamed batch, decoded by the reader
+                mra_events = data
+            else:
+                start = time.perf_counter()
+                try:
+                    mra_events = self.decode_events(data)
+                except Exception as e:
+                    self.logger.error(f"failed to parse mra events from sse client: {e}")
+                self.decode_seconds.observe(time.perf_counter() - start)
+            self.events_received.inc(len(mra_events))
+
+            self.logger.debug(f"{self.name} - received {len(mra_events)} event(s)")
+            if self.deduplicator:
+                mra_events = self.deduplicator.filter(mra_events)
+            try:
+                if last_event_id is not None:
+                    self.last_event_id = last_event_id
+                self.event_forwarder.write_all(mra_events, self.ent_name)
+            except Exception as e:
+                self.logger.error(f"{self.name} - Exception in forwarding thread: {str(e)}")
+                self.error = self.forward_error = sys.exc_info()
+                self.shutdown_flag.set()
+                continue
+
+            # NOTE: Only a delivered batch is recorded and checkpointed, forwarders raise
+            #   on failure, see EventForwarder.write_all
+            if self.deduplicator:
+                self.deduplicator.record(mra_events)
+            self.lag_tracker.forwarded(mra_events, last_event_id or self.last_event_id, received_at)
+
+            if self.event_store:
+                self.__checkpoint(sequence, last_event_id, len(mra_events))
+
+    def __checkpoint(self, sequence: int, last_event_id: str, event_count: int) -> None:
+        """
+        Checkpoint a forwarded batch once every earlier batch was forwarded as well.
+
+        NOTE: With several forwarding threads batches finish out of order, the checkpoint
+        must never move past a batch that is still being written. Parts of a streamed
+        batch have no event id, the batch is checkpointed with its last part.
+        """
+        with self.checkpoint_lock:
+            self.forwarded[sequence] = (last_event_id, event_count)
+            checkpoint_id = None
+            while self.next_checkpoint in self.forwarded:
+                event_id, count = self.forwarded.pop(self.next_checkpoint)
+                self.unsaved_count += count
+                self.next_checkpoint += 1
+                if event_id is not None:
+                    checkpoint_id = event_id
+            if checkpoint_id is not None:
+                self.event_store.received_event(checkpoint_id, self.unsaved_count)
+                self.unsaved_count = 0
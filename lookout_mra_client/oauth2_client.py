@@ -3,6 +3,7 @@ from oauthlib.oauth2 import BackendApplicationClient
 from requests_oauthlib import OAuth2Session
 
 from .lookout_logger import LOGGER_NAME
+from .metrics import TOKEN_FETCHES
 
 OAUTH2_ROUTE = "/oauth2/token"
 
@@ -47,6 +48,7 @@ class OAuth2Client:
         """
         try:
             self.logger.debug("Fetching new access token...")
+            TOKEN_FETCHES.inc()
             self.session.fetch_token(
                 token_url=self.api_domain + OAUTH2_ROUTE,
                 auth=BearerAuth(self.api_key),
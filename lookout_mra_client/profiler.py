@@ -0,0 +1,198 @@
+"""
+Module containing the on-demand CPU profiler of the connector.
+
+A capture is started by SIGUSR1 or by POST /profile on the metrics server while the
+connector runs. For `seconds` a daemon thread samples the stack of every other thread
+with sys._current_frames() every `interval` seconds. Nothing is installed in the
+profiled threads, so the profiler costs nothing while no capture runs and stream,
+forwarder and drain threads are all covered, cProfile only instruments the thread
+that enables it.
+
+Each capture writes two files to `directory`, by default next to the log file:
+
+- mrav2-profile-<time>.txt, samples per thread and functions sorted by self and
+  cumulative samples, the share of wall-clock time spent in or below a function
+- mrav2-profile-<time>.folded, one line per distinct stack, the input of
+  flamegraph.pl and speedscope
+"""
+
+import logging, os, sys, threading, time
+from collections import Counter
+from types import CodeType
+from typing import Dict, Optional
+
+from .lookout_logger import LOGGER_NAME
+
+# Length of a capture
+DEFAULT_PROFILE_SECONDS = 30  # seconds
+# Upper bound of a requested capture length
+MAX_PROFILE_SECONDS = 600  # seconds
+# Time between two stack samples
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+# Functions listed in each table of the stats file
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_FILE_PREFIX = "mrav2-profile-"
+
+
+def code_label(code: CodeType) -> str:
+    """
+    Returns:
+        str: pstats style function label, "file.py:line(function)".
+    """
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class SamplingProfiler:
+    """
+    Time-boxed sampling profiler of all threads, one capture at a time.
+
+    Args:
+        directory (str): Directory of the profile files.
+        interval (float, optional): Seconds between stack samples.
+            Defaults to DEFAULT_SAMPLE_INTERVAL.
+        seconds (float, optional): Default capture length.
+            Defaults to DEFAULT_PROFILE_SECONDS.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        seconds: float = DEFAULT_PROFILE_SECONDS,
+    ) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.seconds = seconds
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        # Path of the stats file of the last finished capture
+        self.last_profile: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds: float = None) -> bool:
+        """
+        Start a capture in the background, safe to call from a signal handler.
+
+        Args:
+            seconds (float, optional): Capture length, capped at MAX_PROFILE_SECONDS.
+                Defaults to the profiler's seconds.
+
+        Returns:
+            bool: False if a capture is already running.
+        """
+        seconds = min(max(seconds or self.seconds, self.interval), MAX_PROFILE_SECONDS)
+        with self.lock:
+            if self.running:
+                self.logger.warning("Profile capture already running, request ignored")
+                return False
+            self.thread = threading.Thread(
+                target=self.__capture, args=(seconds,), name="Profiler", daemon=True
+            )
+            self.thread.start()
+        return True
+
+    def status(self) -> dict:
+        return {"running": self.running, "last_profile": self.last_profile}
+
+    def signal_handler(self, sig, frame) -> None:
+        self.start()
+
+    def __capture(self, seconds: float) -> None:
+        self.logger.info(f"Profiling all threads for {seconds:g}s every {self.interval * 1000:g}ms")
+        stacks: Counter = Counter()
+        names: Dict[int, str] = {}
+        own_ident = threading.get_ident()
+        samples = 0
+        start = time.monotonic()
+        deadline = start + seconds
+        next_sample = start
+        while next_sample < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                # NOTE: Code objects are hashable, labels are only built once per stack
+                stacks[(names.get(ident, str(ident)), tuple(codes))] += 1
+            frame = None
+            samples += 1
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # NOTE: Sampling fell behind, skip the missed samples instead of bursting
+                next_sample = time.monotonic()
+        elapsed = time.monotonic() - start
+
+        try:
+            path = self.__write(stacks, samples, elapsed)
+        except OSError as e:
+            self.logger.error(f"Failed to write profile to {self.directory}: {e}")
+            return
+        self.last_profile = path
+        self.logger.info(f"Profile of {samples} samples written to {path}")
+
+    def __write(self, stacks: Counter, samples: int, elapsed: float) -> str:
+        """
+        Write the stats and folded stack files of a capture.
+
+        Returns:
+            str: Path of the stats file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(
+            self.directory, PROFILE_FILE_PREFIX + time.strftime("%Y%m%d-%H%M%S")
+        )
+
+        per_thread: Counter = Counter()
+        self_samples: Counter = Counter()
+        cumulative: Counter = Counter()
+        folded: Counter = Counter()
+        for (thread_name, codes), count in stacks.items():
+            per_thread[thread_name] += count
+            if codes:
+                self_samples[codes[0]] += count
+            # NOTE: A recursive function counts once per stack
+            for code in set(codes):
+                cumulative[code] += count
+            labels = [code_label(code) for code in reversed(codes)]
+            folded[";".join([thread_name] + labels)] += count
+
+        total = sum(per_thread.values()) or 1
+        lines = [
+            f"Sampling profile of {len(per_thread)} thread(s) over {elapsed:.1f}s, "
+            f"{samples} samples every {self.interval * 1000:g}ms",
+            "Percentages are shares of all thread samples, wall-clock time including waits",
+            "",
+            "Samples per thread:",
+        ]
+        for thread_name, count in per_thread.most_common():
+            lines.append(f"{count:>10} {100 * count / total:6.2f}%  {thread_name}")
+
+        for title, ranking in (
+            ("Top functions by self samples:", self_samples),
+            ("Top functions by cumulative samples:", cumulative),
+        ):
+            lines += ["", title, f"{'self':>10} {'self%':>7} {'cumul':>10} {'cumul%':>7}  function"]
+            for code, _ in ranking.most_common(PROFILE_TOP_FUNCTIONS):
+                own, below = self_samples[code], cumulative[code]
+                lines.append(
+                    f"{own:>10} {100 * own / total:6.2f}% {below:>10} {100 * below / total:6.2f}%"
+                    f"  {code_label(code)}  {code.co_filename}"
+                )
+
+        with open(base + ".txt", "w") as stats_file:
+            stats_file.write("\n".join(lines) + "\n")
+        with open(base + ".folded", "w") as folded_file:
+            folded_file.writelines(f"{stack} {count}\n" for stack, count in folded.items())
+        return base + ".txt"
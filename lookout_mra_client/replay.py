@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+MRAv2 Syslog Connector - Replay Entry Point
+
+Replays SSE streams recorded with the [record] section through SSEClient, the forwarding
+of MRAv2StreamThread and the forwarder configured in the config file, without MRA v2.
+Captures are read from memory-mapped files, as fast as possible or at recorded speed,
+so real traffic shapes can be profiled and benchmarked offline.
+
+Checkpoints, dedup and the syslog spool of the config are not used, replaying never
+moves the stream positions of the connector.
+
+Usage:
+    python -m lookout_mra_client.replay -c config.ini --capture mrav2-capture [--speed 1]
+"""
+
+import argparse, logging, os, sys, threading, time
+from typing import Generator, List, Tuple
+
+from .event_forwarders.event_forwarder import EventForwarder
+from .lag_tracker import LagTracker
+from .lookout_logger import init_lookout_logger
+from .main import DEFAULT_STREAM_OVER_KB, create_event_forwarder, create_profiler, load_config
+from .mra_v2_stream import YIELD_EVENTS
+from .mra_v2_stream_thread import (
+    MRAv2StreamThread,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_STREAM_BATCH_EVENTS,
+)
+from .server_sent_event import StreamedSSEvent
+from .sse_capture import CaptureReader, CAPTURE_INDEX
+from .sse_client import SSEClient, SSEvent
+
+
+class ReplayStream:
+    """
+    Stand-in for MRAv2Stream serving the connections of a capture, see MRAv2StreamThread.
+
+    Args:
+        reader (CaptureReader): Capture of one stream.
+        stream_over (int, optional): Bytes of an events batch after which it is
+            streamed, see SSEClient. Defaults to 0.
+    """
+
+    def __init__(self, reader: CaptureReader, stream_over: int = 0) -> None:
+        self.reader = reader
+        self.stream_over = stream_over
+        self.last_event_id = 0
+        self.start_time = None
+        self.event_type = "recorded"
+        self.retry_ms = None
+        # Number of recorded connections replayed
+        self.connects = 0
+
+    def listenForEvents(self) -> Generator[SSEvent, None, None]:
+        """
+        Yields:
+            SSEvent: Event batches and heartbeats of every recorded connection, in order.
+        """
+        for connection in self.reader.connections():
+            self.connects += 1
+            for ss_event in SSEClient(connection, stream_over=self.stream_over).streamEvents():
+                streamed = isinstance(ss_event, StreamedSSEvent)
+                if ss_event.id and not streamed:
+                    self.last_event_id = ss_event.id
+                if ss_event.event in YIELD_EVENTS:
+                    yield ss_event
+                    if streamed and ss_event.complete and ss_event.id:
+                        self.last_event_id = ss_event.id
+
+    def shutdown(self) -> Tuple[int, int]:
+        self.reader.close()
+        return (self.last_event_id, self.retry_ms)
+
+
+class CountingForwarder(EventForwarder):
+    """
+    Forwarder counting the events written through another forwarder.
+    """
+
+    def __init__(self, forwarder: EventForwarder) -> None:
+        self.forwarder = forwarder
+        self.passthrough = forwarder.passthrough
+        self.lock = threading.Lock()
+        self.events = 0
+
+    def write_all(self, events: list, entName: str):
+        self.forwarder.write_all(events, entName)
+        with self.lock:
+            self.events += len(events)
+
+    def heartbeat(self, entName: str):
+        self.forwarder.heartbeat(entName)
+
+    def close(self):
+        self.forwarder.close()
+
+
+def capture_directories(capture: str, tenants: List[str] = None) -> List[Tuple[str, str]]:
+    """
+    Returns:
+        List[Tuple[str, str]]: Name and capture directory of each recorded stream, either
+            the capture directory itself or its tenant subdirectories.
+    """
+    if os.path.exists(os.path.join(capture, CAPTURE_INDEX)):
+        streams = [(os.path.basename(os.path.abspath(capture)), capture)]
+    else:
+        streams = [
+            (name, os.path.join(capture, name))
+            for name in sorted(os.listdir(capture))
+            if os.path.exists(os.path.join(capture, name, CAPTURE_INDEX))
+        ]
+    if tenants:
+        streams = [(name, directory) for name, directory in streams if name in tenants]
+    return streams
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Replay recorded Lookout Mobile Risk API v2 streams to the configured forwarder"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        required=True,
+        help="Path to configuration INI file, for the forwarder and [performance]",
+    )
+    parser.add_argument(
+        "--capture",
+        required=True,
+        help="Capture directory of one stream, or the [record] directory with one per tenant",
+    )
+    parser.add_argument(
+        "--tenant",
+        nargs="+",
+        help="Replay only these tenant capture directories",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="Speed relative to the recording, 1 for recorded speed (default: 0, as fast as possible)",
+    )
+    parser.add_argument(
+        "-l",
+        "--log-file",
+        default="mrav2-replay.log",
+        help="Path to log file (default: mrav2-replay.log)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Enable verbose logging",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Replay entry point"""
+    args = parse_args()
+
+    logger = init_lookout_logger(args.log_file)
+    if not args.verbose:
+        logger.setLevel(logging.INFO)
+
+    config = load_config(args.config)
+    streams = capture_directories(args.capture, args.tenant)
+    if not streams:
+        sys.exit(f"No captures found in {args.capture}")
+
+    # NOTE: SIGUSR1 profiles the replay like the connector
+    create_profiler(config, args.log_file, logger)
+    forwarder = CountingForwarder(create_event_forwarder(config, logger))
+    queue_size = config.getint("performance", "queue_size", fallback=DEFAULT_QUEUE_SIZE)
+    forward_threads = config.getint("performance", "forward_threads", fallback=1)
+    stream_over_kb = config.getint("performance", "stream_over_kb", fallback=DEFAULT_STREAM_OVER_KB)
+    stream_batch_events = config.getint(
+        "performance", "stream_batch_events", fallback=DEFAULT_STREAM_BATCH_EVENTS
+    )
+
+    readers = []
+    threads = []
+    for name, directory in streams:
+        reader = CaptureReader(directory, args.speed)
+        readers.append(reader)
+        threads.append(
+            MRAv2StreamThread(
+                name,
+                forwarder,
+                queue_size=queue_size,
+                forward_threads=forward_threads,
+                stream_batch_events=stream_batch_events,
+                # NOTE: Recorded events are old, their lag says nothing about the replay
+                lag_tracker=LagTracker(name, stale_lag=float("inf")),
+                stream=ReplayStream(reader, stream_over_kb * 1024),
+            )
+        )
+
+    speed = f"{args.speed:g}x recorded speed" if args.speed else "as fast as possible"
+    print(f"Replaying {len(streams)} stream(s) from {args.capture}, {speed}")
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        for thread in threads:
+            thread.shutdown_flag.set()
+        for thread in threads:
+            thread.join(timeout=10)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    forwarder.close()
+
+    total_bytes = sum(reader.bytes_read for reader in readers)
+    for (name, _), thread, reader in zip(streams, threads, readers):
+        print(
+            f"  {name}: {thread.stream.connects} connection(s), {reader.bytes_read / 1e6:.1f} MB, "
+            f"last event id {thread.stream.last_event_id}"
+        )
+    print(
+        f"Forwarded {forwarder.events:,} events in {elapsed:.2f}s: "
+        f"{forwarder.events / elapsed:,.0f} events/s, {total_bytes / 1e6 / elapsed:.1f} MB/s SSE, "
+        f"{cpu / elapsed:.0%} CPU"
+    )
+    if any(thread.error for thread in threads):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,36 @@
 import json
 
-VALID_FIELDS = ["id", "event", "data", "retry"]
-
 
 class SSEvent:
     """
     Using an event class allows for checking event fields.
+
+    Multiline data is collected as a list of lines and only joined once,
+    the first time `data` is read after the event has been parsed.
     """
 
+    __slots__ = ("id", "event", "retry", "_data", "_data_lines")
+
     def __init__(self, id: int = None, event: str = "", data: str = "", retry: int = None):
         self.id = id
         self.event = event
-        self.data = data
         self.retry = retry
+        self._data = data
+        self._data_lines = None
+
+    @property
+    def data(self) -> str:
+        if self._data_lines is not None:
+            lines = "\n".join(self._data_lines)
+            # NOTE: Lines appended to data already set or read are a new line as well
+            self._data = f"{self._data}\n{lines}" if self._data else lines
+            self._data_lines = None
+        return self._data
+
+    @data.setter
+    def data(self, value: str) -> None:
+        self._data = value
+        self._data_lines = None
 
     def blank(self) -> bool:
         """
@@ -35,46 +53,64 @@ class SSEvent:
         Raises:
             ValueError: On invalid fields.
         """
-        if self.__validField(field):
-            self.__setField(field, value)
-        else:
+        set_field = FIELD_SETTERS.get(field)
+        if set_field is None:
             raise ValueError(f"'{field}' is not a valid SSE field.")
+        set_field(self, value)
 
     def __str__(self) -> str:
         return json.dumps(
             {"id": self.id, "event": self.event, "data": self.data, "retry": self.retry}
         )
 
-    def __validField(self, field: str) -> bool:
-        """
-        Determine if given field name is a valid SSEvent field
+    def _set_id(self, value: str) -> None:
+        self.id = value
 
-        Args:
-            field (str): Field name in question
+    def _set_event(self, value: str) -> None:
+        self.event = value
 
-        Returns:
-            bool: If field is vaild
-        """
-        return field in VALID_FIELDS
+    def _set_data(self, value: str) -> None:
+        # for events with multiline data lines, collect lines and join them on read
+        if self._data_lines is None:
+            self._data_lines = [value]
+        else:
+            self._data_lines.append(value)
 
-    def __setField(self, field: str, value: str) -> None:
-        """
-        Set the event's field to the given value
+    def _set_retry(self, value: str) -> None:
+        # NOTE: Spec states:
+        #   If the field name is "retry" and the field value consists of only ASCII digits,
+        #   then interpret the field value as an integer in base ten,
+        #   and set the event stream's reconnection time to that integer.
+        #   Otherwise, ignore the field.
+        # TODO: handle reconnect timing
+        self.retry = int(value) if value.isdigit() else None
 
-        Args:
-            field (str): SSEvent field name
-            value (str): new field value
-        """
-        if field == "data":
-            # for events with multiline data lines, append along with a newline
-            self.__dict__[field] += value + "\n"
-        elif field == "retry":
-            # NOTE: Spec states:
-            #   If the field name is "retry" and the field value consists of only ASCII digits,
-            #   then interpret the field value as an integer in base ten,
-            #   and set the event stream's reconnection time to that integer.
-            #   Otherwise, ignore the field.
-            # TODO: handle reconnect timing
-            self.__dict__[field] = int(value) if value.isdigit() else None
-        else:
-            self.__dict__[field] = value
+
+class StreamedSSEvent(SSEvent):
+    """
+    Event whose data is read in parts while it is received, see SSEClient.
+
+    Fields before the data are set when the event is yielded, `parts` yields the data,
+    fields after it are set once `parts` is exhausted. `data` stays empty.
+    """
+
+    __slots__ = ("parts", "complete", "error")
+
+    def __init__(self, id: int = None, event: str = "", retry: int = None):
+        super().__init__(id, event, "", retry)
+        # Generator of the data text, in parts as read from the stream
+        self.parts = None
+        # Whether the whole event was received
+        self.complete = False
+        # Exception reading the stream, raised by SSEClient once the parts were read
+        self.error = None
+
+
+# Field name -> setter of every valid SSE field
+FIELD_SETTERS = {
+    "id": SSEvent._set_id,
+    "event": SSEvent._set_event,
+    "data": SSEvent._set_data,
+    "retry": SSEvent._set_retry,
+}
+VALID_FIELDS = list(FIELD_SETTERS)
@@ -0,0 +1,369 @@
+"""
+Module containing the capture of raw MRA v2 SSE streams, for replaying real traffic offline.
+
+A `StreamRecorder` writes the bytes of one tenant's stream, as received, to gzip segment
+files in a capture directory:
+
+    <directory>/000001.sse.gz, 000002.sse.gz, ...
+    <directory>/index.jsonl
+
+A segment is closed once it holds `segment_size` uncompressed bytes, and the oldest
+segments are deleted while the segments take more than `max_bytes` on disk. The index
+holds a JSON line per mark: the segment, the uncompressed offset in it, the seconds
+since the capture started, and whether a new connection to MRA v2 starts there. Marks
+are written for every connection, every segment, and at most every MARK_INTERVAL while
+bytes arrive, which is what replaying at recorded speed needs.
+
+A `CaptureReader` memory-maps the segments, decompresses them sequentially and serves
+every recorded connection as a `CaptureConnection`, a stand-in for the streaming
+requests.Response consumed by SSEClient. See replay.py. Once old segments were deleted,
+the first replayed connection may start in the middle of an SSE event, which the SSE
+parser skips as an event without known fields.
+"""
+
+import json, logging, mmap, os, threading, time, zlib
+from typing import Generator, List, NamedTuple, Optional
+
+from .event_store.file_event_store import atomic_write
+from .lookout_logger import LOGGER_NAME
+
+# Uncompressed bytes of one capture segment
+DEFAULT_CAPTURE_SEGMENT_SIZE = 64 * 1024 * 1024
+# Bytes on disk of all segments of one stream
+DEFAULT_CAPTURE_MAX_BYTES = 1024 * 1024 * 1024
+# Seconds between the timing marks of the index while bytes arrive
+MARK_INTERVAL = 0.1  # seconds
+# Fast compression, a capture must keep up with the stream
+CAPTURE_COMPRESSLEVEL = 1
+# Compressed bytes decompressed at a time during replay
+REPLAY_READ_SIZE = 64 * 1024
+
+CAPTURE_INDEX = "index.jsonl"
+SEGMENT_SUFFIX = ".sse.gz"
+
+
+class CaptureMark(NamedTuple):
+    segment: str
+    # Offset in the uncompressed segment
+    offset: int
+    # Seconds since the capture started
+    time: float
+    # A new connection to MRA v2 starts at the mark
+    connect: bool
+
+
+class StreamRecorder:
+    """
+    Record the raw SSE bytes of one stream.
+
+    Args:
+        directory (str): Capture directory of the stream, created if missing.
+        segment_size (int, optional): Uncompressed bytes of a segment.
+            Defaults to DEFAULT_CAPTURE_SEGMENT_SIZE.
+        max_bytes (int, optional): Bytes on disk of all segments, 0 for no limit.
+            Defaults to DEFAULT_CAPTURE_MAX_BYTES.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = DEFAULT_CAPTURE_SEGMENT_SIZE,
+        max_bytes: int = DEFAULT_CAPTURE_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        os.makedirs(directory, exist_ok=True)
+        # Guards the segment, a stream may reconnect from another thread than it read from
+        self.lock = threading.Lock()
+        marks = read_index(directory)
+        # NOTE: A restarted connector appends to the capture, its times continue after the last mark
+        self.start = time.monotonic() - (marks[-1].time if marks else 0.0)
+        self.segments = sorted(
+            name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.segment: Optional[str] = None
+        self.file = None
+        self.compressor = None
+        self.offset = 0
+        self.last_mark = 0.0
+        self.index = open(os.path.join(directory, CAPTURE_INDEX), "a")
+        self.failed = False
+
+    def connect(self) -> None:
+        """
+        Mark the start of a new connection, the bytes written next start a new SSE stream.
+        """
+        with self.lock:
+            if self.file is None:
+                self.__open_segment(connect=True)
+            else:
+                self.__mark(connect=True)
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append bytes received from MRA v2.
+        """
+        if not chunk or self.failed:
+            return
+        with self.lock:
+            try:
+                if self.file is None:
+                    self.__open_segment(connect=True)
+                elif self.offset >= self.segment_size:
+                    self.__close_segment()
+                    self.__open_segment()
+                elif time.monotonic() - self.last_mark >= MARK_INTERVAL:
+                    self.__mark()
+                self.file.write(self.compressor.compress(chunk))
+                self.offset += len(chunk)
+            except OSError as e:
+                # NOTE: Recording is a diagnostic, a full disk must not stop forwarding
+                self.logger.error(f"Stopped recording to {self.directory}: {e}")
+                self.failed = True
+
+    def close(self) -> None:
+        with self.lock:
+            try:
+                self.__close_segment()
+            except OSError as e:
+                self.logger.error(f"Failed to close capture segment in {self.directory}: {e}")
+            self.index.close()
+
+    def __open_segment(self, connect: bool = False) -> None:
+        number = int(self.segments[-1].split(".")[0]) + 1 if self.segments else 1
+        self.segment = f"{number:06d}{SEGMENT_SUFFIX}"
+        self.segments.append(self.segment)
+        self.file = open(os.path.join(self.directory, self.segment), "wb")
+        self.compressor = zlib.compressobj(CAPTURE_COMPRESSLEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        self.offset = 0
+        self.__mark(connect)
+        self.__prune()
+
+    def __close_segment(self) -> None:
+        if self.file is None:
+            return
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        self.file = None
+
+    def __mark(self, connect: bool = False) -> None:
+        now = time.monotonic()
+        self.last_mark = now
+        mark = CaptureMark(self.segment, self.offset, round(now - self.start, 4), connect)
+        # NOTE: Flushed with the segment, so the index never points past the compressed data
+        self.file.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.file.flush()
+        self.index.write(json.dumps(format_mark(mark)) + "\n")
+        self.index.flush()
+
+    def __prune(self) -> None:
+        """
+        Delete the oldest closed segments while the capture is larger than max_bytes.
+        """
+        if not self.max_bytes:
+            return
+        sizes = {}
+        for name in self.segments:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                sizes[name] = 0
+        total = sum(sizes.values())
+        pruned = False
+        while total > self.max_bytes and len(self.segments) > 1:
+            name = self.segments.pop(0)
+            total -= sizes[name]
+            pruned = True
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                self.logger.error(f"Failed to delete capture segment {name}: {e}")
+        if pruned:
+            # Drop the marks of the deleted segments
+            segments = set(self.segments)
+            marks = [mark for mark in read_index(self.directory) if mark.segment in segments]
+            self.index.close()
+            atomic_write(
+                os.path.join(self.directory, CAPTURE_INDEX),
+                "".join(json.dumps(format_mark(mark)) + "\n" for mark in marks),
+            )
+            self.index = open(os.path.join(self.directory, CAPTURE_INDEX), "a")
+
+
+def format_mark(mark: CaptureMark) -> dict:
+    formatted = {"segment": mark.segment, "offset": mark.offset, "time": mark.time}
+    if mark.connect:
+        formatted["connect"] = True
+    return formatted
+
+
+def read_index(directory: str) -> List[CaptureMark]:
+    """
+    Returns:
+        List[CaptureMark]: Marks of the capture in a directory, in recorded order.
+    """
+    marks = []
+    try:
+        with open(os.path.join(directory, CAPTURE_INDEX), "r") as index:
+            for line in index:
+                try:
+                    mark = json.loads(line)
+                    marks.append(
+                        CaptureMark(
+                            mark["segment"], mark["offset"], mark["time"], mark.get("connect", False)
+                        )
+                    )
+                except (ValueError, KeyError):
+                    # NOTE: A crash may leave a partial last line
+                    continue
+    except FileNotFoundError:
+        pass
+    return marks
+
+
+class SegmentSource:
+    """
+    Sequential reader of the uncompressed bytes of a memory-mapped segment.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.size = size
+        self.position = 0
+        self.offset = 0
+        self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def read(self, size: int) -> bytes:
+        """
+        Returns:
+            bytes: Up to size uncompressed bytes, fewer only at the end of the segment.
+        """
+        parts = []
+        remaining = size
+        while remaining > 0:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                if self.position >= self.size or self.decompressor.eof:
+                    break
+                data = self.map[self.position : self.position + REPLAY_READ_SIZE]
+                self.position += len(data)
+            part = self.decompressor.decompress(data, remaining)
+            parts.append(part)
+            remaining -= len(part)
+        data = b"".join(parts)
+        self.offset += len(data)
+        return data
+
+    def skip(self, offset: int) -> None:
+        while self.offset < offset and self.read(min(offset - self.offset, REPLAY_READ_SIZE)):
+            pass
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+class CaptureReader:
+    """
+    Replay source of a capture directory.
+
+    Args:
+        directory (str): Capture directory of one stream.
+        speed (float, optional): Replay speed relative to the recording, e.g. 2 for twice
+            as fast, 0 for as fast as possible. Defaults to 0.
+    """
+
+    def __init__(self, directory: str, speed: float = 0) -> None:
+        self.directory = directory
+        self.speed = speed
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.marks = read_index(directory)
+        self.source: Optional[SegmentSource] = None
+        self.source_segment: Optional[str] = None
+        self.start: Optional[float] = None
+        # Uncompressed bytes replayed
+        self.bytes_read = 0
+
+    def connections(self) -> Generator["CaptureConnection", None, None]:
+        """
+        Yields:
+            CaptureConnection: Each recorded connection, in order.
+        """
+        spans: List[tuple] = []
+        for mark, next_mark in zip(self.marks, self.marks[1:] + [None]):
+            if mark.connect and spans:
+                yield CaptureConnection(self, spans)
+                spans = []
+            end = None
+            if next_mark is not None and next_mark.segment == mark.segment:
+                end = next_mark.offset
+            spans.append((mark, end))
+        if spans:
+            yield CaptureConnection(self, spans)
+        self.close()
+
+    def read_span(self, mark: CaptureMark, end: Optional[int], chunk_size: int) -> Generator[bytes, None, None]:
+        """
+        Yield the bytes from a mark to end, or to the end of its segment, in chunks.
+        """
+        self.__wait(mark.time)
+        source = self.__source(mark.segment)
+        if source is None:
+            return
+        source.skip(mark.offset)
+        while end is None or source.offset < end:
+            size = chunk_size if end is None else min(chunk_size, end - source.offset)
+            chunk = source.read(size)
+            if not chunk:
+                return
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        if self.source:
+            self.source.close()
+            self.source = None
+
+    def __source(self, segment: str) -> Optional[SegmentSource]:
+        if segment != self.source_segment:
+            self.close()
+            self.source_segment = segment
+            try:
+                self.source = SegmentSource(os.path.join(self.directory, segment))
+            except FileNotFoundError:
+                # NOTE: Deleted by max_bytes, the marks of pruned segments are skipped
+                self.logger.debug(f"Skipping deleted capture segment {segment}")
+        return self.source
+
+    def __wait(self, recorded: float) -> None:
+        if not self.speed:
+            return
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now - recorded / self.speed
+        delay = self.start + recorded / self.speed - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CaptureConnection:
+    """
+    One recorded connection, consumed by SSEClient like a streaming requests.Response.
+    """
+
+    def __init__(self, reader: CaptureReader, spans: List[tuple]) -> None:
+        self.reader = reader
+        self.spans = spans
+
+    def iter_content(self, chunk_size: int) -> Generator[bytes, None, None]:
+        for mark, end in self.spans:
+            yield from self.reader.read_span(mark, end, chunk_size)
+
+    def close(self) -> None:
+        pass
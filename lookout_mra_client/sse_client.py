@@ -1,14 +1,30 @@
-import logging, requests
-from typing import Generator
+import codecs, logging, re, requests
+from typing import Generator, Iterator, List, Optional, Tuple
 
 from requests_oauthlib import OAuth2Session
 
 from .lookout_logger import LOGGER_NAME
-from .server_sent_event import SSEvent
+from .server_sent_event import SSEvent, StreamedSSEvent
+from .sse_capture import StreamRecorder
 
 SSE_DELIMITER = (b"\r\r", b"\n\n", b"\r\n\r\n")
 SSE_FIELD_SEP = ":"
 SSE_DEFAULT_TIMEOUT = 5  # seconds
+SSE_READ_CHUNK_SIZE = 64 * 1024  # bytes
+
+# An event ends at a blank line, i.e. a line terminator (CRLF, LF or CR) directly
+# followed by another line terminator. A lone CR may not be followed by LF, otherwise
+# a single CRLF would be mistaken for two line endings.
+SSE_EVENT_END = re.compile(rb"\r\n(?:\r\n|\r|\n)|\n(?:\r\n|\r|\n)|\r(?:\r\n|\r)")
+# Longest possible SSE_EVENT_END match, used to rescan across chunk boundaries.
+SSE_EVENT_END_MAX_LEN = 4
+SSE_LINE_END = re.compile(r"\r\n|\r|\n")
+SSE_LINE_END_BYTES = re.compile(rb"\r\n|\r|\n")
+# Start of the first data line of an event
+SSE_DATA_LINE = re.compile(rb"(?:\A|(?<=[\r\n]))data:")
+SSE_DATA_PREFIX = b"data:"
+# Events whose data is streamed by SSEClient once they are larger than stream_over bytes
+SSE_STREAMED_EVENTS = ("events",)
 
 
 def streamRequest(
@@ -44,72 +60,325 @@ def streamRequest(
     )
 
 
+class SSEParser:
+    """
+    Incremental parser turning chunks of a Server Sent Event stream into events.
+
+    Chunks are appended to a single reusable buffer which is scanned for the
+    SSE event delimiter, including delimiters split across chunk boundaries.
+    Each complete event is copied out of the buffer exactly once.
+
+    The data of a large event can be streamed instead, see `stream_event` and
+    `stream_data`, only the bytes not handed out yet stay in the buffer.
+    """
+
+    def __init__(self, event_enc: str = "utf-8"):
+        self.event_enc = event_enc
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.__buffer = bytearray()
+        # Offset in buffer where the next delimiter search starts
+        self.__scan_pos = 0
+        # Whether the partial event in the buffer was checked by stream_event
+        self.__stream_checked = False
+        # Event being streamed, inside one of its data lines or not
+        self.__streamed: Optional[StreamedSSEvent] = None
+        self.__in_data = False
+        self.__skip_space = False
+        self.__data_lines = 0
+        self.__text = None
+
+    @property
+    def streamed(self) -> Optional[StreamedSSEvent]:
+        """
+        Event whose data is being streamed, None if none.
+        """
+        return self.__streamed
+
+    @property
+    def pending(self) -> int:
+        """
+        Bytes of the partial event in the buffer.
+        """
+        return len(self.__buffer)
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add a chunk of the stream and return the events it completes.
+
+        Args:
+            chunk (bytes): Next bytes read from the stream.
+
+        Returns:
+            List[bytes]: Raw event bytes, including the trailing delimiter
+        """
+        buffer = self.__buffer
+        buffer += chunk
+
+        raw_events = []
+        event_start = 0
+        scan_pos = self.__scan_pos
+        with memoryview(buffer) as view:
+            while True:
+                match = SSE_EVENT_END.search(buffer, scan_pos)
+                if match is None:
+                    break
+                event_end = match.end()
+                raw_events.append(view[event_start:event_end].tobytes())
+                event_start = scan_pos = event_end
+
+        # Drop consumed events, the remaining bytes are a partial event
+        if event_start:
+            del buffer[:event_start]
+            self.__stream_checked = False
+        # Back up far enough to catch a delimiter split across two chunks
+        self.__scan_pos = max(0, len(buffer) - SSE_EVENT_END_MAX_LEN + 1)
+        return raw_events
+
+    def stream_event(self) -> Optional[StreamedSSEvent]:
+        """
+        Start streaming the data of the partial event in the buffer, if it is one of
+        SSE_STREAMED_EVENTS and its `event` field precedes its data. Its data is then
+        read with stream_data instead of feed.
+
+        Returns:
+            StreamedSSEvent: The event with the fields before its data, None if the
+                event is not streamed.
+        """
+        if self.__stream_checked:
+            return None
+        self.__stream_checked = True
+        buffer = self.__buffer
+        match = SSE_DATA_LINE.search(buffer)
+        if match is None:
+            return None
+        head = self.parse(bytes(buffer[: match.start()]))
+        if head is None or head.event not in SSE_STREAMED_EVENTS:
+            return None
+
+        del buffer[: match.start()]
+        self.__streamed = StreamedSSEvent(head.id, head.event, head.retry)
+        self.__in_data = False
+        self.__data_lines = 0
+        self.__text = codecs.getincrementaldecoder(self.event_enc)()
+        return self.__streamed
+
+    def stream_data(self, chunk: bytes) -> Tuple[List[str], bool]:
+        """
+        Add a chunk of the stream to the event being streamed.
+
+        Args:
+            chunk (bytes): Next bytes read from the stream, empty for the buffered ones.
+
+        Returns:
+            (List[str], bool): Parts of the data, and whether the event ended. Bytes after
+                its end are parsed by the next feed.
+        """
+        buffer = self.__buffer
+        buffer += chunk
+        end = len(buffer)
+        decode = self.__text.decode
+        parts = []
+        position = 0
+        ended = False
+        while position < end:
+            line_end = SSE_LINE_END_BYTES.search(buffer, position)
+            available = end
+            # NOTE: A CR at the end of the buffer may be the start of a CRLF
+            if line_end is not None and line_end.end() == end and buffer[-1] == 0x0D:
+                line_end = None
+                available = end - 1
+            if self.__in_data:
+                # NOTE: One space after the colon is not part of the value
+                if self.__skip_space and position < available:
+                    self.__skip_space = False
+                    if buffer[position] == 0x20:
+                        position += 1
+                stop = available if line_end is None else line_end.start()
+                if stop > position:
+                    parts.append(decode(buffer[position:stop]))
+                if line_end is None:
+                    position = stop
+                    break
+                self.__in_data = False
+                position = line_end.end()
+            elif buffer.startswith(SSE_DATA_PREFIX, position):
+                # NOTE: Multiline data is joined with LF, as SSEvent joins it
+                if self.__data_lines:
+                    parts.append("\n")
+                self.__data_lines += 1
+                self.__in_data = True
+                self.__skip_space = True
+                position += len(SSE_DATA_PREFIX)
+            elif line_end is None:
+                # Other fields are short, they are parsed once complete
+                break
+            elif line_end.start() == position:
+                # A blank line ends the event
+                position = line_end.end()
+                ended = True
+                break
+            else:
+                self.__stream_field(buffer[position : line_end.start()])
+                position = line_end.end()
+        del buffer[:position]
+
+        if ended:
+            tail = decode(b"", final=True)
+            if tail:
+                parts.append(tail)
+            self.__streamed.complete = True
+            self.__streamed = None
+            self.__scan_pos = 0
+            self.__stream_checked = False
+        return parts, ended
+
+    def __stream_field(self, line: bytes) -> None:
+        line = line.decode(self.event_enc)
+        if line.startswith(SSE_FIELD_SEP) or SSE_FIELD_SEP not in line:
+            return
+        (field, value) = line.split(SSE_FIELD_SEP, 1)
+        try:
+            self.__streamed.append(field, value.strip())
+        except ValueError as e:
+            self.logger.warning(str(e))
+
+    def parse(self, raw_event: bytes) -> SSEvent:
+        """
+        Parse the fields of a raw event.
+
+        Args:
+            raw_event (bytes): Raw event bytes
+
+        Returns:
+            SSEvent: Server Sent Event, None if the event is blank
+        """
+        event = SSEvent()
+        # Decode the whole event once rather than line by line
+        for line in SSE_LINE_END.split(raw_event.decode(self.event_enc)):
+            # NOTE: Spec states:
+            #   If the line is empty (a blank line), Dispatch the event, as defined below.
+            #   If the line starts with a U+003A COLON character (:), Ignore the line.
+            if not line.strip() or line.startswith(SSE_FIELD_SEP) or (SSE_FIELD_SEP not in line):
+                continue
+
+            # NOTE: line is '<field_name>: <value>'
+            #   only split once to preserve `:` characters in value
+            (field, value) = line.split(SSE_FIELD_SEP, 1)
+            try:
+                event.append(field, value.strip())
+            except ValueError as e:
+                self.logger.warning(str(e))
+        # remove the last newline appended to data section
+        event.data = event.data.strip()
+
+        if event.blank():
+            return None
+        return event
+
+
 class SSEClient:
     """
     Python Server Sent Event client for streaming events from an SSE server,
     based on the HTML spec for Server Sent Events.
 
     Specification: https://html.spec.whatwg.org/multipage/server-sent-events.html#server-sent-events
+
+    With stream_over, the data of an `events` event larger than stream_over bytes is
+    not buffered whole, the event is yielded as a StreamedSSEvent as soon as its data
+    starts, and its data is read from the stream while the caller iterates its parts.
     """
 
-    def __init__(self, event_stream: requests.Response, event_enc: str = "utf-8"):
+    def __init__(
+        self,
+        event_stream: requests.Response,
+        event_enc: str = "utf-8",
+        chunk_size: int = SSE_READ_CHUNK_SIZE,
+        recorder: StreamRecorder = None,
+        stream_over: int = 0,
+    ):
         self.event_stream = event_stream
         self.event_enc = event_enc
+        self.chunk_size = chunk_size
+        # Bytes of an event after which its data is streamed, 0 never streams
+        self.stream_over = stream_over
+        # Records the raw bytes of the stream, see sse_capture.py
+        self.recorder = recorder
+        self.parser = SSEParser(event_enc)
         self.logger = logging.getLogger(LOGGER_NAME)
 
     def __read(self) -> Generator[bytes, None, None]:
         """
-        Read from the event stream and yield raw event data.
+        Read chunks from the event stream.
 
         Yields:
-            bytes: Raw event bytes
-        """
-        raw_event = b""
-        # NOTE: requests.Response.__iter__() uses request.Response.iter_content(128)
-        for event_part in self.event_stream:
-            # NOTE: splitlines(True) splits the line, but preserves the line ending character(s)
-            #   Is necessary so we can parse the SSE delimiter.
-            for line in event_part.splitlines(True):
-                raw_event += line
-                if raw_event.endswith(SSE_DELIMITER):
-                    yield raw_event
-                    raw_event = b""
+            bytes: Bytes of the stream, as they arrive
+        """
+        # NOTE: MRA v2 streams with chunked transfer encoding, so iter_content returns
+        #   data as soon as a chunk arrives instead of waiting for chunk_size bytes.
+        recorder = self.recorder
+        for chunk in self.event_stream.iter_content(self.chunk_size):
+            if recorder is not None:
+                recorder.write(chunk)
+            yield chunk
 
     def streamEvents(self) -> Generator[SSEvent, None, None]:
         """
         Stream events from a SSE endpoint
 
+        NOTE: The parts of a StreamedSSEvent must be read before the next event, parts
+        left unread are read and dropped.
+
         Yields:
             SSEvent: Server Sent Event
         """
-        for raw_event in self.__read():
-            event = SSEvent()
-            for line in raw_event.splitlines():
-                line = line.decode(self.event_enc)
-                # NOTE: Spec states:
-                #   If the line is empty (a blank line), Dispatch the event, as defined below.
-                #   If the line starts with a U+003A COLON character (:), Ignore the line.
-                if (
-                    not line.strip()
-                    or line.startswith(SSE_FIELD_SEP)
-                    or (SSE_FIELD_SEP not in line)
-                ):
-                    continue
-
-                # NOTE: line is '<field_name>: <value>'
-                #   only split once to preserve `:` characters in value
-                (field, value) = line.split(SSE_FIELD_SEP, 1)
-                try:
-                    event.append(field, value.strip())
-                except ValueError as e:
-                    self.logger.warning(str(e))
-            # remove the last newline appended to data section
-            event.data = event.data.strip()
-
-            if not event.blank():
+        chunks = self.__read()
+        parser = self.parser
+        for chunk in chunks:
+            yield from self.__parse(chunk)
+            while self.stream_over and parser.pending > self.stream_over:
+                event = parser.stream_event()
+                if event is None:
+                    break
+                event.parts = self.__stream_data(chunks)
                 yield event
+                for _ in event.parts:
+                    pass
+                if event.error is not None:
+                    raise event.error
+                yield from self.__parse(b"")
         self.close()
 
+    def __parse(self, chunk: bytes) -> Generator[SSEvent, None, None]:
+        parser = self.parser
+        for raw_event in parser.feed(chunk):
+            event = parser.parse(raw_event)
+            if event is not None:
+                yield event
+
+    def __stream_data(self, chunks: Iterator[bytes]) -> Generator[str, None, None]:
+        """
+        Read the data of the event being streamed.
+
+        Yields:
+            str: Parts of the data, as they arrive
+        """
+        parser = self.parser
+        event = parser.streamed
+        parts, ended = parser.stream_data(b"")
+        yield from parts
+        while not ended:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                # NOTE: Raised by streamEvents once the parts were read, so the caller of
+                #   streamEvents handles it as any error reading the stream
+                event.error = e
+                return
+            parts, ended = parser.stream_data(chunk)
+            yield from parts
+
     def close(self) -> None:
         """
         Close the event stream.
@@ -1,12 +1,17 @@
-import logging, socket, threading
-from logging.handlers import SysLogHandler
+import logging, socket, time
 
 from .lookout_logger import LOGGER_NAME
+from .metrics import SEND_SECONDS, TRANSLATE_SECONDS
+from .syslog_spool import SyslogSpool, SpoolingSyslogWriter
+from .syslog_writer import SyslogWriter, SyslogWriterPool, SYSLOG_FRAMING_NUL, SYSLOG_IDLE_TIMEOUT
 
 
 class SyslogClient(object):
     """
     Generic Syslog client used to emit MRA events
+
+    The client is meant to be long lived, it keeps one connection to the syslog
+    receiver and transparently reconnects when the connection is idle or broken.
     """
 
     def __init__(
@@ -16,6 +21,11 @@ class SyslogClient(object):
         syslog_address: tuple = ("localhost", 514),
         log_internally: bool = False,
         socktype=socket.SOCK_STREAM,
+        batch_formatter: callable = None,
+        idle_timeout: int = SYSLOG_IDLE_TIMEOUT,
+        framing: str = SYSLOG_FRAMING_NUL,
+        connections: int = 1,
+        spool: SyslogSpool = None,
     ) -> None:
         """
         Create a Syslog client which can write data to a local or remote syslog receiver
@@ -25,20 +35,35 @@ class SyslogClient(object):
             event_formatter (callable): A callable that formats a single event.
             syslog_address (tuple, optional): Address of syslog receiver. Defaults to ("localhost", 514).
             log_internally (bool, optional): Log to internal log file if true. Defaults to False.
+            batch_formatter (callable, optional): A callable that formats a list of events into
+                a list of UTF-8 encoded messages. Defaults to None.
+            idle_timeout (int, optional): Seconds after which an idle connection is
+                reopened before writing. Defaults to SYSLOG_IDLE_TIMEOUT.
+            framing (str, optional): Message framing on TCP, "nul", "lf" or "octet".
+                Defaults to SYSLOG_FRAMING_NUL.
+            connections (int, optional): Number of connections shared by the threads
+                writing through this client. Defaults to 1.
+            spool (SyslogSpool, optional): Disk spool for batches written while the syslog
+                receiver is unavailable. Requires a stream socket. Defaults to None.
         """
 
-        self.lock = threading.Lock()
+        self.name = name
         self.event_formatter = event_formatter
+        self.batch_formatter = batch_formatter
         self.syslog_address = syslog_address
         self.log_internally = log_internally
 
-        self.syslog_logger = logging.getLogger(name)
-        self.syslog_logger.propagate = False
-        self.syslog_logger.setLevel(logging.INFO)
-
-        handler = SysLogHandler(address=self.syslog_address, socktype=socktype)
-        handler.formatter = logging.Formatter("%(message)s")
-        self.syslog_logger.addHandler(handler)
+        if connections > 1:
+            self.writer = SyslogWriterPool(
+                connections, syslog_address, socktype, framing, idle_timeout
+            )
+        else:
+            self.writer = SyslogWriter(syslog_address, socktype, framing, idle_timeout)
+        self.spool = spool
+        if spool is not None:
+            if socktype != socket.SOCK_STREAM:
+                raise ValueError("A syslog spool requires a stream socket.")
+            self.writer = SpoolingSyslogWriter(self.writer, spool)
 
         self.internal_logger = logging.getLogger(LOGGER_NAME)
 
@@ -48,11 +73,55 @@ class SyslogClient(object):
 
         Args:
             event (dict): Event to be written.
+
+        Raises:
+            OSError: If the event could not be written.
         """
 
         event_text = self.event_formatter(event)
 
-        with self.lock:
-            self.syslog_logger.info(event_text)
-            if self.log_internally:
-                self.internal_logger.debug(f"{event_text}\r\n")
+        self.__send([event_text.encode("utf-8")])
+        if self.log_internally:
+            self.internal_logger.debug(f"{event_text}\r\n")
+
+    def write_all(self, events: list) -> None:
+        """
+        Apply the batch format and write all events to syslog with a single send.
+
+        Args:
+            events (list): Events to be written.
+
+        Raises:
+            OSError: If the events could not be written, with a spool if they could
+                neither be written nor spooled.
+        """
+        start = time.perf_counter()
+        if self.batch_formatter is None:
+            messages = [self.event_formatter(event).encode("utf-8") for event in events]
+        else:
+            messages = self.batch_formatter(events)
+        translated = time.perf_counter()
+        TRANSLATE_SECONDS.observe(translated - start)
+
+        self.__send(messages)
+        SEND_SECONDS.observe(time.perf_counter() - translated)
+        if self.log_internally:
+            for message in messages:
+                self.internal_logger.debug(message.decode("utf-8"))
+
+    def close(self) -> None:
+        """
+        Close the connection to the syslog receiver.
+        """
+        self.writer.close()
+
+    def __send(self, messages: list) -> None:
+        try:
+            self.writer.send(messages)
+        except OSError as e:
+            # NOTE: Unlike logging.handlers.SysLogHandler, failed sends are raised, the
+            #   connection is reopened by the next send but the batch is not forwarded
+            self.internal_logger.error(
+                f"{self.name} - Failed to write {len(messages)} event(s) to syslog: {e}"
+            )
+            raise
@@ -0,0 +1,412 @@
+"""
+Module containing a disk spool for syslog frames written while the destination is down.
+
+A `SyslogSpool` is a directory of memory-mapped segment files. Framed batches are
+appended as length-prefixed records and read back in order; a segment file is
+deleted once all its records were delivered. Disk usage is bounded by `max_bytes`,
+when the spool is full the overflow policy decides between blocking the writer
+(and with it the checkpoints), dropping the oldest segment or dropping new frames.
+
+A `SpoolingSyslogWriter` puts a spool between the LEEF translation and a
+SyslogWriter. Batches go straight to the destination while the spool is empty. When
+a send fails, or earlier batches are still spooled, batches are appended to the spool
+and a drain thread delivers them, in order and coalesced into large writes, as soon as
+the destination is reachable again. A batch counts as written once it is in the spool,
+so checkpoints keep advancing during an outage without losing events.
+"""
+
+import logging, mmap, os, struct, threading
+from collections import deque
+from typing import List, Optional, Tuple
+
+from .lookout_logger import LOGGER_NAME
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024  # bytes
+DEFAULT_SPOOL_MAX_BYTES = 1024 * 1024 * 1024  # bytes
+# Maximum bytes the drain thread writes to the destination at once
+DRAIN_BATCH_BYTES = 1024 * 1024
+# Seconds between delivery attempts while the destination is down, doubled up to the max
+DRAIN_RETRY_INTERVAL = 1
+DRAIN_MAX_RETRY_INTERVAL = 30
+
+# Overflow policies, applied when a frame does not fit in `max_bytes`
+# Wait until the drain thread frees space, the stream stops reading from MRA v2
+SPOOL_OVERFLOW_BLOCK = "block"
+# Delete the oldest segment, losing the frames in it
+SPOOL_OVERFLOW_DROP_OLDEST = "drop_oldest"
+# Drop the new frame
+SPOOL_OVERFLOW_DROP_NEWEST = "drop_newest"
+SPOOL_OVERFLOW_POLICIES = (
+    SPOOL_OVERFLOW_BLOCK,
+    SPOOL_OVERFLOW_DROP_OLDEST,
+    SPOOL_OVERFLOW_DROP_NEWEST,
+)
+
+SEGMENT_SUFFIX = ".spool"
+# Segment header: magic and offset of the first record not yet delivered
+SEGMENT_HEADER = struct.Struct("<4sQ4x")
+SEGMENT_MAGIC = b"MRSP"
+# Record header: length of the frame. The preallocated file is zero filled, so a zero
+# length marks the end of the written records.
+RECORD_HEADER = struct.Struct("<I")
+
+
+class SpoolSegment:
+    """
+    One memory-mapped segment file of a SyslogSpool.
+
+    Args:
+        path (str): Segment file.
+        size (int, optional): Size of a new segment file, None to open an existing one.
+    """
+
+    def __init__(self, path: str, size: int = None) -> None:
+        self.path = path
+        create = size is not None
+        fd = os.open(path, os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0), 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, self.size)
+        finally:
+            # NOTE: The mapping keeps the file open
+            os.close(fd)
+
+        if create:
+            self.read_offset = SEGMENT_HEADER.size
+            self.__write_header()
+            self.write_offset = SEGMENT_HEADER.size
+            return
+
+        magic, self.read_offset = SEGMENT_HEADER.unpack_from(self.mm)
+        if magic != SEGMENT_MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not a spool segment")
+        # Find the end of the written records
+        offset = SEGMENT_HEADER.size
+        while offset + RECORD_HEADER.size <= self.size:
+            (length,) = RECORD_HEADER.unpack_from(self.mm, offset)
+            if length == 0 or offset + RECORD_HEADER.size + length > self.size:
+                break
+            offset += RECORD_HEADER.size + length
+        self.write_offset = offset
+        self.read_offset = min(max(self.read_offset, SEGMENT_HEADER.size), offset)
+
+    @property
+    def unread(self) -> bool:
+        return self.read_offset < self.write_offset
+
+    def fits(self, length: int) -> bool:
+        return self.write_offset + RECORD_HEADER.size + length <= self.size
+
+    def append(self, frame: bytes, sync: bool = False) -> None:
+        offset = self.write_offset
+        end = offset + RECORD_HEADER.size + len(frame)
+        self.mm[offset + RECORD_HEADER.size : end] = frame
+        # NOTE: Length last, a torn write leaves a zero length that ends the records
+        RECORD_HEADER.pack_into(self.mm, offset, len(frame))
+        self.write_offset = end
+        if sync:
+            # msync whole pages covering the record
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            self.mm.flush(start, end - start)
+
+    def read(self, max_bytes: int) -> Tuple[List[bytes], int]:
+        """
+        Read records from the read offset, at least one and up to max_bytes.
+
+        Returns:
+            Tuple[List[bytes], int]: Frames and the offset after the last one.
+        """
+        frames = []
+        offset = self.read_offset
+        total = 0
+        while offset < self.write_offset and (not frames or total < max_bytes):
+            (length,) = RECORD_HEADER.unpack_from(self.mm, offset)
+            start = offset + RECORD_HEADER.size
+            frames.append(self.mm[start : start + length])
+            total += length
+            offset = start + length
+        return frames, offset
+
+    def consume(self, offset: int) -> None:
+        self.read_offset = offset
+        self.__write_header()
+
+    def delete(self) -> None:
+        self.mm.close()
+        os.remove(self.path)
+
+    def close(self) -> None:
+        self.mm.flush()
+        self.mm.close()
+
+    def __write_header(self) -> None:
+        SEGMENT_HEADER.pack_into(self.mm, 0, SEGMENT_MAGIC, self.read_offset)
+
+
+class SyslogSpool:
+    """
+    Bounded on-disk FIFO of syslog frames, kept across restarts.
+
+    Args:
+        directory (str): Directory of the segment files, created if missing.
+        segment_size (int, optional): Bytes per segment file. Defaults to DEFAULT_SEGMENT_SIZE.
+        max_bytes (int, optional): Maximum bytes of all segment files.
+            Defaults to DEFAULT_SPOOL_MAX_BYTES.
+        overflow (str, optional): Overflow policy, one of SPOOL_OVERFLOW_POLICIES.
+            Defaults to SPOOL_OVERFLOW_BLOCK.
+        sync (bool, optional): msync every appended frame, so spooled frames survive
+            a power loss and not only a crash of the connector. Defaults to False.
+
+    Raises:
+        ValueError: On an unknown overflow policy.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        max_bytes: int = DEFAULT_SPOOL_MAX_BYTES,
+        overflow: str = SPOOL_OVERFLOW_BLOCK,
+        sync: bool = False,
+    ) -> None:
+        if overflow not in SPOOL_OVERFLOW_POLICIES:
+            raise ValueError(f"'{overflow}' is not a valid spool overflow policy {SPOOL_OVERFLOW_POLICIES}.")
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.sync = sync
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.cond = threading.Condition()
+        self.closed = False
+        self.segments = deque()
+        self.next_segment = 0
+        # Frame counters, for monitoring
+        self.spooled_frames = 0
+        self.drained_frames = 0
+        self.dropped_frames = 0
+        # Frames dropped since the spool last accepted one, logged once per overflow
+        self.dropping = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.__recover()
+
+    @property
+    def empty(self) -> bool:
+        """
+        True if no frame is waiting to be delivered.
+        """
+        with self.cond:
+            return not any(segment.unread for segment in self.segments)
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(segment.size for segment in self.segments)
+
+    def append(self, frame: bytes) -> bool:
+        """
+        Append a frame, applying the overflow policy when the spool is full.
+
+        Args:
+            frame (bytes): Framed syslog messages.
+
+        Returns:
+            bool: False if the frame was dropped.
+        """
+        with self.cond:
+            segment = self.segments[-1] if self.segments else None
+            while segment is None or not segment.fits(len(frame)):
+                if segment is not None and not segment.unread and len(self.segments) == 1:
+                    # Full and delivered, start over with a fresh segment
+                    self.__delete(self.segments.popleft())
+                size = max(self.segment_size, SEGMENT_HEADER.size + RECORD_HEADER.size + len(frame))
+                if self.segments and self.disk_bytes + size > self.max_bytes:
+                    if self.overflow == SPOOL_OVERFLOW_DROP_NEWEST:
+                        if not self.dropping:
+                            self.logger.error("Syslog spool full, dropping new frames")
+                        self.dropping += 1
+                        self.dropped_frames += 1
+                        return False
+                    if self.overflow == SPOOL_OVERFLOW_DROP_OLDEST:
+                        self.__drop_oldest()
+                    else:
+                        self.cond.wait()
+                        if self.closed:
+                            raise OSError("syslog spool closed")
+                    segment = self.segments[-1] if self.segments else None
+                    continue
+                segment = self.__new_segment(size)
+
+            segment.append(frame, self.sync)
+            self.spooled_frames += 1
+            if self.dropping:
+                self.logger.warning(f"Syslog spool accepting frames again, dropped {self.dropping}")
+                self.dropping = 0
+            self.cond.notify_all()
+            return True
+
+    def read(self, max_bytes: int, timeout: float = None) -> Optional[Tuple[SpoolSegment, int, List[bytes]]]:
+        """
+        Read the oldest undelivered frames, waiting up to timeout for frames.
+
+        Args:
+            max_bytes (int): Stop after this many bytes, at least one frame is read.
+            timeout (float, optional): Seconds to wait when the spool is empty.
+
+        Returns:
+            Optional[Tuple[SpoolSegment, int, List[bytes]]]: Frames and the position to
+                `consume` once they were delivered, None if the spool is empty.
+        """
+        with self.cond:
+            if self.empty or self.closed:
+                self.cond.wait(timeout)
+            while self.segments and not self.closed:
+                segment = self.segments[0]
+                if segment.unread:
+                    frames, offset = segment.read(max_bytes)
+                    return segment, offset, frames
+                if len(self.segments) == 1:
+                    break
+                self.__delete(self.segments.popleft())
+            return None
+
+    def consume(self, position: Tuple[SpoolSegment, int, List[bytes]]) -> None:
+        """
+        Mark frames returned by `read` as delivered.
+        """
+        segment, offset, frames = position
+        with self.cond:
+            if segment not in self.segments:
+                # Dropped by the overflow policy while the frames were sent
+                return
+            segment.consume(offset)
+            self.drained_frames += len(frames)
+            if not segment.unread and segment is not self.segments[-1]:
+                self.segments.remove(segment)
+                self.__delete(segment)
+            self.cond.notify_all()
+
+    def close(self) -> None:
+        """
+        Close the segment files, undelivered frames are kept for the next start.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+            for segment in self.segments:
+                segment.close()
+            self.segments.clear()
+
+    def __recover(self) -> None:
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                segment = SpoolSegment(path)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Ignoring unreadable spool segment {path}: {e}")
+                continue
+            self.segments.append(segment)
+            self.next_segment = int(name[: -len(SEGMENT_SUFFIX)]) + 1
+        pending = sum(1 for segment in self.segments if segment.unread)
+        if pending:
+            self.logger.info(f"Syslog spool has undelivered frames in {pending} segment(s)")
+
+    def __new_segment(self, size: int) -> SpoolSegment:
+        path = os.path.join(self.directory, f"{self.next_segment:012d}{SEGMENT_SUFFIX}")
+        self.next_segment += 1
+        segment = SpoolSegment(path, size)
+        self.segments.append(segment)
+        return segment
+
+    def __drop_oldest(self) -> None:
+        segment = self.segments.popleft()
+        frames = 0
+        offset = segment.read_offset
+        while offset < segment.write_offset:
+            (length,) = RECORD_HEADER.unpack_from(segment.mm, offset)
+            offset += RECORD_HEADER.size + length
+            frames += 1
+        self.dropped_frames += frames
+        self.logger.error(f"Syslog spool full, dropping {frames} frame(s) of the oldest segment")
+        self.__delete(segment)
+
+    def __delete(self, segment: SpoolSegment) -> None:
+        try:
+            segment.delete()
+        except OSError as e:
+            self.logger.error(f"Failed to delete spool segment {segment.path}: {e}")
+
+
+class SpoolingSyslogWriter:
+    """
+    SyslogWriter wrapper spooling batches to disk while the destination is unavailable.
+
+    Args:
+        writer: SyslogWriter or SyslogWriterPool on a stream socket.
+        spool (SyslogSpool): Spool of undelivered frames.
+    """
+
+    def __init__(self, writer, spool: SyslogSpool) -> None:
+        self.writer = writer
+        self.spool = spool
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+        self.closed = threading.Event()
+        self.drainer = threading.Thread(target=self.__drain, name="SyslogSpoolDrainer", daemon=True)
+        self.drainer.start()
+
+    def frame(self, messages: List[bytes]) -> bytes:
+        return self.writer.frame(messages)
+
+    def send(self, messages: List[bytes]) -> None:
+        """
+        Write a batch to the destination, or to the spool if the destination is down
+        or earlier batches are still spooled.
+
+        Raises:
+            OSError: If the batch could neither be written nor spooled.
+        """
+        if not messages:
+            return
+        self.send_framed(self.frame(messages))
+
+    def send_framed(self, payload: bytes) -> None:
+        if self.spool.empty:
+            try:
+                self.writer.send_framed(payload)
+                return
+            except OSError as e:
+                self.logger.warning(f"Syslog destination unavailable, spooling to disk: {e}")
+        self.spool.append(payload)
+
+    def close(self) -> None:
+        """
+        Stop draining and close the destination connection. Spooled frames are kept.
+        """
+        self.closed.set()
+        self.drainer.join()
+        self.writer.close()
+
+    def __drain(self) -> None:
+        retry_interval = DRAIN_RETRY_INTERVAL
+        while not self.closed.is_set():
+            position = self.spool.read(DRAIN_BATCH_BYTES, timeout=DRAIN_RETRY_INTERVAL)
+            if position is None:
+                continue
+            try:
+                self.writer.send_framed(b"".join(position[2]))
+            except OSError as e:
+                self.logger.warning(
+                    f"Syslog destination unavailable, retrying spool in {retry_interval}s: {e}"
+                )
+                self.closed.wait(retry_interval)
+                retry_interval = min(retry_interval * 2, DRAIN_MAX_RETRY_INTERVAL)
+                continue
+            retry_interval = DRAIN_RETRY_INTERVAL
+            self.spool.consume(position)
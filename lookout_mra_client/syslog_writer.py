@@ -0,0 +1,426 @@
+import asyncio, logging, queue, socket, threading, time
+from typing import List, Union
+
+from .lookout_logger import LOGGER_NAME
+
+# Reconnect before writing if the connection has been idle this long. Firewalls and
+# load balancers silently drop idle TCP connections.
+# JIRA: EMM-8312: Events stop appearing in QRadar if there has been long (~15 minute)
+# break between events
+SYSLOG_IDLE_TIMEOUT = 300  # seconds
+# <PRI> of facility user (1) and severity info (6), same as logging.handlers.SysLogHandler
+SYSLOG_PRIORITY = b"<14>"
+
+# Message framing on stream sockets
+# NUL terminated messages, the logging.handlers.SysLogHandler default
+SYSLOG_FRAMING_NUL = "nul"
+# RFC 6587 non-transparent framing, LF terminated messages
+SYSLOG_FRAMING_LF = "lf"
+# RFC 6587 octet counting, each message is prefixed with its length in bytes
+SYSLOG_FRAMING_OCTET = "octet"
+SYSLOG_FRAMINGS = (SYSLOG_FRAMING_NUL, SYSLOG_FRAMING_LF, SYSLOG_FRAMING_OCTET)
+
+
+def frame_messages(messages: List[bytes], framing: str, priority: bytes = SYSLOG_PRIORITY) -> bytes:
+    """
+    Add the priority and framing to each message and join them into one buffer.
+
+    Args:
+        messages (List[bytes]): Encoded syslog messages, without priority.
+        framing (str): Stream framing, one of SYSLOG_FRAMINGS.
+        priority (bytes, optional): <PRI> prepended to every message.
+            Defaults to SYSLOG_PRIORITY.
+
+    Returns:
+        bytes: Framed messages.
+    """
+    if framing == SYSLOG_FRAMING_OCTET:
+        prefix_len = len(priority)
+        return b"".join(
+            b"%d %s%s" % (prefix_len + len(message), priority, message) for message in messages
+        )
+
+    terminator = b"\n" if framing == SYSLOG_FRAMING_LF else b"\000"
+    separator = terminator + priority
+    return priority + separator.join(messages) + terminator
+
+
+class SyslogWriter:
+    """
+    Socket writer for pre-encoded syslog messages.
+
+    A batch of messages is framed and coalesced into a single buffer, so a TCP
+    batch costs one sendall() no matter how many messages it holds. The writer
+    keeps one connection open and transparently reconnects when the connection
+    is idle or was closed by the receiver.
+    """
+
+    def __init__(
+        self,
+        address: Union[tuple, str] = ("localhost", 514),
+        socktype=socket.SOCK_STREAM,
+        framing: str = SYSLOG_FRAMING_NUL,
+        idle_timeout: int = SYSLOG_IDLE_TIMEOUT,
+        priority: bytes = SYSLOG_PRIORITY,
+    ) -> None:
+        """
+        Args:
+            address (Union[tuple, str], optional): (host, port) of the syslog receiver,
+                or the path of a unix socket. Defaults to ("localhost", 514).
+            socktype (optional): socket.SOCK_STREAM or socket.SOCK_DGRAM.
+                Defaults to socket.SOCK_STREAM.
+            framing (str, optional): Stream framing, one of SYSLOG_FRAMINGS.
+                Defaults to SYSLOG_FRAMING_NUL.
+            idle_timeout (int, optional): Seconds after which an idle connection is
+                reopened before writing. Defaults to SYSLOG_IDLE_TIMEOUT.
+            priority (bytes, optional): <PRI> prepended to every message.
+                Defaults to SYSLOG_PRIORITY.
+
+        Raises:
+            ValueError: On an unknown framing.
+        """
+        if framing not in SYSLOG_FRAMINGS:
+            raise ValueError(f"'{framing}' is not a valid syslog framing {SYSLOG_FRAMINGS}.")
+
+        self.address = address
+        self.socktype = socktype
+        self.framing = framing
+        self.idle_timeout = idle_timeout
+        self.priority = priority
+
+        self.lock = threading.Lock()
+        self.socket: socket.socket = None
+        self.last_write = time.monotonic()
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+    def frame(self, messages: List[bytes]) -> bytes:
+        """
+        Add the priority and framing to each message and join them into one buffer.
+
+        Args:
+            messages (List[bytes]): Encoded syslog messages, without priority.
+
+        Returns:
+            bytes: Framed messages.
+        """
+        return frame_messages(messages, self.framing, self.priority)
+
+    def send(self, messages: List[bytes]) -> None:
+        """
+        Write a batch of messages to the syslog receiver.
+
+        On stream sockets the whole batch is written with one sendall(), and the
+        batch is retried once on a new connection if the connection broke.
+        Datagram sockets send one datagram per message.
+
+        Args:
+            messages (List[bytes]): Encoded syslog messages, without priority.
+
+        Raises:
+            OSError: If the messages could not be written.
+        """
+        if not messages:
+            return
+
+        with self.lock:
+            if self.socktype != socket.SOCK_STREAM:
+                self.__send_datagrams(messages)
+                return
+
+            self.__send_payload(self.frame(messages))
+
+    def send_framed(self, payload: bytes) -> None:
+        """
+        Write messages already framed by `frame` to a stream socket, see send.
+
+        Args:
+            payload (bytes): Framed messages.
+
+        Raises:
+            OSError: If the messages could not be written.
+        """
+        with self.lock:
+            self.__send_payload(payload)
+
+    def close(self) -> None:
+        """
+        Close the connection to the syslog receiver.
+        """
+        with self.lock:
+            self.__close_socket()
+
+    def __connect(self) -> None:
+        """
+        Open a new socket to the syslog receiver, connecting stream sockets.
+        """
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, self.socktype)
+            sock.connect(self.address)
+            self.socket = sock
+            return
+
+        host, port = self.address
+        err = None
+        for af, socktype, proto, _, sa in socket.getaddrinfo(host, port, 0, self.socktype):
+            sock = None
+            try:
+                sock = socket.socket(af, socktype, proto)
+                sock.connect(sa)
+                self.socket = sock
+                return
+            except OSError as exc:
+                err = exc
+                if sock is not None:
+                    sock.close()
+        raise err or OSError("getaddrinfo returns an empty list")
+
+    def __send_payload(self, payload: bytes) -> None:
+        self.__check_connection()
+        try:
+            self.__sendall(payload)
+        except OSError as e:
+            # The connection broke since the last check, reconnect and retry once
+            self.logger.warning(f"Syslog connection lost, reconnecting: {e}")
+            self.__close_socket()
+            try:
+                self.__sendall(payload)
+            except OSError:
+                self.__close_socket()
+                raise
+        self.last_write = time.monotonic()
+
+    def __sendall(self, payload: bytes) -> None:
+        if not self.socket:
+            self.__connect()
+        self.socket.sendall(payload)
+
+    def __send_datagrams(self, messages: List[bytes]) -> None:
+        if not self.socket:
+            self.__connect()
+        suffix = b"\000" if self.framing == SYSLOG_FRAMING_NUL else b""
+        for message in messages:
+            self.socket.send(self.priority + message + suffix)
+        self.last_write = time.monotonic()
+
+    def __close_socket(self) -> None:
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def __check_connection(self) -> None:
+        """
+        Drop the connection if it has been idle too long or was closed by the receiver.
+        The next send opens a new connection.
+        """
+        if not self.socket:
+            return
+
+        if time.monotonic() - self.last_write > self.idle_timeout:
+            self.logger.debug("Syslog connection idle, reconnecting")
+            self.__close_socket()
+            return
+
+        # NOTE: Syslog receivers never send data, so a readable socket means
+        #   the receiver closed the connection or it was reset.
+        try:
+            if not self.socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT):
+                raise ConnectionResetError("connection closed by syslog receiver")
+        except BlockingIOError:
+            # Nothing to read, the connection is still open
+            pass
+        except OSError as e:
+            self.logger.debug(f"Syslog connection closed, reconnecting: {e}")
+            self.__close_socket()
+
+
+class SyslogWriterPool:
+    """
+    Fixed pool of SyslogWriter connections shared by all streams of the process.
+
+    A batch is written on whichever connection is free, so streams only wait on each
+    other when all connections are busy. Same interface as SyslogWriter.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        address: Union[tuple, str] = ("localhost", 514),
+        socktype=socket.SOCK_STREAM,
+        framing: str = SYSLOG_FRAMING_NUL,
+        idle_timeout: int = SYSLOG_IDLE_TIMEOUT,
+        priority: bytes = SYSLOG_PRIORITY,
+    ) -> None:
+        """
+        Args:
+            size (int): Number of connections.
+            address, socktype, framing, idle_timeout, priority: See SyslogWriter.
+
+        Raises:
+            ValueError: On an unknown framing.
+        """
+        self.writers = [
+            SyslogWriter(address, socktype, framing, idle_timeout, priority) for _ in range(size)
+        ]
+        # Writers not currently sending, connections are opened on first use
+        self.idle = queue.LifoQueue()
+        for writer in self.writers:
+            self.idle.put(writer)
+
+    def frame(self, messages: List[bytes]) -> bytes:
+        return self.writers[0].frame(messages)
+
+    def send(self, messages: List[bytes]) -> None:
+        """
+        Write a batch of messages on a free connection, see SyslogWriter.send.
+
+        Raises:
+            OSError: If the messages could not be written.
+        """
+        # NOTE: LIFO keeps the recently used connections busy and lets the others idle out
+        writer = self.idle.get()
+        try:
+            writer.send(messages)
+        finally:
+            self.idle.put(writer)
+
+    def send_framed(self, payload: bytes) -> None:
+        """
+        Write framed messages on a free connection, see SyslogWriter.send_framed.
+        """
+        writer = self.idle.get()
+        try:
+            writer.send_framed(payload)
+        finally:
+            self.idle.put(writer)
+
+    def close(self) -> None:
+        """
+        Close all connections to the syslog receiver.
+        """
+        for writer in self.writers:
+            writer.close()
+
+
+class AsyncSyslogWriter:
+    """
+    asyncio stream writer for pre-encoded syslog messages.
+
+    Same framing and reconnect behaviour as SyslogWriter for stream sockets, but
+    writes never block the event loop, so one loop can serve many MRA v2 streams.
+    Batches from concurrent tasks are written one at a time over one connection.
+    """
+
+    def __init__(
+        self,
+        address: Union[tuple, str] = ("localhost", 514),
+        framing: str = SYSLOG_FRAMING_NUL,
+        idle_timeout: int = SYSLOG_IDLE_TIMEOUT,
+        priority: bytes = SYSLOG_PRIORITY,
+    ) -> None:
+        """
+        Args:
+            address (Union[tuple, str], optional): (host, port) of the syslog receiver,
+                or the path of a unix socket. Defaults to ("localhost", 514).
+            framing (str, optional): Stream framing, one of SYSLOG_FRAMINGS.
+                Defaults to SYSLOG_FRAMING_NUL.
+            idle_timeout (int, optional): Seconds after which an idle connection is
+                reopened before writing. Defaults to SYSLOG_IDLE_TIMEOUT.
+            priority (bytes, optional): <PRI> prepended to every message.
+                Defaults to SYSLOG_PRIORITY.
+
+        Raises:
+            ValueError: On an unknown framing.
+        """
+        if framing not in SYSLOG_FRAMINGS:
+            raise ValueError(f"'{framing}' is not a valid syslog framing {SYSLOG_FRAMINGS}.")
+
+        self.address = address
+        self.framing = framing
+        self.idle_timeout = idle_timeout
+        self.priority = priority
+
+        # NOTE: Created on first send, asyncio primitives must be created on the running loop
+        self.lock: asyncio.Lock = None
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+        self.last_write = time.monotonic()
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+    def frame(self, messages: List[bytes]) -> bytes:
+        """
+        Add the priority and framing to each message and join them into one buffer.
+
+        Args:
+            messages (List[bytes]): Encoded syslog messages, without priority.
+
+        Returns:
+            bytes: Framed messages.
+        """
+        return frame_messages(messages, self.framing, self.priority)
+
+    async def send(self, messages: List[bytes]) -> None:
+        """
+        Write a batch of messages to the syslog receiver, retrying once on a new
+        connection if the connection broke.
+
+        Args:
+            messages (List[bytes]): Encoded syslog messages, without priority.
+
+        Raises:
+            OSError: If the messages could not be written.
+        """
+        if not messages:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        payload = self.frame(messages)
+        async with self.lock:
+            self.__check_connection()
+            try:
+                await self.__write(payload)
+            except OSError as e:
+                # The connection broke since the last check, reconnect and retry once
+                self.logger.warning(f"Syslog connection lost, reconnecting: {e}")
+                self.close()
+                try:
+                    await self.__write(payload)
+                except OSError:
+                    self.close()
+                    raise
+            self.last_write = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Close the connection to the syslog receiver.
+        """
+        if self.writer:
+            self.writer.close()
+            self.reader = None
+            self.writer = None
+
+    async def __write(self, payload: bytes) -> None:
+        if not self.writer:
+            if isinstance(self.address, str):
+                self.reader, self.writer = await asyncio.open_unix_connection(self.address)
+            else:
+                self.reader, self.writer = await asyncio.open_connection(*self.address)
+        self.writer.write(payload)
+        # Wait while the transport buffer is above its high-water mark
+        await self.writer.drain()
+
+    def __check_connection(self) -> None:
+        """
+        Drop the connection if it has been idle too long or was closed by the receiver.
+        The next send opens a new connection.
+        """
+        if not self.writer:
+            return
+
+        if time.monotonic() - self.last_write > self.idle_timeout:
+            self.logger.debug("Syslog connection idle, reconnecting")
+            self.close()
+        elif self.reader.at_eof() or self.writer.is_closing():
+            # NOTE: Syslog receivers never send data, EOF means the receiver closed the connection
+            self.logger.debug("Syslog connection closed, reconnecting")
+            self.close()
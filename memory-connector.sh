@@ -0,0 +1,52 @@
+#!/bin/bash
+
+# MRAv2 Syslog Connector - Memory Diagnostics Script
+# Usage: ./memory-connector.sh [seconds]
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PID_FILE="${SCRIPT_DIR}/mrav2-connector.pid"
+LOG_FILE="${SCRIPT_DIR}/logs/mrav2-connector.log"
+CONFIG_FILE="${SCRIPT_DIR}/config.ini"
+SECONDS_ARG="$1"
+
+if [ ! -f "$PID_FILE" ]; then
+    echo "MRAv2 Syslog Connector is not running (no PID file found)"
+    exit 1
+fi
+
+PID=$(cat "$PID_FILE")
+
+if ! ps -p "$PID" > /dev/null 2>&1; then
+    echo "MRAv2 Syslog Connector is not running (process $PID not found)"
+    exit 1
+fi
+
+# A capture length needs the control command of the metrics endpoint, SIGUSR2 uses the configured one
+METRICS_URL=$("${SCRIPT_DIR}/venv/bin/python" - "$CONFIG_FILE" 2>/dev/null <<'PYTHON'
+import configparser, sys
+config = configparser.ConfigParser()
+config.read(sys.argv[1])
+if config.getboolean("metrics", "enabled", fallback=False):
+    address = config.get("metrics", "address", fallback="") or "127.0.0.1"
+    port = config.getint("metrics", "port", fallback=9464)
+    print(f"http://{address}:{port}")
+PYTHON
+)
+
+if [ -n "$SECONDS_ARG" ] && [ -n "$METRICS_URL" ] && command -v curl > /dev/null 2>&1; then
+    echo "Tracing memory of MRAv2 Syslog Connector (PID: $PID) for ${SECONDS_ARG}s..."
+    curl -s --max-time 5 -X POST "$METRICS_URL/memory?seconds=$SECONDS_ARG" || {
+        echo "Metrics endpoint not reachable"
+        exit 1
+    }
+    echo ""
+else
+    if [ -n "$SECONDS_ARG" ]; then
+        echo "Metrics endpoint not enabled, tracing memory for the configured [memory] seconds"
+    fi
+    echo "Tracing memory of MRAv2 Syslog Connector (PID: $PID)..."
+    kill -USR2 "$PID"
+fi
+
+echo "The memory report is written next to the log file once the capture ends, see:"
+echo "  grep 'Memory report written' $LOG_FILE | tail -n 1"
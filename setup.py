@@ -24,9 +24,14 @@ setup(
         "furl>=2.1.0",
         "importlib-metadata>=4.0.0",
     ],
+    extras_require={
+        # asyncio stream engine, `engine = asyncio` in the [performance] section
+        "asyncio": ["aiohttp>=3.8.0"],
+    },
     entry_points={
         "console_scripts": [
             "mrav2-syslog-connector=lookout_mra_client.main:main",
+            "mrav2-syslog-connector-replay=lookout_mra_client.replay:main",
         ],
     },
     classifiers=[
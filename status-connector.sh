@@ -5,6 +5,7 @@
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PID_FILE="${SCRIPT_DIR}/mrav2-connector.pid"
 LOG_FILE="${SCRIPT_DIR}/logs/mrav2-connector.log"
+CONFIG_FILE="${SCRIPT_DIR}/config.ini"
 
 if [ ! -f "$PID_FILE" ]; then
     echo "Status: NOT RUNNING (no PID file found)"
@@ -28,6 +29,26 @@ echo "Log file: $LOG_FILE"
 echo ""
 ps -p "$PID" -o pid,etime,vsz,rss,cmd
 
+# Show metrics if the metrics endpoint is enabled
+METRICS_URL=$("${SCRIPT_DIR}/venv/bin/python" - "$CONFIG_FILE" 2>/dev/null <<'PYTHON'
+import configparser, sys
+config = configparser.ConfigParser()
+config.read(sys.argv[1])
+if config.getboolean("metrics", "enabled", fallback=False):
+    address = config.get("metrics", "address", fallback="") or "127.0.0.1"
+    port = config.getint("metrics", "port", fallback=9464)
+    print(f"http://{address}:{port}")
+PYTHON
+)
+if [ -n "$METRICS_URL" ] && command -v curl > /dev/null 2>&1; then
+    echo ""
+    echo "Lag ($METRICS_URL/status):"
+    curl -s --max-time 5 "$METRICS_URL/status" || echo "  metrics endpoint not reachable"
+    echo ""
+    echo "Metrics ($METRICS_URL/metrics):"
+    curl -s --max-time 5 "$METRICS_URL/metrics" | grep -v -e '^#' -e '_bucket{' || echo "  metrics endpoint not reachable"
+fi
+
 # Show last few log entries if log file exists
 if [ -f "$LOG_FILE" ]; then
     echo ""